@@ -0,0 +1,664 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           PI C-891 simulation                                   #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Stand-in for pipython's GCSDevice driving a simulated C-891 stage.
+
+The simulated controller implements the GCS commands used by
+WL_backend.PI_control (MOV, VEL, SVO, EAX, FRF, qPOS, qONT, qTMN, qTMX, ...)
+and the data recorder, with a trapezoidal motion profile, a referencing
+time and a query latency that models the USB round trip.
+
+Usage without a stage (e.g. for benchmarks):
+
+    from Sub_Programs import PI_Simulation
+    PI_Simulation.install()   # 'import pipython' now uses the simulation
+    from Sub_Programs import WL_backend
+"""
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+import numpy as np
+
+
+class GCSError(Exception):
+    """Error raised by the simulated controller (as pipython.GCSError)."""
+
+    def __init__(self, value, message=''):
+        Exception.__init__(self, 'GCS error {}: {}'.format(value,
+                message))
+        self.val = value
+
+
+# GCS error codes used by the simulation.
+E_PARAM_OUT_OF_RANGE = 17
+E_UNALLOWABLE_MOVE_UNREFERENCED = 5
+E_SERVO_OFF = 8
+E_AXIS_DISABLED = 1092
+
+# Data recorder options (as pipython.datarectools.RecordOptions).
+COMMANDED_POSITION_1 = 1
+ACTUAL_POSITION_2 = 2
+POSITION_ERROR_3 = 3
+
+# Data recorder trigger sources (as pipython.datarectools.TriggerSources).
+DEFAULT_0 = 0
+POSITION_CHANGING_COMMAND_1 = 1
+NEXT_COMMAND_WITH_RESET_2 = 2
+
+# Parameter ID of the servo update time (as used by qSPA).
+PARAM_SERVO_UPDATE_TIME = 0x0E000200
+PARAM_MAX_VELOCITY = 0xA
+
+
+class Motion_Profile(object):
+    """Trapezoidal point-to-point move from rest to rest.
+
+    The axis starts at `start` at time `t0` and accelerates with `acc`
+    to `vel`, travels and decelerates with `acc` to rest at `target`.
+    Moves that are too short to reach `vel` have a triangular profile.
+    """
+
+    def __init__(self, t0, start, target, vel, acc):
+        self.t0 = t0
+        self.start = start
+        self.target = target
+        self.sign = 1.0 if target >= start else -1.0
+        dist = abs(target - start)
+        if vel <= 0 or dist == 0:
+            self.vpeak = 0.0
+            self.tacc = 0.0
+            self.tconst = 0.0
+        elif dist >= vel**2/acc:
+            self.vpeak = vel
+            self.tacc = vel/acc
+            self.tconst = (dist - vel**2/acc)/vel
+        else:
+            self.vpeak = np.sqrt(dist*acc)
+            self.tacc = self.vpeak/acc
+            self.tconst = 0.0
+        self.acc = acc
+        self.duration = 2*self.tacc + self.tconst
+        self.t1 = t0 + self.duration
+
+    def position(self, t):
+        """Return the position at the time(s) t (array or float)."""
+        tau = np.clip(np.asarray(t, dtype = float) - self.t0, 0,
+                self.duration)
+        tacc = self.tacc
+        dacc = 0.5*self.acc*tacc**2
+        s = np.where(tau < tacc, 0.5*self.acc*tau**2,
+                np.where(tau < tacc + self.tconst,
+                    dacc + self.vpeak*(tau - tacc),
+                    dacc + self.vpeak*self.tconst + self.vpeak*(
+                        tau - tacc - self.tconst) - 0.5*self.acc*(
+                        tau - tacc - self.tconst)**2))
+        return self.start + self.sign*s
+
+    def velocity(self, t):
+        """Return the velocity at the time t."""
+        tau = min(max(t - self.t0, 0), self.duration)
+        if tau < self.tacc:
+            v = self.acc*tau
+        elif tau < self.tacc + self.tconst:
+            v = self.vpeak
+        else:
+            v = max(self.vpeak - self.acc*(tau - self.tacc -
+                self.tconst), 0.0)
+        return self.sign*v
+
+
+class Sim_Axis(object):
+    """State of one simulated axis."""
+
+    def __init__(self, name, tmin, tmax, vel, acc, maxvel):
+        self.name = name
+        self.tmin = tmin
+        self.tmax = tmax
+        self.vel = vel
+        self.acc = acc
+        self.maxvel = maxvel
+        self.servo = False
+        self.enabled = False
+        self.referenced = False
+        self.profiles = [Motion_Profile(time.time(), 0.5*(tmin + tmax),
+                0.5*(tmin + tmax), 0.0, acc)]
+
+    @property
+    def profile(self):
+        return self.profiles[-1]
+
+    def position(self, t = None):
+        """Return the position at time t (default: now); t may be an
+        array of times in the past, e.g. for the data recorder."""
+        if t is None:
+            t = time.time()
+        if np.ndim(t) == 0:
+            for prof in reversed(self.profiles):
+                if t >= prof.t0:
+                    return float(prof.position(t))
+            return float(self.profiles[0].start)
+        t = np.asarray(t, dtype = float)
+        starts = np.array([prof.t0 for prof in self.profiles])
+        index = np.clip(np.searchsorted(starts, t, side = 'right') - 1,
+                0, len(self.profiles) - 1)
+        pos = np.empty(t.shape)
+        for i in np.unique(index):
+            mask = index == i
+            pos[mask] = self.profiles[i].position(t[mask])
+        return pos
+
+    def target(self, t = None):
+        """Return the commanded target at time t (array or float)."""
+        if t is None or np.ndim(t) == 0:
+            return self.profile.target
+        starts = np.array([prof.t0 for prof in self.profiles])
+        targets = np.array([prof.target for prof in self.profiles])
+        index = np.clip(np.searchsorted(starts, t, side = 'right') - 1,
+                0, len(self.profiles) - 1)
+        return targets[index]
+
+    def move(self, target, t = None):
+        if t is None:
+            t = time.time()
+        start = self.position(t)
+        self.profiles.append(Motion_Profile(t, start, target, self.vel,
+            self.acc))
+        # Keep a bounded history for the data recorder.
+        del self.profiles[:-1000]
+
+    def halt(self, t = None):
+        if t is None:
+            t = time.time()
+        pos = self.position(t)
+        self.profiles.append(Motion_Profile(t, pos, pos, 0.0, self.acc))
+
+
+class GCSDevice(object):
+    """Simulated PI controller with the interface of pipython.GCSDevice.
+
+    Arguments:
+        devname : Controller name, default 'C-891'.
+        tmin, tmax : Travel range in mm (qTMN/qTMX).
+        vel : Initial velocity in mm/s.
+        acc : Acceleration and deceleration in mm/s**2.
+        maxvel : Maximum velocity in mm/s, larger VEL values raise.
+        ref_time : Duration of the FRF reference move in s.
+        latency : Duration of one query (qPOS, qONT, ...) in s, models
+            the USB round trip.
+        servo_time : Servo update time in s (data recorder base rate).
+        recorder_size : Number of points per data recorder table.
+    """
+
+    def __init__(self, devname = 'C-891', tmin = 0.0, tmax = 25.0,
+            vel = 10.0, acc = 1000.0, maxvel = 250.0, ref_time = 2.0,
+            latency = 0.002, servo_time = 5e-5, recorder_size = 65536):
+        self.devname = devname
+        self.latency = latency
+        self.ref_time = ref_time
+        self.servo_time = servo_time
+        self.recorder_size = recorder_size
+        self._axes = OrderedDict([('1', Sim_Axis('1', tmin, tmax, vel,
+            acc, maxvel))])
+        self._ref_done = 0.0
+        self._connected = False
+        self._lock = threading.RLock()
+        self._rec_rate = 1
+        self._rec_config = OrderedDict([(1, ('1', COMMANDED_POSITION_1)),
+            (2, ('1', ACTUAL_POSITION_2))])
+        self._rec_trigger = DEFAULT_0
+        self._rec_start = time.time()
+        self._armed = False
+        self.bufstate = True
+        self.bufdata = []
+        self.trigger_outputs = {}
+
+    #### Connection
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.CloseConnection()
+
+    def InterfaceSetupDlg(self, key = ''):
+        self._connected = True
+
+    def EnumerateUSB(self, mask = ''):
+        return ['PI {} SN 0000000000'.format(self.devname)]
+
+    def EnumerateTCPIPDevices(self, mask = ''):
+        return []
+
+    def ConnectUSB(self, serialnum, baudrate = None):
+        self._connected = True
+
+    def ConnectTCPIPByDescription(self, description):
+        self._connected = True
+
+    def IsConnected(self):
+        return self._connected
+
+    def CloseConnection(self):
+        self._connected = False
+
+    def qIDN(self):
+        self._query()
+        return ('(c)2017 Physik Instrumente (PI) GmbH & Co. KG, '
+                '{}.130300, 0000000000, 01.034\n'.format(self.devname))
+
+    #### Helpers
+    def __getattr__(self, name):
+        # pipython answers HasXXX() for every GCS command.
+        if name.startswith('Has'):
+            command = name[3:]
+            return lambda: hasattr(type(self), command)
+        raise AttributeError(name)
+
+    @property
+    def axes(self):
+        return list(self._axes)
+
+    allaxes = axes
+
+    def _query(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _items(self, axes, values = None):
+        """Return [(axis, value)] as pipython's argument conventions."""
+        if isinstance(axes, dict):
+            return list(axes.items())
+        if axes is None:
+            axes = self.axes
+        if isinstance(axes, (str, int)):
+            axes = [axes]
+        axes = [str(axis) for axis in axes]
+        for axis in axes:
+            if axis not in self._axes:
+                raise GCSError(15, 'Illegal axis identifier {}'.format(
+                    axis))
+        if values is None:
+            return [(axis, None) for axis in axes]
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        return list(zip(axes, values))
+
+    def _answer(self, axes, func):
+        self._query()
+        with self._lock:
+            return OrderedDict((axis, func(self._axes[axis])) for axis, _
+                    in self._items(axes))
+
+    def _check_ref(self):
+        if self._ref_done and time.time() >= self._ref_done:
+            for axis in self._axes.values():
+                axis.referenced = True
+            self._ref_done = 0.0
+
+    #### Configuration
+    def SVO(self, axes, values = None):
+        with self._lock:
+            for axis, value in self._items(axes, values):
+                self._axes[axis].servo = bool(int(value))
+
+    def qSVO(self, axes = None):
+        return self._answer(axes, lambda ax: ax.servo)
+
+    def EAX(self, axes, values = None):
+        with self._lock:
+            for axis, value in self._items(axes, values):
+                self._axes[axis].enabled = bool(value)
+
+    def qEAX(self, axes = None):
+        return self._answer(axes, lambda ax: ax.enabled)
+
+    def VEL(self, axes, values = None):
+        with self._lock:
+            for axis, value in self._items(axes, values):
+                ax = self._axes[axis]
+                if not 0 < value <= ax.maxvel:
+                    raise GCSError(E_PARAM_OUT_OF_RANGE,
+                            'Velocity {} out of range'.format(value))
+                ax.vel = float(value)
+
+    def qVEL(self, axes = None):
+        return self._answer(axes, lambda ax: ax.vel)
+
+    def ACC(self, axes, values = None):
+        with self._lock:
+            for axis, value in self._items(axes, values):
+                self._axes[axis].acc = float(value)
+
+    def qACC(self, axes = None):
+        return self._answer(axes, lambda ax: ax.acc)
+
+    DEC = ACC
+    qDEC = qACC
+
+    def qTMN(self, axes = None):
+        return self._answer(axes, lambda ax: ax.tmin)
+
+    def qTMX(self, axes = None):
+        return self._answer(axes, lambda ax: ax.tmax)
+
+    def qSPA(self, items = None, params = None):
+        self._query()
+        return OrderedDict((axis, {PARAM_SERVO_UPDATE_TIME:
+            self.servo_time, PARAM_MAX_VELOCITY: self._axes[axis].maxvel})
+            for axis, _ in self._items(items))
+
+    #### Referencing
+    def FRF(self, axes = None):
+        with self._lock:
+            for axis, _ in self._items(axes):
+                ax = self._axes[axis]
+                if not ax.enabled:
+                    raise GCSError(E_AXIS_DISABLED, 'Axis is disabled')
+                ax.referenced = False
+                ax.halt()
+            self._ref_done = time.time() + self.ref_time
+            for axis, _ in self._items(axes):
+                ax = self._axes[axis]
+                # The stage ends the reference move in the middle of the
+                # travel range.
+                ax.profiles.append(Motion_Profile(self._ref_done,
+                    0.5*(ax.tmin + ax.tmax), 0.5*(ax.tmin + ax.tmax),
+                    0.0, ax.acc))
+
+    def qFRF(self, axes = None):
+        self._check_ref()
+        return self._answer(axes, lambda ax: ax.referenced)
+
+    def IsControllerReady(self):
+        self._query()
+        self._check_ref()
+        return self._ref_done == 0.0
+
+    #### Motion
+    def MOV(self, axes, values = None):
+        self._check_ref()
+        with self._lock:
+            items = self._items(axes, values)
+            for axis, value in items:
+                ax = self._axes[axis]
+                if not ax.enabled:
+                    raise GCSError(E_AXIS_DISABLED, 'Axis is disabled')
+                if not ax.referenced:
+                    raise GCSError(E_UNALLOWABLE_MOVE_UNREFERENCED,
+                            'Unallowable move on unreferenced axis')
+                if not ax.servo:
+                    raise GCSError(E_SERVO_OFF, 'Servo is off')
+                if not ax.tmin <= value <= ax.tmax:
+                    raise GCSError(E_PARAM_OUT_OF_RANGE,
+                            'Position {} out of range'.format(value))
+            now = time.time()
+            if self._armed and self._rec_trigger == \
+                    POSITION_CHANGING_COMMAND_1:
+                self._rec_start = now
+                self._armed = False
+            for axis, value in items:
+                self._axes[axis].move(float(value), now)
+
+    def MVR(self, axes, values = None):
+        with self._lock:
+            targets = [(axis, self._axes[axis].target() + value) for
+                    axis, value in self._items(axes, values)]
+        self.MOV(OrderedDict(targets))
+
+    def HLT(self, axes = None):
+        with self._lock:
+            for axis, _ in self._items(axes):
+                self._axes[axis].halt()
+
+    def STP(self):
+        self.HLT()
+
+    def qMOV(self, axes = None):
+        return self._answer(axes, lambda ax: ax.target())
+
+    def qPOS(self, axes = None):
+        return self._answer(axes, lambda ax: ax.position())
+
+    def qONT(self, axes = None):
+        self._check_ref()
+        now = time.time()
+        return self._answer(axes, lambda ax: ax.servo and
+                now >= ax.profile.t1)
+
+    def IsMoving(self, axes = None):
+        now = time.time()
+        return self._answer(axes, lambda ax: now < ax.profile.t1)
+
+    #### Digital output triggers (CTO/TRO)
+    def CTO(self, lines, params = None, values = None):
+        with self._lock:
+            if not isinstance(lines, (list, tuple)):
+                lines, params, values = [lines], [params], [values]
+            for line, param, value in zip(lines, params, values):
+                self.trigger_outputs.setdefault(int(line), {})[int(param)] \
+                        = value
+
+    def qCTO(self, lines = None, params = None):
+        self._query()
+        return OrderedDict((line, dict(config)) for line, config in
+                self.trigger_outputs.items())
+
+    def TRO(self, lines, values = None):
+        with self._lock:
+            if not isinstance(lines, (list, tuple)):
+                lines, values = [lines], [values]
+            for line, value in zip(lines, values):
+                self.trigger_outputs.setdefault(int(line), {})['enabled'] \
+                        = bool(value)
+
+    #### Data recorder
+    def qTNR(self):
+        self._query()
+        return len(self._rec_config)
+
+    def RTR(self, value):
+        self._rec_rate = max(int(value), 1)
+
+    def qRTR(self):
+        self._query()
+        return self._rec_rate
+
+    def DRC(self, tables, sources = None, options = None):
+        with self._lock:
+            if not isinstance(tables, (list, tuple)):
+                tables, sources, options = [tables], [sources], [options]
+            for table, source, option in zip(tables, sources, options):
+                self._rec_config[int(table)] = (str(source), int(option))
+
+    def qDRC(self, tables = None):
+        self._query()
+        return OrderedDict(self._rec_config)
+
+    def DRT(self, tables, sources = None, values = None):
+        """Set the trigger source; the recording (re)starts now
+        (DEFAULT_0) or with the next MOV (POSITION_CHANGING_COMMAND_1)."""
+        if isinstance(sources, (list, tuple)):
+            sources = sources[0]
+        self._rec_trigger = int(sources)
+        self._armed = self._rec_trigger == POSITION_CHANGING_COMMAND_1
+        if not self._armed:
+            self._rec_start = time.time()
+
+    def qDRL(self, tables = None):
+        self._query()
+        npts = self._recorded_points()
+        return OrderedDict((table, npts) for table in self._rec_config)
+
+    def _recorded_points(self):
+        if self._armed:
+            return 0
+        dt = self.servo_time*self._rec_rate
+        return int(min((time.time() - self._rec_start)/dt + 1,
+            self.recorder_size))
+
+    def qDRR(self, tables = None, offset = 1, numvalues = None):
+        """Read recorded data. As pipython, the data is provided in
+        `bufdata` (one list per table) once `bufstate` is True; the
+        returned header describes the recording."""
+        if tables is None:
+            tables = list(self._rec_config)
+        if not isinstance(tables, (list, tuple)):
+            tables = [tables]
+        npts = self._recorded_points()
+        if numvalues is None:
+            numvalues = npts - offset + 1
+        numvalues = max(min(numvalues, npts - offset + 1), 0)
+        dt = self.servo_time*self._rec_rate
+        times = self._rec_start + (offset - 1 + np.arange(numvalues))*dt
+        data = []
+        with self._lock:
+            for table in tables:
+                source, option = self._rec_config[int(table)]
+                ax = self._axes[source]
+                if option == COMMANDED_POSITION_1:
+                    data.append(list(ax.target(times)))
+                elif option == POSITION_ERROR_3:
+                    data.append(list(ax.target(times) -
+                        ax.position(times)))
+                else:
+                    data.append(list(ax.position(times)))
+        # One bulk transfer instead of one query per point.
+        time.sleep(self.latency + 8e-7*numvalues*len(tables))
+        self.bufdata = data
+        self.bufstate = True
+        return {'SAMPLE_TIME': dt, 'NDATA': numvalues,
+                'DIM': len(tables), 'START_TIME': self._rec_start}
+
+
+class Datarecorder(object):
+    """Minimal stand-in of pipython.datarectools.Datarecorder.
+
+    Arguments:
+        gcs : GCSDevice (simulated).
+    """
+
+    def __init__(self, gcs):
+        self.gcs = gcs
+        self.options = [COMMANDED_POSITION_1, ACTUAL_POSITION_2]
+        self.sources = gcs.axes[0]
+        self.trigsources = DEFAULT_0
+        self._samplerate = 1
+        self.numvalues = None
+
+    @property
+    def servotime(self):
+        return list(self.gcs.qSPA(self.gcs.axes[0], PARAM_SERVO_UPDATE_TIME
+            ).values())[0][PARAM_SERVO_UPDATE_TIME]
+
+    @property
+    def samplerate(self):
+        return self._samplerate
+
+    @samplerate.setter
+    def samplerate(self, value):
+        self._samplerate = max(int(value), 1)
+
+    @property
+    def sampletime(self):
+        return self.servotime*self._samplerate
+
+    @sampletime.setter
+    def sampletime(self, value):
+        self.samplerate = int(round(value/self.servotime))
+
+    @property
+    def samplefreq(self):
+        return 1.0/self.sampletime
+
+    @samplefreq.setter
+    def samplefreq(self, value):
+        self.sampletime = 1.0/value
+
+    @property
+    def rectime(self):
+        return self.sampletime*self.gcs.recorder_size
+
+    def arm(self):
+        options = self.options if isinstance(self.options, (list,
+            tuple)) else [self.options]
+        sources = self.sources if isinstance(self.sources, (list,
+            tuple)) else [self.sources]*len(options)
+        tables = list(range(1, len(options) + 1))
+        self.gcs.RTR(self._samplerate)
+        self.gcs.DRC(tables, sources, options)
+        self.gcs.DRT(0, self.trigsources, 0)
+
+    def wait(self, timeout = 0):
+        pass
+
+    def read(self, offset = 1, numvalues = None, verbose = False):
+        header = self.gcs.qDRR(None, offset, numvalues or self.numvalues)
+        return header, self.gcs.bufdata
+
+    def getdata(self, timeout = 0, offset = 1, numvalues = None):
+        self.wait(timeout)
+        return self.read(offset, numvalues)
+
+
+def waitonready(pidevice, timeout = 300, predelay = 0, polldelay = 0.1):
+    """As pipython.pitools.waitonready."""
+    time.sleep(predelay)
+    maxtime = time.time() + timeout
+    while not pidevice.IsControllerReady():
+        if time.time() > maxtime:
+            raise SystemError('waitonready() timed out after {} seconds'
+                    .format(timeout))
+        time.sleep(polldelay)
+
+
+def waitontarget(pidevice, axes = None, timeout = 300, predelay = 0,
+        postdelay = 0, polldelay = 0.1):
+    """As pipython.pitools.waitontarget."""
+    waitonready(pidevice, timeout, predelay, polldelay)
+    maxtime = time.time() + timeout
+    while not all(pidevice.qONT(axes).values()):
+        if time.time() > maxtime:
+            pidevice.STP()
+            raise SystemError('waitontarget() timed out after {} seconds'
+                    .format(timeout))
+        time.sleep(polldelay)
+    time.sleep(postdelay)
+
+
+def install():
+    """Register modules named pipython, pipython.pitools,
+    pipython.datarectools and pipython.gcscommands that use this
+    simulation, so that WL_backend can be imported and run without
+    pipython or a stage."""
+    this = sys.modules[__name__]
+    pipython = types.ModuleType('pipython')
+    pipython.GCSDevice = GCSDevice
+    pipython.GCSError = GCSError
+    pitools = types.ModuleType('pipython.pitools')
+    pitools.waitontarget = waitontarget
+    pitools.waitonready = waitonready
+    datarectools = types.ModuleType('pipython.datarectools')
+    datarectools.Datarecorder = Datarecorder
+    datarectools.RecordOptions = types.SimpleNamespace(
+            COMMANDED_POSITION_1 = COMMANDED_POSITION_1,
+            ACTUAL_POSITION_2 = ACTUAL_POSITION_2,
+            POSITION_ERROR_3 = POSITION_ERROR_3)
+    datarectools.TriggerSources = types.SimpleNamespace(
+            DEFAULT_0 = DEFAULT_0,
+            POSITION_CHANGING_COMMAND_1 = POSITION_CHANGING_COMMAND_1,
+            NEXT_COMMAND_WITH_RESET_2 = NEXT_COMMAND_WITH_RESET_2)
+    gcscommands = types.ModuleType('pipython.gcscommands')
+    pipython.pitools = pitools
+    pipython.datarectools = datarectools
+    pipython.gcscommands = gcscommands
+    pipython.simulation = this
+    sys.modules.update({'pipython': pipython,
+        'pipython.pitools': pitools,
+        'pipython.datarectools': datarectools,
+        'pipython.gcscommands': gcscommands})
@@ -0,0 +1,164 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Envelope and zero path difference extraction          #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Coherence envelope, zero path difference (ZPD) and fringe visibility.
+
+The interferograms are given on a common position (or OPD) grid as an
+array of shape (..., points): one scan per row, any number of rows. All
+the functions work along the last axis at once for the whole batch, there
+is no loop over the scans:
+
+    Result = analyze(Scans_X, grid, level = DC)
+    Result['zpd'], Result['visibility']      # one value per scan
+
+The envelope is either the modulus of the analytic signal of the fringes
+(Hilbert transform, computed with numpy's FFT) or, when the lock-in
+demodulates at the fringe frequency, the demodulator R = |X + iY|.
+
+The visibility needs the DC intensity of the detector. When the lock-in
+demodulates a chopped beam, X follows the detector intensity and its
+baseline away from the fringe packet is that level: analyze(...,
+level = 'baseline'). When it demodulates the fringes themselves, X has no
+DC level (its baseline is close to 0 and the visibility NaN) and the DC
+output of the detector must be measured on its own, e.g. on an auxiliary
+input of the lock-in, and given as a value.
+"""
+import warnings
+
+import numpy as np
+
+# Points whose envelope is below this fraction of the peak are outside of
+# the fringe packet (baseline_level).
+BASELINE_ENVELOPE = 0.05
+
+
+def analytic_signal(signal, axis = -1):
+    """Return the analytic signal of real signals along axis (same as
+    scipy.signal.hilbert)."""
+    signal = np.asarray(signal, dtype = float)
+    n = signal.shape[axis]
+    spectrum = np.fft.fft(signal, axis = axis)
+    # Keep the DC (and Nyquist) bins, double the positive frequencies.
+    weights = np.zeros(n)
+    weights[0] = 1
+    if n % 2 == 0:
+        weights[n//2] = 1
+        weights[1:n//2] = 2
+    else:
+        weights[1:(n + 1)//2] = 2
+    shape = [1]*signal.ndim
+    shape[axis] = n
+    return np.fft.ifft(spectrum*weights.reshape(shape), axis = axis)
+
+
+def baseline(signal):
+    """Return the level of the interferograms away from the fringes (the
+    median of each scan, the fringe packet being short), shape (...)."""
+    return np.nanmedian(signal, axis = -1)
+
+
+def envelope(x, y = None, method = 'hilbert'):
+    """Return the coherence envelope of the interferograms x, shape
+    (..., points).
+
+    Arguments:
+        x : Interferograms (demodulator X), shape (..., points).
+        y : Demodulator Y, only used by method 'r'.
+        method : 'hilbert' for the modulus of the analytic signal of the
+            fringes around the baseline, 'r' for |x + iy|.
+
+    NaN samples (e.g. grid points not covered by a scan) are treated as
+    being on the baseline.
+    """
+    x = np.asarray(x, dtype = float)
+    if method == 'r':
+        if y is None:
+            raise ValueError("method 'r' needs the demodulator Y")
+        return np.nan_to_num(np.hypot(x, y))
+    if method != 'hilbert':
+        raise ValueError('Unknown envelope method {}'.format(method))
+    fringes = np.nan_to_num(x - baseline(x)[..., np.newaxis])
+    return np.abs(analytic_signal(fringes))
+
+
+def baseline_level(x, Envelope, peak, fraction = BASELINE_ENVELOPE):
+    """Return the level of the interferograms x away from the fringe
+    packet: the median of the points whose envelope is below fraction of
+    the peak, shape (...). NaN for a scan without such points."""
+    x = np.asarray(x, dtype = float)
+    outside = Envelope < fraction*np.asarray(peak)[..., np.newaxis]
+    with warnings.catch_warnings():
+        # All NaN rows have no median.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(np.where(outside, x, np.nan), axis = -1)
+
+
+def find_peak(values):
+    """Return (index, peak) of the maximum of each row of values with a
+    parabolic sub-sample interpolation; index is fractional."""
+    values = np.asarray(values, dtype = float)
+    n = values.shape[-1]
+    i = np.argmax(values, axis = -1)
+    # The parabola needs both neighbours.
+    centre = np.clip(i, 1, max(n - 2, 1))[..., np.newaxis]
+    if n < 3:
+        return i.astype(float), np.take_along_axis(values,
+                i[..., np.newaxis], -1)[..., 0]
+    y0 = np.take_along_axis(values, centre - 1, -1)[..., 0]
+    y1 = np.take_along_axis(values, centre, -1)[..., 0]
+    y2 = np.take_along_axis(values, centre + 1, -1)[..., 0]
+    curvature = y0 - 2*y1 + y2
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        offset = np.where(curvature < 0, 0.5*(y0 - y2)/curvature, 0.0)
+    offset = np.clip(offset, -0.5, 0.5)
+    return centre[..., 0] + offset, y1 - 0.25*(y0 - y2)*offset
+
+
+def analyze(x, grid, y = None, method = 'hilbert', level = None):
+    """Return the envelope, ZPD and visibility of interferograms.
+
+    Arguments:
+        x : Interferograms (demodulator X), shape (..., points).
+        grid : Increasing positions (mm) or OPD (um) of the points.
+        y : Demodulator Y, for method 'r'.
+        method : Envelope method, see envelope().
+        level : DC intensity of the detector in the unit of x, shape
+            (...), or 'baseline' to measure it on x away from the fringe
+            packet (baseline_level). Without it the visibility is NaN.
+
+    Returns:
+        A dict of arrays with:
+        'envelope' : The envelope, shape (..., points).
+        'zpd' : Position of the envelope maximum, on the grid's unit.
+        'peak' : Envelope maximum.
+        'level' : DC intensity used for the visibility.
+        'visibility' : Fringe contrast (Imax - Imin)/(Imax + Imin) at the
+            ZPD, with Imax, Imin = level +- peak; NaN without a level or
+            for a level below the peak (Imin < 0, e.g. the baseline of
+            fringes demodulated without their DC level).
+    """
+    x = np.asarray(x, dtype = float)
+    grid = np.asarray(grid, dtype = float)
+    Envelope = envelope(x, y, method)
+    index, peak = find_peak(Envelope)
+    zpd = np.interp(index, np.arange(len(grid)), grid)
+    if level is None:
+        level = np.nan
+    elif isinstance(level, str):
+        if level != 'baseline':
+            raise ValueError('Unknown level {}'.format(level))
+        level = baseline_level(x, Envelope, peak)
+    level = np.asarray(level, dtype = float)
+    Imax, Imin = level + peak, level - peak
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        visibility = np.where((level > 0) & (Imin >= 0),
+                (Imax - Imin)/(Imax + Imin), np.nan)
+    return {'envelope': Envelope,
+            'zpd': zpd,
+            'peak': peak,
+            'level': level,
+            'visibility': visibility}
@@ -0,0 +1,128 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Multi-pass scan averaging                             #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Average many scans of the same range on a common position grid.
+
+Each pass (forward or backward sweep) is resampled onto the grid with
+numpy.interp and folded into running mean and variance arrays with
+Welford's update, then dropped. The memory used is a few arrays of the
+size of the grid, whatever the number of passes:
+
+    Average = Pass_Average(np.linspace(5.0, 20.0, 15001), ('x', 'y'))
+    for Scan in Scans:
+        Average.add(Scan['position'], Scan)
+    Average.mean['x'], Average.std('x'), Average.count
+"""
+import numpy as np
+
+
+def resample(grid, positions, values):
+    """Return values measured at positions, linearly interpolated on grid.
+
+    positions may be decreasing (backward sweep). Grid points outside of
+    the positions, or next to a NaN value, are given NaN.
+    """
+    positions = np.asarray(positions, dtype = float)
+    values = np.asarray(values, dtype = float)
+    valid = np.isfinite(positions)
+    if not valid.all():
+        positions = positions[valid]
+        values = values[valid]
+    if len(positions) > 1 and positions[0] > positions[-1]:
+        positions = positions[::-1]
+        values = values[::-1]
+    if len(positions) == 0:
+        return np.full(len(grid), np.nan)
+    # NaN values propagate to the neighbouring grid points.
+    return np.interp(grid, positions, values, left = np.nan,
+            right = np.nan)
+
+
+class Pass_Average(object):
+    """Running mean and variance of scans on a common position grid.
+
+    Arguments:
+        grid : Increasing array of the positions (mm) of the average.
+        fields : Names of the averaged signals, e.g. ('x', 'y').
+
+    Attributes:
+        count : Number of passes that covered each grid point.
+        passes : Number of passes added.
+        mean : Dict of the running mean of each field.
+    """
+
+    def __init__(self, grid, fields = ('x', 'y')):
+        self.grid = np.asarray(grid, dtype = float)
+        self.fields = tuple(fields)
+        self.clear()
+
+    def clear(self):
+        """Forget all passes."""
+        self.passes = 0
+        self.count = np.zeros(len(self.grid), dtype = np.int64)
+        self.mean = {field: np.zeros(len(self.grid)) for field in
+                self.fields}
+        self._m2 = {field: np.zeros(len(self.grid)) for field in
+                self.fields}
+
+    def add(self, positions, sample):
+        """Fold one pass into the average.
+
+        Arguments:
+            positions : Positions (mm) of the samples of the pass,
+                increasing or decreasing.
+            sample : Dict of arrays or structured array with the fields.
+
+        Grid points not covered by the pass, or where a field is NaN, are
+        left unchanged.
+
+        Returns:
+            The pass resampled on the grid, dict of arrays of the fields.
+        """
+        values = {field: resample(self.grid, positions, sample[field]) for
+                field in self.fields}
+        covered = np.ones(len(self.grid), dtype = bool)
+        for field in self.fields:
+            covered &= np.isfinite(values[field])
+        self.passes += 1
+        if not covered.any():
+            return values
+        self.count += covered
+        n = self.count[covered]
+        for field in self.fields:
+            mean = self.mean[field]
+            value = values[field][covered]
+            delta = value - mean[covered]
+            mean[covered] += delta/n
+            self._m2[field][covered] += delta*(value - mean[covered])
+        return values
+
+    def variance(self, field):
+        """Return the sample variance of a field (NaN below 2 passes)."""
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return np.where(self.count > 1,
+                    self._m2[field]/(self.count - 1), np.nan)
+
+    def std(self, field):
+        """Return the standard deviation of a field between passes."""
+        return np.sqrt(self.variance(field))
+
+    def stderr(self, field):
+        """Return the standard error of the mean of a field."""
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return self.std(field)/np.sqrt(self.count)
+
+    def result(self):
+        """Return the average as a dict of arrays: 'position', 'count' and
+        for each field its mean and standard error ('x', 'x_err', ...).
+        Grid points that no pass covered are NaN."""
+        Result = {'position': self.grid, 'count': self.count.copy()}
+        empty = self.count == 0
+        for field in self.fields:
+            Result[field] = np.where(empty, np.nan, self.mean[field])
+            Result[field + '_err'] = self.stderr(field)
+        return Result
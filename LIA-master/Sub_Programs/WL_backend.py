@@ -6,28 +6,95 @@
 # -*- coding: utf-8 -*-
 ###################################################################
 #Package :
+#   Threads :
+import threading
+import queue
 #   tkinter :
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
 from tkinter import messagebox
-# Pipython :
-import pipython
-from pipython import GCSDevice
-from pipython import gcscommands
-from pipython import datarectools, pitools
-# Matplotlib :
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2TkAgg
-from matplotlib.figure import Figure
+from tkinter import simpledialog
 # Pathlib :
 from pathlib import Path
 from pathlib import PurePath
-#Zurich Instruments
-import zhinst.utils as utils
-import zhinst.ziPython as ziPython
+#Sub_Programs
+from Sub_Programs.WL_events import BUS
+from Sub_Programs.WL_defaults import DEFAULT_OVERSAMPLING
+#pipython, matplotlib, numpy and zhinst take seconds to import: they are
+#imported where they are first used, so that the window shows first, and
+#Warm_Up() loads them in the background meanwhile.
 #####
+#Maximum refresh rate of the live plot [frames/s]
+PLOT_FPS = 20
+#Points drawn by the live plot (min-max buckets)
+PLOT_POINTS = 2000
+#Points per segment of the spectrum updated after each pass
+LIVE_SEGMENT = 8192
+#Demodulator fields averaged over the passes: the fringes and the aux
+#inputs, one of which may carry the DC output of the detector
+AVERAGED_FIELDS = ('x', 'y', 'auxin0', 'auxin1')
+#DC level of the detector used for the visibility: measured on the
+#baseline of X away from the fringes, or on an aux input of the lock-in
+DC_LEVEL_SOURCES = {'Baseline': 'baseline', 'Aux In 1': 'auxin0',
+        'Aux In 2': 'auxin1'}
+#Lock-in nodes set by Zi_settings, kept in the node cache
+CONFIG_NODES = ('sigins/*/ac', 'sigins/*/imp50', 'sigins/*/scaling',
+        'demods/*/enable', 'demods/*/phaseshift', 'demods/*/rate',
+        'demods/*/adcselect', 'demods/*/order', 'demods/*/timeconstant',
+        'demods/*/oscselect', 'demods/*/harmonic', 'oscs/*/freq',
+        'sigouts/*/on', 'sigouts/*/enables/*')
+#Modules imported in the background by Warm_Up
+WARM_UP_MODULES = ('numpy', 'matplotlib', 'matplotlib.figure',
+        'matplotlib.backends.backend_tkagg', 'pipython', 'zhinst.ziPython',
+        'zhinst.utils', 'scipy.io')
+#####
+class Motion_Worker(threading.Thread):
+    #Runs the stage commands (referencing, moves, sweeps) one after the
+    #other on its own thread, so that waiting for the stage never blocks
+    #the Tk loop. The commands report back with 'motion/<kind>' events on
+    #the event bus, handled on the Tk thread (see PI_control).
+    def __init__(self):
+        threading.Thread.__init__(self, name = 'Motion_Worker')
+        self.daemon = True
+        self.Commands = queue.Queue()
+        self.Stop_Request = threading.Event()
+
+    def Submit(self, Func, *args):
+        self.Commands.put((Func, args))
+
+    def Report(self, Kind, Value = None):
+        BUS.publish('motion/' + Kind, Value)
+
+    def Stop(self):
+        #Halts the running command and drops the queued ones; the flag is
+        #cleared when the next command starts
+        self.Stop_Request.set()
+        Closed = False
+        while True:
+            try:
+                Func, args = self.Commands.get_nowait()
+            except queue.Empty:
+                break
+            Closed = Closed or Func is None
+        if Closed:
+            self.Close()
+
+    def Close(self):
+        self.Commands.put((None, ()))
+
+    def run(self):
+        while True:
+            Func, args = self.Commands.get()
+            if Func is None:
+                break
+            self.Stop_Request.clear()
+            try:
+                Func(*args)
+            except Exception as e:
+                self.Report('error', str(e))
+            self.Report('done', Func.__name__)
+
 class PI_Connection_Method(ttk.Labelframe):
     def __init__(self, parent, name):
         ttk.Labelframe.__init__(self, parent)
@@ -146,6 +213,13 @@ class PI_Connection_Method(ttk.Labelframe):
         ####
         self.CButton.grid(row = 8, column = 0, columnspan = 2
                 ,sticky ="we", padx = 2, pady = 2)
+        #The connection runs on a thread, the results come back as events
+        BUS.subscribe('pi/connected', self.Connected)
+        BUS.subscribe('pi/choose', self.Choose_device)
+        BUS.subscribe('pi/message', lambda Msg : messagebox.showinfo(
+            message = Msg, title = 'Connection Succesfull'))
+        BUS.subscribe('pi/error', lambda Msg : messagebox.showinfo(
+            icon = 'error', title = 'WARNING', message = Msg))
 
 
     def Input_show(self,Lst,value):
@@ -236,7 +310,14 @@ class PI_Connection_Method(ttk.Labelframe):
         else: print("No Input")
 
     def Connect_device(self,value,read):
+        #Opening the connection (and the GCS dialog) blocks: it runs on a
+        #thread which publishes 'pi/connected', 'pi/choose' or 'pi/error'
         print("Devices Connecting")
+        threading.Thread(target = self.Connect, args = (value,read),
+                name = 'PI_Connection', daemon = True).start()
+
+    def Connect(self,value,read):
+        from pipython import GCSDevice
 
         def Dialog_connect(M_read):
 
@@ -246,36 +327,24 @@ class PI_Connection_Method(ttk.Labelframe):
             if len(M_read) == 1:
                 gcs.InterfaceSetupDlg()
             else: gcs.InterfaceSetupDlg(M_read[1])
-            messagebox.showinfo(message ='Device: {}\n connected'.format(gcs.qIDN().strip()) ,title = 'Connection Succesfull')
-            self.Devices_connected[M_read[0]] = gcs
+            self.Publish_device(M_read[0],gcs)
 
         def Interface_connect(M_read):
             print("Interface")
             print("Not ready yet")
 
         def Identification_connect(M_read):
+            #The device is chosen in a dialog on the Tk thread
             if list(M_read.keys())[0] == 0:
                 gcs = GCSDevice('C-891')
                 devices = gcs.EnumerateUSB(mask = M_read[0])
-                for i, device in enumerate(devices):
-                    print('{} - {}'.format(i, device))
-                item = int(input('Select device to connect: '))
-                gcs.ConnectUSB(devices[item])
-                messagebox.showinfo(message ='Device: {}\nconnected'.format(gcs.qIDN().strip()) , title = 'Connection Succesfull')
-                self.Devices_connected[M_read[0]] = gcs
-                self.connected = True
-                gcs.SVO('1',0)
+                BUS.publish('pi/choose', (M_read[0],gcs,devices,'USB'))
 
             elif list(M_read.keys())[0] == 1:
 
                 gcs = GCSDevice(M_read[0])
                 devices = gcs.EnumerateTCPIPDevices(mask = M_read[0])
-                for i, device in enumerate(devices):
-                    print('{} - {}'.format(i, device))
-                item = int(input('Select device to connect:'))
-                gcs.ConnectTCPIPByDescription(devices[item])
-                messagebox.showinfo(message ='Device: {}\n connected'.format(gcs.qIDN().strip()) ,title = 'Connection Succesfull')
-                self.Devices_connected[M_read[0]] = gcs
+                BUS.publish('pi/choose', (M_read[0],gcs,devices,'TCPIP'))
 
         def Daisy_connect(M_read):
             print("Daisy Chain")
@@ -285,7 +354,51 @@ class PI_Connection_Method(ttk.Labelframe):
                 1: Interface_connect,
                 2: Identification_connect,
                 3: Daisy_connect}
-        Option[value](read)
+        try:
+            Option[value](read)
+        except Exception as e:
+            BUS.publish('pi/error', str(e))
+
+    def Choose_device(self,Choice):
+        #Tk thread: replaces the input() prompt of the console
+        Key, gcs, devices, Kind = Choice
+        if not devices:
+            messagebox.showinfo(icon = 'error', title = 'WARNING',
+                    message = 'No device found')
+            return
+        Lst = '\n'.join('{} - {}'.format(i, device) for i, device in
+                enumerate(devices))
+        item = simpledialog.askinteger('Select device', Lst +
+                '\n\nSelect device to connect:', parent = self,
+                minvalue = 0, maxvalue = len(devices) - 1)
+        if item is None:
+            return
+        threading.Thread(target = self.Connect_chosen,
+                args = (Key,gcs,devices[item],Kind),
+                name = 'PI_Connection', daemon = True).start()
+
+    def Connect_chosen(self,Key,gcs,device,Kind):
+        try:
+            if Kind == 'USB':
+                gcs.ConnectUSB(device)
+                gcs.SVO('1',0)
+            else:
+                gcs.ConnectTCPIPByDescription(device)
+            self.Publish_device(Key,gcs)
+        except Exception as e:
+            BUS.publish('pi/error', str(e))
+
+    def Publish_device(self,Key,gcs):
+        #Connection thread: the devices connected so far and this one
+        BUS.publish('pi/message', 'Device: {}\nconnected'.format(
+            gcs.qIDN().strip()))
+        Devices = dict(self.Devices_connected)
+        Devices[Key] = gcs
+        BUS.publish('pi/connected', Devices)
+
+    def Connected(self,Devices):
+        self.Devices_connected = Devices
+        self.connected = True
 ###########
 class Zi_Connection_Method(ttk.Labelframe):
     def __init__(self, parent, name):
@@ -298,26 +411,28 @@ class Zi_Connection_Method(ttk.Labelframe):
         self.proprieties = {}
 
         def Call_device(TxtVariable):
-            Called_id = TxtVariable.get()
+            #The session is opened on a thread, the result comes back as
+            #a 'zi/connected' or 'zi/error' event
+            threading.Thread(target = Connect, args = (TxtVariable.get(),),
+                    name = 'Zi_Connection', daemon = True).start()
+
+        def Connect(Called_id):
+            import zhinst.utils as utils
             # Make it variables
             api_level = 6
             dev_type = 'UHF'
-            (daq , dev , prop) = utils.create_api_session(
-                    Called_id, api_level, dev_type)
-            if not api_server_version_check(daq):
-                messagebox.showinfo(icon = 'info',title='DAQ Version',
-                        message = 'ziDataServer not up to date')
-            else :
-                messagebox.showinfo(icon = 'info',title='DAQ Version',
-                        message = 'ziDataServer is up to date')
-            if DAQ != ():
-                self.connected = True
-                self.DAQ = daq
-                self.device_id = dev
-                self.proprieties = prop
-                messagebox.showinfo( message = 'Zurich Instrument'+
-                'device is connected', title = 'Information')
+            try:
+                (daq , dev , prop) = utils.create_api_session(
+                        Called_id, api_level, dev_type)
+                Up_to_date = utils.api_server_version_check(daq)
+            except Exception as e:
+                BUS.publish('zi/error', str(e))
+                return
+            BUS.publish('zi/connected', (daq, dev, prop, Up_to_date))
 
+        BUS.subscribe('zi/connected', self.Connected)
+        BUS.subscribe('zi/error', lambda Msg : messagebox.showinfo(
+            icon = 'error', title = 'WARNING', message = Msg))
 
 
         DevVar = tk.StringVar()
@@ -333,13 +448,166 @@ class Zi_Connection_Method(ttk.Labelframe):
         self.CButton.grid(row = 1, column = 0, sticky = 'n',
                 columnspan = 2, padx = 2, pady = 2)
 
-###########
-class Graphic(tk.Canvas):
-    def __init__(self,parent,width,height):
+    def Connected(self, Session):
+        daq, dev, prop, Up_to_date = Session
+        if not Up_to_date:
+            messagebox.showinfo(icon = 'info',title='DAQ Version',
+                    message = 'ziDataServer not up to date')
+        else :
+            messagebox.showinfo(icon = 'info',title='DAQ Version',
+                    message = 'ziDataServer is up to date')
+        self.connected = True
+        self.DAQ = daq
+        self.device_id = dev
+        self.proprieties = prop
+        messagebox.showinfo( message = 'Zurich Instrument'+
+        'device is connected', title = 'Information')
 
-        tk.Canvas.__init__(self,parent)
-        tk.Canvas.configure(self, width = width, height = height)
-        tk.Canvas.configure(self, background = "yellow")
+###########
+def Warm_Up(Modules = WARM_UP_MODULES):
+    #Import the heavy modules on a daemon thread once the window is shown,
+    #so that they are usually loaded before they are first used. Each
+    #import publishes 'warmup/<module>' with None, or the error message if
+    #the module cannot be imported.
+    def Run():
+        import importlib
+        for Name in Modules:
+            try:
+                Module = importlib.import_module(Name)
+                if Name == 'matplotlib':
+                    Module.use('TkAgg')
+            except Exception as e:
+                BUS.publish('warmup/' + Name, str(e))
+            else:
+                BUS.publish('warmup/' + Name, None)
+    Thread = threading.Thread(target = Run, name = 'Warm_Up', daemon = True)
+    Thread.start()
+    return Thread
+
+class Graphic(ttk.Frame):
+    #Live plot of the demodulator samples. The samples are read from a
+    #ring buffer (zhinst.ringbuffer) at most Fps times per second, reduced
+    #to PLOT_POINTS min-max points and only the line is redrawn over the
+    #saved background (blitting). The full figure is only redrawn when the
+    #axes limits change.
+    #A placeholder is shown until matplotlib is loaded by Warm_Up; the
+    #figure is built then, or on the first Attach/Plot.
+    def __init__(self,parent,width,height,Fps = PLOT_FPS):
+        ttk.Frame.__init__(self,parent)
+        self.Fps = Fps
+        self.Size = (width, height)
+        self.Canvas = None
+        self.Title_Text = ''
+        self.Placeholder = ttk.Label(self, text = 'Loading plot...',
+                anchor = 'center')
+        self.Placeholder.grid(row = 0, column = 0, sticky = 'nsew',
+                ipadx = width//3, ipady = height//3)
+        self.Background = None
+        self.Ring = None
+        self.Seen = 0
+        BUS.subscribe('warmup/matplotlib.backends.backend_tkagg',
+                self.Loaded)
+        self.after(int(1000/self.Fps), self.Update)
+
+    def Loaded(self,Error):
+        if Error is None:
+            self.Build()
+        else:
+            self.Placeholder.configure(text = 'No plot:\n' + Error)
+
+    def Build(self):
+        #Tk thread only; the imports are immediate once warmed up
+        if self.Canvas is not None:
+            return
+        import matplotlib
+        matplotlib.use('TkAgg')
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        from Sub_Programs.WL_decimation import MinMax_Decimator
+        Dpi = 100
+        width, height = self.Size
+        self.Figure = Figure(figsize = (width/Dpi, height/Dpi), dpi = Dpi)
+        self.Axes = self.Figure.add_subplot(111)
+        self.Axes.set_title(self.Title_Text)
+        self.Line, = self.Axes.plot([], [], lw = 0.8, animated = True)
+        self.Decimator = MinMax_Decimator(PLOT_POINTS)
+        self.Canvas = FigureCanvasTkAgg(self.Figure, master = self)
+        self.Canvas.mpl_connect('draw_event', self.Save_Background)
+        self.Placeholder.destroy()
+        self.Canvas.get_tk_widget().grid(row = 0, column = 0,
+                sticky = 'nsew')
+
+    def Title(self,Text):
+        self.Title_Text = Text
+        if self.Canvas is not None:
+            self.Axes.set_title(Text)
+            self.Canvas.draw_idle()
+
+    def Attach(self,Ring,Clockbase,Field = None):
+        #Plot the samples appended to Ring from now on; Field is the
+        #sample field or a function of the samples, default R
+        import numpy as np
+        self.Build()
+        self.Ring = Ring
+        self.Clockbase = float(Clockbase)
+        self.Field = Field or (lambda S: np.hypot(S['x'], S['y']))
+        self.Seen = Ring.total
+        self.T0 = None
+        self.Decimator.clear()
+        self.Axes.set_xlabel('Time [s]')
+
+    def Plot(self,X,Y,Xlabel = None):
+        #Static data, e.g. the averaged interferogram; X increasing
+        self.Build()
+        self.Ring = None
+        if Xlabel is not None:
+            self.Axes.set_xlabel(Xlabel)
+        self.Decimator.clear()
+        self.Decimator.add(X,Y)
+        self.Draw_Line(Grow = 1.0)
+
+    def Save_Background(self,event):
+        self.Background = self.Canvas.copy_from_bbox(self.Axes.bbox)
+        self.Axes.draw_artist(self.Line)
+
+    def Update(self):
+        if self.Ring is not None and self.Ring.total != self.Seen:
+            #The poll thread keeps appending: read up to one total and
+            #copy before the samples are overwritten
+            Total = self.Ring.total
+            New = self.Ring.since(self.Seen,Total).copy()
+            self.Seen = Total
+            if len(New):
+                if self.T0 is None:
+                    self.T0 = New['timestamp'][0]
+                Field = self.Field
+                Y = New[Field] if isinstance(Field, str) else Field(New)
+                self.Decimator.add((New['timestamp'] - self.T0)/
+                        self.Clockbase, Y)
+                self.Draw_Line()
+        self.after(int(1000/self.Fps), self.Update)
+
+    def Draw_Line(self,Grow = 1.5):
+        import numpy as np
+        X, Y = self.Decimator.data()
+        self.Line.set_data(X, Y)
+        if not len(X):
+            return
+        (X0, X1), (Y0, Y1) = self.Axes.get_xlim(), self.Axes.get_ylim()
+        Ymin, Ymax = np.nanmin(Y), np.nanmax(Y)
+        if (self.Background is None or X[0] < X0 or X[-1] > X1 or
+                Ymin < Y0 or Ymax > Y1):
+            #New limits with some room, the background is saved again
+            #by the draw_event
+            Pad = 0.1*(Ymax - Ymin) or 1.0
+            Span = (X[-1] - X[0]) or 1.0
+            self.Axes.set_xlim(X[0], X[0] + Grow*Span)
+            self.Axes.set_ylim(Ymin - Pad, Ymax + Pad)
+            self.Canvas.draw_idle()
+            return
+        self.Canvas.restore_region(self.Background)
+        self.Axes.draw_artist(self.Line)
+        self.Canvas.blit(self.Axes.bbox)
 
 class File_interaction(ttk.Labelframe):
     def __init__(self, parent, text):
@@ -430,6 +698,43 @@ class PI_control(ttk.Labelframe):
         ttk.Labelframe.configure(self, labelwidget = text)
         ####
         self.Devices = {'Test':0}
+        #Position traces of the data recorder, one per sweep
+        self.Records = []
+        #Motion commands run on the worker, events are read every
+        #MOTION_POLL_MS on the Tk thread
+        self.Progress = tk.DoubleVar()
+        self.Position = {}
+        #Lock-in (DAQ, device id) triggered by the stage in flyscan mode
+        self.Lockin = None
+        #Demodulator selected in Zi_settings (tk.IntVar)
+        self.Demod = None
+        #Ring buffer of the streamed demodulator samples and the streaming
+        #latency (s), fused with the recorded positions in sweep mode
+        self.Ring = None
+        self.Latency = 0.0
+        #Last sweep pass fused with its positions
+        self.Pass = None
+        #Average of the sweep or flyscan passes on a common position grid
+        self.Average = None
+        #Envelope, ZPD and visibility of the averaged interferogram
+        self.Result = None
+        self.Spectrum = None
+        #Source of the DC level of the detector (DC_LEVEL_SOURCES)
+        self.Level_Source = 'baseline'
+        #Spectrum of the average updated after each pass
+        #(WL_spectrum.Streaming_Spectrum), shown with 'motion/spectrum'
+        self.Live = None
+        self.Worker = Motion_Worker()
+        self.Worker.start()
+        BUS.subscribe('motion/message', lambda Msg :
+                messagebox.showinfo(message = Msg))
+        BUS.subscribe('motion/error', lambda Msg :
+                messagebox.showinfo(icon = 'error', title = 'WARNING',
+                    message = Msg))
+        BUS.subscribe('motion/progress', self.Progress.set, latest = True)
+        BUS.subscribe('motion/on_target', self.Position.update)
+        BUS.subscribe('motion/range', self.Set_Range)
+        BUS.subscribe('motion/plan', self.Set_Plan)
         self.No_dev = tk.Label(self,
                 text = "There is no devices connected")
         if not self.Devices:
@@ -463,17 +768,15 @@ class PI_control(ttk.Labelframe):
     def Create_commands(self,parent,Device):
         if Device != 0:
             Axe1 = Device.axes[0]
-            if Device.HasEAX() is True:
-                Device.EAX(Axe1,True)
-                self.Calibration(Device, Axe1)
-            else:print('heeeelo')
+            #Reference mode and calibration on the motion worker
+            self.Worker.Submit(self.Prepare_Axis,Device,Axe1)
         NbrIte = tk.IntVar()
         NbrIte.set(1)
         MPos = tk.DoubleVar()
         mPos = tk.DoubleVar()
         if Device != 0:
-            MPos.set(Device.qTMX(Axe1))
-            mPos.set(Device.qTMN(Axe1))
+            #Travel range read on the motion worker, after the calibration
+            self.Worker.Submit(self.Read_Range,Device,Axe1,MPos,mPos)
         LNbrIte = tk.Label(parent, text = 'Nomber of iteration')
         LMPos = tk.Label(parent, text = "Max: Position")
         LmPos = tk.Label(parent, text = "Min: Position")
@@ -487,17 +790,44 @@ class PI_control(ttk.Labelframe):
         LETA = tk.Label(parent, text = "Time for a measurement")
         NbrSmpE = ttk.Entry(parent, width = 8, textvariable = NbrSmp)
         ETAE = ttk.Entry(parent, width = 8, textvariable = ETA)
-        SpScaleVar = {1:'Precise',2:'Medium',3:'Fast',4:'U-Fast'}
-        SpScale = tk.Scale(parent, orient='horizontal', from_=1,
-                to = 4, command = lambda x:
-                self.See_val(SpScale,SpScaleVar),
-                label = 'Device Velocity: ', variable = SpScaleVar,
-                showvalue = False, length = 150)
+        #Scan velocity planned from the wavelength band and the lock-in
+        Band = ttk.Frame(parent)
+        Lmin = tk.DoubleVar()
+        Lmin.set(0.4)
+        Lmax = tk.DoubleVar()
+        Lmax.set(1.0)
+        Ovs = tk.IntVar()
+        Ovs.set(DEFAULT_OVERSAMPLING)
+        LBand = tk.Label(Band, text = 'Wavelength [um]: ')
+        LminE = ttk.Entry(Band, width = 5, textvariable = Lmin)
+        LmaxE = ttk.Entry(Band, width = 5, textvariable = Lmax)
+        LOvs = tk.Label(Band, text = 'Samples per fringe: ')
+        OvsE = ttk.Entry(Band, width = 5, textvariable = Ovs)
+        Level_Var = tk.StringVar()
+        Level_Var.set('Baseline')
+        LLevel = tk.Label(Band, text = 'DC level: ')
+        LevelCB = ttk.Combobox(Band, width = 9, textvariable = Level_Var,
+                state = 'readonly')
+        LevelCB['values'] = tuple(DC_LEVEL_SOURCES)
+        LBand.grid(row = 0, column = 0, sticky = 'w')
+        LminE.grid(row = 0, column = 1, sticky = 'w')
+        LmaxE.grid(row = 0, column = 2, sticky = 'w')
+        LOvs.grid(row = 1, column = 0, sticky = 'w')
+        OvsE.grid(row = 1, column = 1, sticky = 'w')
+        LLevel.grid(row = 2, column = 0, sticky = 'w')
+        LevelCB.grid(row = 2, column = 1, columnspan = 2, sticky = 'w')
+        Rec_Var = tk.IntVar()
+        Rec = ttk.Checkbutton(parent, text = 'Record positions',
+                variable = Rec_Var)
+        Fly_Var = tk.IntVar()
+        Fly = ttk.Checkbutton(parent, text = 'Flyscan (HW trigger)',
+                variable = Fly_Var)
         Strt = ttk.Button(parent, text = 'Start', command =
-                lambda : self.Do_Mesure(MPos,mPos,SpScale,NbrIte,
-                    NbrSmp,ETA,Device,Axe1))
+                lambda : self.Do_Mesure(MPos,mPos,(Lmin,Lmax,Ovs),NbrIte,
+                    NbrSmp,ETA,Device,Axe1,Rec_Var,Fly_Var,Level_Var))
         Cal = ttk.Button(parent,text = 'Calibration',
                 command = lambda : self.Calibration(Device,Axe1))
+        Stp = ttk.Button(parent, text = 'Stop', command = self.Stop_Motion)
         LMPos.grid(row = 0, column = 0, sticky = "w",
                 padx = 2, pady = 2)
         LmPos.grid(row = 2, column = 0, sticky = "w",
@@ -516,34 +846,93 @@ class PI_control(ttk.Labelframe):
                 padx = 2, pady = 2)
         Cal.grid(row = 5, column = 0, columnspan = 2,
                 sticky = "we", padx = 2, pady = 2)
-        SpScale.grid(row = 0, column = 2, padx = 2, pady = 2,
+        Band.grid(row = 0, column = 2, padx = 2, pady = 2,
                 sticky = 'w')
         Strt.grid(row = 5, column = 2, padx = 2, pady = 2,
                 sticky ='ew')
+        Stp.grid(row = 6, column = 2, padx = 2, pady = 2,
+                sticky ='ew')
         LNbrIte.grid(row = 1, column = 2, padx = 2, pady = 2,
                 sticky = 'w')
         NbrIteE.grid(row = 2, column = 2, padx = 2, pady = 2,
                 sticky = 'w')
-        Speed = 250*int(SpScale.get()+1)
+        Rec.grid(row = 3, column = 2, padx = 2, pady = 2,
+                sticky = 'w')
+        Fly.grid(row = 4, column = 2, padx = 2, pady = 2,
+                sticky = 'w')
         try: Axe1
         except UnboundLocalError:
             Axe1 = ''
         else: pass
 
-        List_PI = [ MPos, mPos, Speed, NbrSmp, NbrIte,
-                ETA, Device , Axe1 ]
+        List_PI = [ MPos, mPos, (Lmin, Lmax, Ovs), NbrSmp, NbrIte,
+                ETA, Device , Axe1, Rec_Var, Fly_Var ]
 
         return (List_PI)
 
 
-    def See_val(self,Objet,Var):
-        Objet.configure(label = 'Device Velocity: {}'.format(Var[int(Objet.get())]))
-
-    def Actu_POS(self,Dev,Axe,Max,Min):
-        Dev.MOV(Axe,Max)
-        pitools.waitontarget(Device)
-        Dev.MOV(Axe,Min)
-        pitools.waitontarget(Device)
+    def Prepare_Axis(self,Dev,Axe):
+        #Motion worker: reference switch mode and calibration of Axe
+        if Dev.HasEAX() is True:
+            Dev.EAX(Axe,True)
+            self.Run_Calibration(Dev,Axe)
+
+    def Read_Range(self,Dev,Axe,MPos,mPos):
+        #Motion worker: travel range of Axe, shown in MPos and mPos
+        from Sub_Programs import WL_scan
+        Min, Max = WL_scan.travel_range(Dev,Axe)
+        self.Worker.Report('range', (MPos,mPos,Min,Max))
+
+    def Set_Range(self,Value):
+        MPos, mPos, Min, Max = Value
+        MPos.set(Max)
+        mPos.set(Min)
+
+    def Actu_POS(self,Dev,Axe,Max,Min,Rec = None):
+        self.Worker.Submit(self.Sweep,Dev,Axe,Max,Min,Rec)
+
+    def Sweep(self,Dev,Axe,Max,Min,Rec = None,On_Pass = None):
+        #Motion worker: one forward and backward sweep. With a recorder
+        #and a streaming lock-in, the samples of each move are fused with
+        #its recorded positions and passed to On_Pass.
+        from Sub_Programs import WL_scan
+        Clock = None
+        if Rec is not None and self.Ring is not None:
+            Clock = lambda : WL_scan.device_time(*self.Lockin)
+        for Target in (Max,Min):
+            Seen = self.Ring.total if Clock is not None else 0
+            Record = WL_scan.move(Dev,Axe,Target,Rec,
+                    self.Worker.Stop_Request,Clock)
+            if self.Worker.Stop_Request.is_set():
+                return
+            self.Worker.Report('on_target', {Axe: Target})
+            if Record is None:
+                continue
+            self.Records.append(Record)
+            if Clock is not None:
+                self.Pass = self.Fuse_Pass(Record,Seen)
+                if On_Pass is not None:
+                    On_Pass(self.Pass)
+
+    def Fuse_Pass(self,Record,Seen):
+        #Samples streamed since the ring held Seen samples, with the
+        #positions of the recorder trace
+        import time
+        from Sub_Programs.WL_fusion import fuse_record
+        DAQ, Device_id = self.Lockin
+        #Wait for the samples of the end of the move
+        time.sleep(self.Latency)
+        Sample = self.Ring.since(Seen).copy()
+        return fuse_record(Sample,Record,
+                DAQ.getInt('/%s/clockbase' % Device_id))
+
+    def Recorder_Init(self,Dev,Axe,Sweep_Time):
+        from Sub_Programs import WL_scan
+        return WL_scan.recorder_init(Dev,Axe,Sweep_Time)
+
+    def Read_Record(self,Rec):
+        from Sub_Programs import WL_scan
+        return WL_scan.read_record(Rec)
 
 
     def Actu_Sp(self,Dev,Axe,Speed):
@@ -551,28 +940,227 @@ class PI_control(ttk.Labelframe):
 
 
     def Calibration(self,Dev,Axe):
-        Dev.FRF()
-        i = 0
-        while Dev.IsControllerReady() != 1:
-            if i == 0:
-                messagebox.showinfo(message = 'Wait until the orange light is closed')
-                i +=1
-        if Dev.IsControllerReady() == 1:
-            messagebox.showinfo(message = 'Device is ready')
-            Dev.SVO(Axe, 1)
+        if not self.Has_Stage(Dev):
+            return
+        self.Worker.Submit(self.Run_Calibration,Dev,Axe)
+
+    def Has_Stage(self,Device):
+        #Device is 0 for the placeholder shown without a PI controller
+        if Device == 0:
+            messagebox.showinfo(icon = 'error', title = 'WARNING',
+                    message = 'There is no stage connected')
+            return False
+        return True
+
+    def Run_Calibration(self,Dev,Axe):
+        #Motion worker: reference the axis without a busy loop
+        from Sub_Programs import WL_scan
+        self.Worker.Report('message',
+                'Wait until the orange light is closed')
+        if WL_scan.reference(Dev,Axe,
+                stop_request = self.Worker.Stop_Request):
+            self.Worker.Report('message', 'Device is ready')
+        elif self.Worker.Stop_Request.is_set():
+            self.Worker.Report('message', 'Calibration stopped')
         else:
-            messagebox.showinfo(message = 'Calibration failed')
-
-    def Do_Mesure(self,Max,Min,Vel,Ite,Sample,T,Device,Axe):
+            self.Worker.Report('message', 'Calibration failed')
+
+    def Set_Lockin(self,DAQ,Device_id,Ring = None,Latency = 0.0,
+            Demod = None):
+        self.Lockin = (DAQ, Device_id)
+        self.Demod = Demod
+        self.Ring = Ring
+        self.Latency = Latency
+
+    def Plan_Scan(self,Device,Axe,MaxPos,MinPos,Band,Demod = 0):
+        #Motion worker: fastest velocity allowed by the demodulator filter
+        #and rate for the wavelength band (Lmin, Lmax, Ovs), or by the
+        #stage alone without a lock-in
+        from Sub_Programs import WL_planner
+        Lmin, Lmax, Ovs = Band
+        Tc, Order, Rate = None, 1, None
+        if self.Lockin is not None:
+            Tc, Order, Rate = WL_planner.demod_settings(*self.Lockin,Demod)
+        Max_Vel, Acc = WL_planner.stage_limits(Device,Axe)
+        return WL_planner.plan_scan(MinPos,MaxPos,Lmin,Lmax,
+                Tc,Order,Rate,Ovs,Max_Vel,Acc)
+
+    def Set_Plan(self,Value):
+        T, Sweep_Time = Value
+        T.set(Sweep_Time)
+
+    def Selected_Demod(self):
+        return self.Demod.get() if self.Demod is not None else 0
+
+    def Do_Mesure(self,Max,Min,Band,Ite,Sample,T,Device,Axe,Rec_Var = None,
+            Fly_Var = None,Level_Var = None):
+        #Tk variables are read here, the plan and the sweeps run on the
+        #motion worker
+        if not self.Has_Stage(Device):
+            return
+        Fly = Fly_Var is not None and Fly_Var.get()
+        if Fly and self.Lockin is None:
+            messagebox.showinfo(icon = 'error', title = 'WARNING',
+                    message = 'The flyscan needs a connected lock-in')
+            return
         MaxPos = int(Max.get())
         MinPos = int(Min.get())
-        VelSet = 250*(int(Vel.get())+1)
-        T.set(((MaxPos-MinPos)/VelSet))
+        Band = tuple(Var.get() for Var in Band)
+        Record = Rec_Var is not None and Rec_Var.get()
+        if Level_Var is not None:
+            self.Level_Source = DC_LEVEL_SOURCES[Level_Var.get()]
+        self.Progress.set(0)
+        self.Worker.Submit(self.Start_Mesure,Device,Axe,MaxPos,MinPos,Band,
+                Ite.get(),int(Sample.get()),T,Record,Fly,
+                self.Selected_Demod())
+
+    def Start_Mesure(self,Device,Axe,MaxPos,MinPos,Band,Ite,Points,T,
+            Record,Fly,Demod = 0):
+        #Motion worker: plan the scan with the stage and lock-in settings,
+        #then run the sweeps or the flyscans
+        try:
+            Plan = self.Plan_Scan(Device,Axe,MaxPos,MinPos,Band,Demod)
+        except (ValueError, ZeroDivisionError) as e:
+            self.Worker.Report('error', 'Cannot plan the scan: {}'.format(e))
+            return
+        VelSet = Plan['velocity']
+        self.Worker.Report('plan', (T, Plan['sweep_time']))
+        if Fly:
+            from Sub_Programs import WL_planner
+            from Sub_Programs.WL_flyscan import max_velocity
+            Rate = WL_planner.demod_settings(*self.Lockin,Demod)[2]
+            #The trigger input is sampled with the demodulator: at most one
+            #trigger every second sample. Half the planned velocity keeps
+            #the step of the plan, which is then the finest step.
+            VelSet = min(VelSet,max_velocity(Plan['step'],Rate))
+            Step = Plan['step']
+            if Points < 2:
+                self.Worker.Report('message', 'No number of samples set, '
+                        'using the {} samples of the plan'.format(
+                            Plan['points']))
+            elif (MaxPos-MinPos)/(Points-1) < Step:
+                self.Worker.Report('message', '{} samples would trigger '
+                        'faster than half the demodulator rate, using {} '
+                        'samples'.format(Points,Plan['points']))
+            else:
+                Step = (MaxPos-MinPos)/(Points-1)
+            self.Run_Flyscan(Device,Axe,MaxPos,MinPos,Step,VelSet,Ite,Demod,
+                    Band[:2])
+        else:
+            self.Run_Mesure(Device,Axe,MaxPos,MinPos,VelSet,Ite,Record,
+                    Plan['margin'],Plan['step'],Band[:2])
+
+    def Run_Mesure(self,Device,Axe,MaxPos,MinPos,VelSet,Ite,Record,
+            Margin = 0.0,Step = None,Band = None):
+        #Motion worker: Ite forward and backward sweeps. With a streaming
+        #lock-in, each pass fused with its positions is folded into
+        #self.Average on a grid of one point every Step in [MinPos, MaxPos]
+        #and its spectrum in the wavelength Band is shown.
+        import numpy as np
+        from Sub_Programs import WL_scan
+        from Sub_Programs.WL_flyscan import trigger_positions
+        from Sub_Programs.WL_averaging import Pass_Average
+        #Accelerate and let the filter settle outside of the range
+        Tmin, Tmax = WL_scan.travel_range(Device,Axe)
+        End = min(MaxPos + Margin, Tmax)
+        Start = max(MinPos - Margin, Tmin)
         self.Actu_Sp(Device,Axe,VelSet)
+        Rec = None
+        self.Records = []
+        Add_Pass = None
+        #The positions are also recorded to be fused with the lock-in
+        if Record or self.Ring is not None:
+            #Sweep time with a margin for the acceleration
+            Rec = self.Recorder_Init(Device,Axe,
+                    2*abs(End-Start)/VelSet + 1)
+        if self.Ring is not None and Step is not None and np.isfinite(Step):
+            Grid = trigger_positions(MinPos,MaxPos,Step)
+            self.Average = Pass_Average(Grid,AVERAGED_FIELDS)
+            self.Live_Spectrum(len(Grid),Step)
+            def Add_Pass(Pass):
+                #Only the constant velocity part, where the positions are
+                #monotonic
+                Position = Pass['position']
+                Inside = (Position >= Grid[0]) & (Position <= Grid[-1])
+                self.Add_Live(self.Average.add(
+                    np.where(Inside,Position,np.nan),Pass),Band)
         i = 0
-        while i < Ite.get():
-            self.Actu_POS(Device,Axe,MaxPos,MinPos)
-        messagebox.showinfo('Device : Finished ')
+        while i < Ite and not self.Worker.Stop_Request.is_set():
+            self.Sweep(Device,Axe,End,Start,Rec,Add_Pass)
+            i += 1
+            self.Worker.Report('progress', i/Ite)
+        if Add_Pass is None or not self.Average.count.any():
+            self.Worker.Report('message', 'Device : Finished ')
+            return
+        self.Analyze_Average(Step,Band)
+
+    def Run_Flyscan(self,Device,Axe,MaxPos,MinPos,Step,VelSet,Ite,
+            Demod = 0,Band = None):
+        #Motion worker: Ite forward and backward continuous scans, the
+        #stage triggers one lock-in sample every Step. Each pass is folded
+        #into self.Average and dropped, its spectrum in the wavelength
+        #Band is shown.
+        from Sub_Programs.WL_flyscan import Fly_Scan, trigger_positions
+        from Sub_Programs.WL_averaging import Pass_Average
+        DAQ, Device_id = self.Lockin
+        Scan = Fly_Scan(Device,Axe,DAQ,Device_id,Demod,
+                signals = AVERAGED_FIELDS)
+        self.Average = Pass_Average(trigger_positions(MinPos,MaxPos,Step),
+                Scan.signals)
+        self.Live_Spectrum(len(self.Average.grid),Step)
+        i = 0
+        while i < Ite and not self.Worker.Stop_Request.is_set():
+            for Start, End in ((MinPos,MaxPos),(MaxPos,MinPos)):
+                if self.Worker.Stop_Request.is_set():
+                    break
+                Pass = Scan.Run(Start,End,Step,VelSet,
+                        stop_request = self.Worker.Stop_Request)
+                if self.Worker.Stop_Request.is_set():
+                    #Incomplete pass
+                    break
+                self.Add_Live(self.Average.add(Pass['position'],Pass),Band)
+            i += 1
+            self.Worker.Report('progress', i/Ite)
+        if not self.Average.count.any():
+            self.Worker.Report('message', 'Device : Finished ')
+            return
+        self.Analyze_Average(Step,Band)
+
+    def Live_Spectrum(self,Points,Step):
+        #Motion worker: new spectrum of the passes on a grid of Points
+        #points every Step mm
+        from Sub_Programs.WL_spectrum import Streaming_Spectrum
+        from Sub_Programs.WL_fusion import OPD_PER_MM
+        self.Live = Streaming_Spectrum(Points,Step*OPD_PER_MM,LIVE_SEGMENT)
+
+    def Add_Live(self,Values,Band = None):
+        #Motion worker: one pass resampled on the grid of the average
+        self.Live.add(Values['x'])
+        self.Worker.Report('spectrum', self.Live.spectrum(Band))
+
+    def Analyze_Average(self,Step,Band = None):
+        #Motion worker: envelope, ZPD, visibility and spectrum of
+        #self.Average, the spectrum of the whole grid replaces the live one.
+        #The DC level is the baseline of X or the mean of an aux input.
+        import numpy as np
+        from Sub_Programs import WL_analysis
+        from Sub_Programs import WL_spectrum
+        from Sub_Programs.WL_fusion import OPD_PER_MM
+        Mean = self.Average.result()
+        Level = self.Level_Source
+        if Level != 'baseline':
+            Level = np.nanmedian(Mean[Level])
+        self.Result = WL_analysis.analyze(Mean['x'],Mean['position'],
+                level = Level)
+        self.Spectrum = WL_spectrum.spectrum(Mean['x'],Step*OPD_PER_MM,
+                band = Band)
+        self.Worker.Report('spectrum', self.Spectrum)
+        self.Worker.Report('message', 'Device : Finished \n'
+                'ZPD at {:.4f} mm\nVisibility {:.3f}'.format(
+                    self.Result['zpd'],self.Result['visibility']))
+
+    def Stop_Motion(self):
+        self.Worker.Stop()
 
 
     def Reset(self,Device):
@@ -586,6 +1174,9 @@ class Zi_settings(ttk.Labelframe):
         ttk.Labelframe.__init__(self, parent)
         ttk.Labelframe.configure(self, labelwidget = text)
         self.Zi_Setting_List = {}
+        #Channels and values of the last configuration (Dev_Config_Init)
+        self.Selection = None
+        self.Accepted = {}
         List_Opt = []
 
         Demod_Var = tk.IntVar()
@@ -662,7 +1253,7 @@ class Zi_settings(ttk.Labelframe):
 
         Out_Scale_Var = tk.DoubleVar()
         Out_Scale = tk.Entry(self,  width = 4,
-                textvariable = Input_Scale_Var)
+                textvariable = Out_Scale_Var)
         L_Out_Scale= tk.Label(self, text = 'Output Scaling [X V'+
                 '/V]: ')
 
@@ -677,13 +1268,13 @@ class Zi_settings(ttk.Labelframe):
         L_Out_Offset= tk.Label(self, text = 'Output Offset [V]: ')
 
         Order_Var = tk.IntVar()
-        Order_SpinB = tk.Spinbox(self, from_ = 0 , to = 10, width = 2,
-                textvariable = Harm_Var)
+        Order_SpinB = tk.Spinbox(self, from_ = 1 , to = 8, width = 2,
+                textvariable = Order_Var)
         L_Order = tk.Label(self, text = 'Low-Pass Filer Order: ')
 
         DB_Var = tk.DoubleVar()
         DB = tk.Entry(self,  width = 4,
-                textvariable = Out_Offset_Var)
+                textvariable = DB_Var)
         L_DB = tk.Label(self, text = 'BW 3 dB: ')
 
 
@@ -738,56 +1329,101 @@ class Zi_settings(ttk.Labelframe):
         Config_Button.grid(row = rw + 1, column = 0, columnspan = 2,
                 sticky = 'w', padx = 2, pady = 2)
 
+    def Set_Device(self, DAQ, Device, Prop):
+        self.Zi_Setting_List['DAQ'] = DAQ
+        self.Zi_Setting_List['Device_id'] = tk.StringVar(value = Device)
+        self.Zi_Setting_List['Proprieties'] = Prop
+        self.Selection = None
+        self.Accepted = {}
+        #With a node cache (zhinst.nodecache), the configured nodes follow
+        #the device and comparing them costs no round trip
+        Track = getattr(DAQ, 'track', None)
+        if Track is not None:
+            Track(['/%s/%s' % (Device, Node) for Node in CONFIG_NODES])
+
+    def Config_Settings(self, DATA, out_mixer_channel):
+        #[path, value] of the nodes set for the selected channels
+        import zhinst.utils as utils
+        Dev = DATA['Device_id'].get()
+        Demod = DATA['Demodulator'].get()
+        Input = DATA['Input'].get()
+        Output = DATA['Output'].get()
+        Osc = DATA['Oscillator'].get()
+        Order = DATA['LowPassOrder'].get()
+        return [
+                ['/%s/sigins/%d/ac' % (Dev,Input), int(DATA['AC'].get() == 'Enabled')],
+                ['/%s/sigins/%d/imp50' % (Dev,Input), int(DATA['50 Ohm'].get() == 'Enabled')],
+                ['/%s/sigins/%d/scaling' % (Dev,Input), DATA['Input_Scale'].get()],
+                ['/%s/demods/%d/enable' % (Dev,Demod), 1],
+                ['/%s/demods/%d/phaseshift' % (Dev,Demod), DATA['Phase'].get()],
+                ['/%s/demods/%d/rate' % (Dev,Demod), DATA['Output_Rate'].get()],
+                ['/%s/demods/%d/adcselect' % (Dev,Demod), Input],
+                ['/%s/demods/%d/order' % (Dev,Demod), Order],
+                ['/%s/demods/%d/timeconstant' % (Dev,Demod),
+                    utils.bw2tc(DATA['LowPassDBValue'].get(), Order)],
+                ['/%s/demods/%d/oscselect' % (Dev,Demod), Osc],
+                ['/%s/demods/%d/harmonic' % (Dev,Demod), DATA['Harmonics'].get()],
+                ['/%s/oscs/%d/freq' % (Dev,Osc), DATA['Osc. Freq'].get()],
+                ['/%s/sigouts/%d/on' % (Dev,Output), 1],
+                ['/%s/sigouts/%d/enables/%d' % (Dev,Output,out_mixer_channel), 1],
+                ]
+
+    def Settings_Delta(self, DAQ, Settings):
+        #Settings whose value differs from the device, or from the value
+        #the device accepted the last time the same value was set (the
+        #device rounds e.g. the rate)
+        Delta = []
+        for Path, Value in Settings:
+            Current = DAQ.getDouble(Path)
+            if (abs(Current - Value) <= 1e-9*max(abs(Value), 1e-12) or
+                    self.Accepted.get(Path) == (Value, Current)):
+                continue
+            Delta.append([Path, Value])
+        return Delta
+
     def Dev_Config_Init(self, DATA):
+        import zhinst.utils as utils
         messagebox.showinfo(message = 'If the trigger button in <ON>'+
                 ' the oscillator will be automatically disabled for'+
                 ' for this demodulator.', icon = 'info', title =
                 'Information')
+        if not (1 <= DATA['LowPassOrder'].get() <= 8 and
+                DATA['LowPassDBValue'].get() > 0):
+            messagebox.showinfo(icon = 'error', title = 'WARNING',
+                    message = 'Set a low-pass filter order from 1 to 8'
+                    ' and a positive 3 dB bandwidth')
+            return
+        DAQ = DATA['DAQ']
+        Dev = DATA['Device_id'].get()
         out_mixer_channel = utils.default_output_mixer_channel(DATA['Proprieties'])
-        #First desactivate all input,scopes,Demodulator
-        Reset_settings = [
-                ['/%s/demods/*/enable' % DATA['Device_id'].get(),0],
-                ['/%s/demods/*/trigger' % DATA['Device_id'].get(),0],
-                ['/%s/sigout/*/enables/*' % DATA['Device_id'].get(),0],
-                ['/%s/scopes/*/enable' % DATA['Device_id'].get(),0]
-                ]
-        DATA['DAQ'].set(Reset_settings)
-        DATA['DAQ'].sync()
-
-        Input_setting = [
-                ['/%s/sigins/%d/ac' % (DATA['Device_id'].get(),DATA['Input'].get()), DATA['AC'].get() == 'Enable' ],
-                ['/%s/sigins/%d/imp50' % (DATA['Device_id'].get(),DATA['Input'].get()), DATA['50 Ohm'].get() == 'Enable' ],
-                ['/%s/sigins/%d/scaling' % (DATA['Device_id'].get(),DATA['Input'].get()), DATA['Input Scale'].get() ],
-                ['/%s/demods/%d/enable' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), 1],
-                ['/%s/demods/%d/phaseshift' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), DATA['Phase'].get()],
-                ['/%s/demods/%d/rate' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), DATA['Output_Rate'].get()],
-                ['/%s/demods/%d/adcselect' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), DATA['Input'].get()],
-                ['/%s/demods/%d/order' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), DATA['LowPassOrder'].get()],
-                ['/%s/demods/%d/timeconstant' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), utils(DATA['LowPassDBValue'],
-                    DATA['LowPassOrder'].get())],
-                ['/%s/demods/%d/oscselect' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), DATA['Oscillator'].get()],
-                ['/%s/demods/%d/harmonic' % (DATA['Device_id'].get(),DATA['Demodulator'].get()), DATA['Harmonics'].get()],
-                ['/%s/oscs/%d/freq' % (DATA['Device_id'].get(),DATA['Oscillator'].get()), DATA['Osc. Freq'].get()],
-                ['/%s/sigout/%d/on' % (DATA['Device_id'].get(),DATA['Output'].get()), 1],
-                ['/%s/sigout/%d/enables/%d' % (DATA['Device_id'].get(),DATA['Output'].get(),out_mixer_channel), 1],
-                ]
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        Settings = self.Config_Settings(DATA, out_mixer_channel)
+        #Desactivate all input, scopes and demodulators only when other
+        #channels are selected, then every setting is sent again.
+        #Otherwise only the settings that changed are sent.
+        Selection = (DATA['Demodulator'].get(), DATA['Input'].get(),
+                DATA['Output'].get(), DATA['Oscillator'].get(),
+                out_mixer_channel)
+        Reset = Selection != self.Selection
+        if Reset:
+            Reset_settings = [
+                    ['/%s/demods/*/enable' % Dev,0],
+                    ['/%s/demods/*/trigger' % Dev,0],
+                    ['/%s/sigouts/*/enables/*' % Dev,0],
+                    ['/%s/scopes/*/enable' % Dev,0]
+                    ]
+            Delta = Settings
+        else:
+            Reset_settings = []
+            Delta = self.Settings_Delta(DAQ, Settings)
+        if not Reset_settings and not Delta:
+            return
+        #One batched set, the nodes are applied in the order of the list
+        DAQ.set(Reset_settings + Delta)
+        #The values read back below are the ones the device applied
+        DAQ.sync()
+        if Reset:
+            self.Selection = Selection
+            #The live plot streams the configured demodulator
+            BUS.publish('zi/demod', Selection[0])
+        for Path, Value in Delta:
+            self.Accepted[Path] = (Value, DAQ.getDouble(Path))
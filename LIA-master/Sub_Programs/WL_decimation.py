@@ -0,0 +1,156 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Decimation of the samples for live plotting           #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Reduce millions of samples to a few thousand points for plotting.
+
+MinMax_Decimator keeps, for consecutive buckets of samples, the minimum and
+the maximum of the bucket. Plotting these two points per bucket draws the
+same envelope as the full data at screen resolution, fringes included.
+Blocks are added as they arrive. Whenever the number of buckets exceeds
+twice `points`, neighbouring buckets are merged two by two and the bucket
+size doubles, so the memory and the plotted points stay bounded however
+long the acquisition runs:
+
+    Decim = MinMax_Decimator(2000)
+    Decim.add(Sample['timestamp'], Sample['x'])
+    line.set_data(*Decim.data())
+
+lttb() (largest triangle three buckets) picks a given number of the
+original points that keep the visual shape. It runs on the output of the
+decimator, which keeps its cost bounded as well.
+"""
+import numpy as np
+
+
+def _extrema(x, y, bucket):
+    """Return (xmin, ymin, xmax, ymax) of every `bucket` consecutive
+    samples; the samples of an incomplete last bucket are ignored."""
+    count = len(y)//bucket
+    xb = x[:count*bucket].reshape(count, bucket)
+    yb = y[:count*bucket].reshape(count, bucket)
+    rows = np.arange(count)
+    lo = np.argmin(yb, axis = 1)
+    hi = np.argmax(yb, axis = 1)
+    return xb[rows, lo], yb[rows, lo], xb[rows, hi], yb[rows, hi]
+
+
+def _interleave(xmin, ymin, xmax, ymax):
+    """Return (x, y) with the min and max points of the buckets, in x
+    order (2 points per bucket)."""
+    swap = xmax < xmin
+    x = np.column_stack((np.where(swap, xmax, xmin),
+        np.where(swap, xmin, xmax))).ravel()
+    y = np.column_stack((np.where(swap, ymax, ymin),
+        np.where(swap, ymin, ymax))).ravel()
+    return x, y
+
+
+def minmax(x, y, bucket):
+    """Return (x, y) with the minimum and maximum of every `bucket`
+    consecutive samples, in x order (2 points per bucket). The samples of
+    an incomplete last bucket are dropped."""
+    return _interleave(*_extrema(np.asarray(x), np.asarray(y), bucket))
+
+
+def lttb(x, y, points):
+    """Return (x, y) with `points` of the samples chosen by the largest
+    triangle three buckets method (first and last samples kept)."""
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    n = len(y)
+    if points >= n or points < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    # Average of every bucket, used as the third point of the triangles.
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    mean_x = np.append(sums_x/sizes, x[-1])
+    mean_y = np.append(sums_y/sizes, y[-1])
+    chosen = np.empty(points, dtype = int)
+    chosen[0] = 0
+    chosen[-1] = n - 1
+    a = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Twice the area of the triangles (a, candidate, next average).
+        area = np.abs((x[a] - mean_x[i + 1])*(y[start:stop] - y[a]) -
+                (x[a] - x[start:stop])*(mean_y[i + 1] - y[a]))
+        a = start + np.argmax(area)
+        chosen[i + 1] = a
+    return x[chosen], y[chosen]
+
+
+class MinMax_Decimator(object):
+    """Incremental min-max decimation, see the module docstring.
+
+    Arguments:
+        points : Target number of buckets, between points and 2*points
+            buckets are kept (2 points are drawn per bucket).
+        bucket : Initial number of samples per bucket.
+
+    Attributes:
+        bucket : Current number of samples per bucket.
+        total : Number of samples added.
+    """
+
+    def __init__(self, points = 2000, bucket = 1):
+        self.points = int(points)
+        self.initial_bucket = int(bucket)
+        self.clear()
+
+    def clear(self):
+        """Forget all samples."""
+        self.bucket = self.initial_bucket
+        self.total = 0
+        # Minimum and maximum point of every bucket.
+        self._buckets = tuple(np.empty(0) for _ in range(4))
+        self._tail_x = np.empty(0)
+        self._tail_y = np.empty(0)
+
+    def add(self, x, y):
+        """Add a block of samples (x increasing, e.g. time or position)."""
+        y = np.asarray(y, dtype = float)
+        self.total += len(y)
+        x = np.concatenate((self._tail_x, np.asarray(x, dtype = float)))
+        y = np.concatenate((self._tail_y, y))
+        used = len(y) - len(y) % self.bucket
+        self._tail_x, self._tail_y = x[used:], y[used:]
+        self._buckets = tuple(np.concatenate((old, new)) for old, new in
+                zip(self._buckets, _extrema(x, y, self.bucket)))
+        while len(self._buckets[0]) > 2*self.points:
+            self._merge()
+
+    def _merge(self):
+        #Neighbouring buckets are merged two by two, an odd last bucket
+        #is kept as it is.
+        xmin, ymin, xmax, ymax = self._buckets
+        pairs = len(ymin)//2
+        rows = np.arange(pairs)
+        lo = 2*rows + np.argmin(ymin[:2*pairs].reshape(pairs, 2), axis = 1)
+        hi = 2*rows + np.argmax(ymax[:2*pairs].reshape(pairs, 2), axis = 1)
+        odd = slice(2*pairs, None)
+        self._buckets = (np.append(xmin[lo], xmin[odd]),
+                np.append(ymin[lo], ymin[odd]),
+                np.append(xmax[hi], xmax[odd]),
+                np.append(ymax[hi], ymax[odd]))
+        self.bucket *= 2
+
+    def data(self, method = 'minmax', points = None):
+        """Return (x, y) of the points to draw.
+
+        Arguments:
+            method : 'minmax' for the min and max of every bucket, 'lttb'
+                to further select `points` of them (default self.points).
+            points : Number of points returned by 'lttb'.
+        """
+        x, y = _interleave(*self._buckets)
+        if method == 'lttb':
+            return lttb(x, y, points or self.points)
+        if method != 'minmax':
+            raise ValueError('Unknown decimation method {}'.format(method))
+        return x, y
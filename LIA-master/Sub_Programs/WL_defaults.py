@@ -0,0 +1,15 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Defaults shared by the GUI and the device logic       #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Default scan parameters, without any import.
+
+WL_backend reads them to fill the widgets before numpy is loaded, the
+device modules (WL_planner, ...) and WL_batch.py use them as defaults.
+"""
+
+# Spatial oversampling: samples per fringe of the shortest wavelength.
+DEFAULT_OVERSAMPLING = 4
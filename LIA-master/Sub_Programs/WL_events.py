@@ -0,0 +1,102 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Event bus between the workers and the Tk widgets      #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Publish/subscribe bus between worker threads and the Tk widgets.
+
+Tk widgets may only be used from the Tk thread. The acquisition, motion and
+processing workers therefore never call the widgets: they publish events
+(topic, value) on the bus from any thread, which only puts them in a queue.
+The Tk side drains the queue in batches from a single after() tick and
+calls the subscribers of each topic on the Tk thread:
+
+    BUS.subscribe('motion/progress', Progress.set, latest = True)
+    BUS.start(app)                            # Tk thread, once
+    ...
+    BUS.publish('motion/progress', 0.5)       # any thread
+
+A subscriber registered with latest = True only receives the last value of
+its topic in a batch, so fast producers (progress, positions) cannot flood
+the Tk loop. An exception raised by a subscriber is printed and does not
+stop the other subscribers.
+"""
+import collections
+import queue
+import traceback
+
+# Period of the Tk tick draining the bus [ms].
+EVENT_MS = 20
+# Maximum number of events handled in one tick.
+EVENT_BATCH = 500
+
+
+class Event_Bus(object):
+    """Thread-safe publish/subscribe bus drained on the Tk thread.
+
+    Arguments:
+        period : Period of the draining tick in ms.
+        batch : Maximum number of events handled per tick, the rest waits
+            for the next tick so that the Tk loop stays responsive.
+    """
+
+    def __init__(self, period = EVENT_MS, batch = EVENT_BATCH):
+        self.period = period
+        self.batch = batch
+        self._queue = queue.Queue()
+        self._subscribers = collections.defaultdict(list)
+        self._widget = None
+
+    def publish(self, topic, value = None):
+        """Queue an event; may be called from any thread."""
+        self._queue.put((topic, value))
+
+    def subscribe(self, topic, callback, latest = False):
+        """Call callback(value) on the Tk thread for the events of topic;
+        with latest, only for the last event of the topic in a batch."""
+        self._subscribers[topic].append((callback, latest))
+
+    def unsubscribe(self, topic, callback):
+        self._subscribers[topic] = [(func, latest) for func, latest in
+                self._subscribers[topic] if func != callback]
+
+    def start(self, widget):
+        """Drain the bus every `period` ms from the Tk loop of widget."""
+        self._widget = widget
+        widget.after(self.period, self._tick)
+
+    def stop(self):
+        self._widget = None
+
+    def _tick(self):
+        if self._widget is None:
+            return
+        self.drain()
+        self._widget.after(self.period, self._tick)
+
+    def drain(self):
+        """Dispatch up to `batch` queued events, return their number. Call
+        from the Tk thread (or directly when there is no Tk loop)."""
+        events = []
+        while len(events) < self.batch:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # Index of the last event of every topic, for latest subscribers.
+        last = {topic: i for i, (topic, _) in enumerate(events)}
+        for i, (topic, value) in enumerate(events):
+            for callback, latest in list(self._subscribers.get(topic, ())):
+                if latest and last[topic] != i:
+                    continue
+                try:
+                    callback(value)
+                except Exception:
+                    traceback.print_exc()
+        return len(events)
+
+
+# The bus shared by the widgets of WhiteLight and the backend workers.
+BUS = Event_Bus()
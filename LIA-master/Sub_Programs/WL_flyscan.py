@@ -0,0 +1,236 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Hardware triggered continuous scan (flyscan)          #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Continuous stage scan with position-synchronous lock-in acquisition.
+
+While the stage moves at constant velocity, the C-891 sends a pulse on its
+digital output every `step` mm (CTO trigger mode "position distance"). The
+output is wired to a trigger input of the lock-in, and the
+dataAcquisitionModule in hardware trigger mode takes one demodulator sample
+per pulse. The k-th sample is therefore taken at the stage position
+start + k*step, without any interpolation between the two clocks (compare
+WL_fusion, which is used when the stage cannot trigger the lock-in).
+
+The trigger input is only sampled with the demodulator samples: a pulse
+is seen as a low sample followed by a high one, and the module takes the
+sample nearest to each trigger. The stage may therefore trigger at most
+every second sample, i.e. at half the demodulator rate; max_velocity()
+gives the fastest velocity for a step.
+
+A scan is a single move instead of one settle per point:
+
+    Scan = Fly_Scan(Dev, Axe, daq, 'dev2318', demod = 0, trigin = 1)
+    Data = Scan.Run(5.0, 20.0, 0.001, 10.0)
+    Data['position'], Data['x'], Data['y']
+"""
+import time
+
+import numpy as np
+
+from Sub_Programs.WL_fusion import OPD_PER_MM, position_to_opd
+from Sub_Programs.WL_scan import wait_on_target
+
+# CTO parameters of the C-891 digital outputs.
+CTO_TRIGGER_STEP = 1
+CTO_AXIS = 2
+CTO_TRIGGER_MODE = 3
+CTO_POLARITY = 7
+CTO_START_THRESHOLD = 8
+CTO_STOP_THRESHOLD = 9
+# CTO trigger mode: one pulse every TriggerStep between the thresholds.
+TRIGGER_POSITION_DISTANCE = 0
+
+# dataAcquisitionModule settings.
+DAQ_TYPE_HW_TRIGGER = 6
+DAQ_EDGE_RISING = 1
+DAQ_GRID_NEAREST = 1
+
+# Highest trigger rate as a fraction of the demodulator rate.
+MAX_TRIGGER_FRACTION = 0.5
+
+
+def trigger_positions(start, stop, step):
+    """Return the stage positions (mm) of the trigger pulses of a scan from
+    start to stop, one every step (the sign of step is ignored)."""
+    step = abs(step)
+    count = int(np.floor(abs(stop - start)/step + 1e-9)) + 1
+    return start + np.sign(stop - start)*step*np.arange(count)
+
+
+def max_velocity(step, rate):
+    """Return the fastest velocity (mm/s) of a scan triggering every step
+    mm, so that the trigger rate stays within MAX_TRIGGER_FRACTION of the
+    demodulator rate (Sa/s)."""
+    return abs(step)*rate*MAX_TRIGGER_FRACTION
+
+
+def acceleration_distance(velocity, acceleration):
+    """Return the distance (mm) needed to reach velocity (mm/s) with the
+    acceleration (mm/s^2), i.e. the run-up before the first trigger."""
+    if not acceleration:
+        return 0.0
+    return velocity**2/(2.0*acceleration)
+
+
+def configure_stage_trigger(Dev, Axe, start, stop, step, line = 1):
+    """Configure the digital output `line` of the controller to pulse every
+    step mm of Axe between start and stop, and enable it."""
+    low, high = min(start, stop), max(start, stop)
+    Dev.CTO([line]*6,
+            [CTO_TRIGGER_STEP, CTO_AXIS, CTO_TRIGGER_MODE, CTO_POLARITY,
+                CTO_START_THRESHOLD, CTO_STOP_THRESHOLD],
+            [abs(step), Axe, TRIGGER_POSITION_DISTANCE, 1, low, high])
+    Dev.TRO(line, True)
+
+
+def configure_daq_trigger(daq, device, count, demod = 0, trigin = 1,
+        signals = ('x', 'y'), rate = None):
+    """Return a dataAcquisitionModule that records one sample of the
+    demodulator per rising edge of the trigger input `trigin`, `count`
+    triggers in total (one grid row per trigger).
+
+    Arguments:
+        daq : ziDAQServer session.
+        device : Device ID, e.g. 'dev2318'.
+        count : Number of trigger pulses of the scan.
+        demod : Demodulator index.
+        trigin : Trigger input (1 or 2) wired to the stage output.
+        signals : Demodulator sample fields to record.
+        rate : Demodulator rate in Sa/s (None: read from the device).
+    """
+    if rate is None:
+        rate = daq.getDouble('/%s/demods/%d/rate' % (device, demod))
+    module = daq.dataAcquisitionModule()
+    module.set('dataAcquisitionModule/device', device)
+    module.set('dataAcquisitionModule/triggernode',
+            '/%s/demods/%d/sample.TrigIn%d' % (device, demod, trigin))
+    module.set('dataAcquisitionModule/type', DAQ_TYPE_HW_TRIGGER)
+    module.set('dataAcquisitionModule/edge', DAQ_EDGE_RISING)
+    module.set('dataAcquisitionModule/count', 1)
+    module.set('dataAcquisitionModule/holdoff/count', 0)
+    module.set('dataAcquisitionModule/holdoff/time', 0)
+    module.set('dataAcquisitionModule/delay', 0)
+    module.set('dataAcquisitionModule/endless', 0)
+    module.set('dataAcquisitionModule/grid/mode', DAQ_GRID_NEAREST)
+    module.set('dataAcquisitionModule/grid/rows', count)
+    module.set('dataAcquisitionModule/grid/cols', 1)
+    module.set('dataAcquisitionModule/duration', 1.0/rate)
+    for signal in signals:
+        module.subscribe('/%s/demods/%d/sample.%s' % (device, demod, signal))
+    return module
+
+
+class Fly_Scan(object):
+    """Hardware triggered continuous scan of one stage axis.
+
+    Arguments:
+        Dev : Connected pipython GCSDevice (C-891).
+        Axe : Scanned axis.
+        daq : ziDAQServer session of the lock-in.
+        device : Lock-in device ID.
+        demod : Demodulator index.
+        trigin : Lock-in trigger input wired to the stage output `line`.
+        line : Digital output line of the controller.
+        reference : Stage position (mm) of zero path difference.
+        signals : Demodulator sample fields to record, e.g. 'auxin0' for
+            the DC level of the detector on Aux In 1.
+    """
+
+    def __init__(self, Dev, Axe, daq, device, demod = 0, trigin = 1,
+            line = 1, reference = 0.0, opd_per_mm = OPD_PER_MM,
+            signals = ('x', 'y')):
+        self.Dev = Dev
+        self.Axe = Axe
+        self.daq = daq
+        self.device = device
+        self.demod = demod
+        self.trigin = trigin
+        self.line = line
+        self.reference = reference
+        self.opd_per_mm = opd_per_mm
+        self.signals = tuple(signals)
+
+    def Run_Up(self, velocity):
+        #Distance to reach the scan velocity before the first trigger
+        acc = None
+        if self.Dev.HasqACC():
+            acc = self.Dev.qACC(self.Axe)[self.Axe]
+        return acceleration_distance(velocity, acc)
+
+    def Rate(self):
+        #Demodulator rate in Sa/s
+        return self.daq.getDouble('/%s/demods/%d/rate' % (self.device,
+            self.demod))
+
+    def Run(self, start, stop, step, velocity, timeout = None,
+            stop_request = None):
+        """Scan from start to stop (mm) at velocity (mm/s) with one sample
+        every step mm; return a dict of arrays with 'position' (mm), 'opd'
+        (um), 'timestamp' and the recorded signals (default 'x', 'y').
+
+        The stage first moves to the run-up position at its current
+        velocity. Triggers that were not received before the end of the
+        move plus `timeout` s (default: 10% of the scan time + 1 s) are
+        returned as NaN. stop_request (threading.Event) halts the scan.
+        A velocity above max_velocity(step, rate) raises ValueError.
+        """
+        rate = self.Rate()
+        if velocity > max_velocity(step, rate)*(1 + 1e-9):
+            raise ValueError('A trigger every {:g} mm at {:g} mm/s exceeds '
+                    'half the demodulator rate ({:g} Sa/s): use at most '
+                    '{:g} mm/s or a step of at least {:g} mm'.format(
+                        abs(step), velocity, rate, max_velocity(step, rate),
+                        velocity/(rate*MAX_TRIGGER_FRACTION)))
+        positions = trigger_positions(start, stop, step)
+        direction = np.sign(stop - start) or 1.0
+        margin = direction*(self.Run_Up(velocity) + abs(step))
+        if timeout is None:
+            timeout = 0.1*abs(stop - start)/velocity + 1.0
+        self.Dev.MOV(self.Axe, start - margin)
+        if not wait_on_target(self.Dev, self.Axe, stop_request):
+            return self.Tag({}, positions)
+        configure_stage_trigger(self.Dev, self.Axe, start,
+                positions[-1], step, self.line)
+        module = configure_daq_trigger(self.daq, self.device,
+                len(positions), self.demod, self.trigin, self.signals, rate)
+        try:
+            module.execute()
+            self.Dev.VEL(self.Axe, velocity)
+            self.Dev.MOV(self.Axe, positions[-1] + margin)
+            wait_on_target(self.Dev, self.Axe, stop_request)
+            t0 = time.time()
+            while not module.finished() and time.time() - t0 < timeout:
+                if stop_request is not None and stop_request.is_set():
+                    break
+                time.sleep(0.01)
+            Data = module.read(True)
+        finally:
+            self.Dev.TRO(self.line, False)
+            module.finish()
+            module.clear()
+        return self.Tag(Data, positions)
+
+    def Tag(self, Data, positions):
+        """Return the samples read from the module, one per entry of
+        positions, with the positions and OPD added."""
+        prefix = '/%s/demods/%d/sample.' % (self.device, self.demod)
+        Scan = {'position': positions,
+                'opd': position_to_opd(positions, self.reference,
+                    self.opd_per_mm)}
+        Scan['timestamp'] = np.zeros(len(positions), dtype = np.uint64)
+        for signal in self.signals:
+            Scan[signal] = np.full(len(positions), np.nan)
+            events = Data.get(prefix + signal, [])
+            if not events:
+                continue
+            #One grid row per trigger, rows not triggered stay NaN
+            rows = np.ravel(events[-1]['value'])[:len(positions)]
+            Scan[signal][:len(rows)] = rows
+            if 'timestamp' in events[-1]:
+                Scan['timestamp'][:len(rows)] = np.ravel(
+                        events[-1]['timestamp'])[:len(rows)]
+        return Scan
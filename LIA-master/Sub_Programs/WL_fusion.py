@@ -0,0 +1,202 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Stage position / demodulator sample fusion            #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Align PI stage positions with ZI demodulator samples.
+
+The stage positions (from the PI data recorder or from qPOS polling) and
+the demodulator samples are sampled on different clocks. Each demodulator
+sample is given the stage position interpolated at its timestamp and the
+corresponding optical path difference (OPD), so that the interferogram can
+be indexed by position instead of time. Everything is vectorized with
+numpy.interp, one call per block of samples.
+
+Times are in seconds on the demodulator's time base: timestamp/clockbase.
+Positions measured on another clock (e.g. the host clock for qPOS) are
+mapped onto it with `time_offset`, see Position_Fusion.set_time_reference.
+
+A sweep recorded with the PI data recorder is fused in one call:
+
+    Record = WL_scan.move(Dev, Axe, 20.0, Rec,
+            clock = lambda : WL_scan.device_time(daq, 'dev2318'))
+    Pass = fuse_record(Samples, Record, clockbase)
+    Pass['position'], Pass['opd'], Pass['x']
+"""
+import numpy as np
+
+# Michelson interferometer: the OPD is twice the mirror displacement, in um
+# for a stage position in mm.
+OPD_PER_MM = 2000.0
+
+
+def interpolate_positions(sample_times, pos_times, positions):
+    """Return the positions interpolated at sample_times.
+
+    Arguments:
+        sample_times : Array of the sample times in s.
+        pos_times : Increasing array of the position times in s.
+        positions : Array of the positions at pos_times.
+
+    Samples outside [pos_times[0], pos_times[-1]] are given NaN.
+    """
+    if len(pos_times) == 0:
+        return np.full(np.shape(sample_times), np.nan)
+    return np.interp(sample_times, pos_times, positions, left = np.nan,
+            right = np.nan)
+
+
+def position_to_opd(positions, reference = 0.0, opd_per_mm = OPD_PER_MM):
+    """Return the OPD in um for stage positions in mm; reference is the
+    stage position of zero path difference."""
+    return (np.asarray(positions) - reference)*opd_per_mm
+
+
+def _take(sample, index):
+    """Return the samples `index` (slice or mask) of a sample block given
+    as a dict of arrays or as a structured array, as a dict of arrays."""
+    if isinstance(sample, np.ndarray):
+        return {name: sample[name][index] for name in sample.dtype.names}
+    return {name: np.asarray(value)[index] for name, value in
+            sample.items()}
+
+
+def _concat(blocks):
+    if len(blocks) == 1:
+        return blocks[0]
+    return {name: np.concatenate([block[name] for block in blocks]) for
+            name in blocks[0]}
+
+
+class Position_Fusion(object):
+    """Streaming fusion of stage positions and demodulator samples.
+
+    Positions are added with add_positions() as they become available and
+    sample blocks are passed to fuse(). A sample can only be interpolated
+    once a position later than the sample has been received; samples that
+    are more recent than the last position are held back and returned by a
+    later call of fuse(). Samples older than the first position are
+    returned with NaN positions, and so are the oldest held back samples
+    beyond max_pending (e.g. no position is coming because the recorder
+    was not triggered).
+
+    Arguments:
+        clockbase : Demodulator clockbase in Hz (/devN/clockbase).
+        reference : Stage position (mm) of zero path difference.
+        opd_per_mm : OPD in um per mm of stage displacement.
+        time_offset : Added to the position times to map them onto the
+            demodulator time base, in s.
+        history : Maximum number of positions kept for interpolation.
+        max_pending : Maximum number of samples held back.
+    """
+
+    def __init__(self, clockbase, reference = 0.0,
+            opd_per_mm = OPD_PER_MM, time_offset = 0.0, history = 1000000,
+            max_pending = 1000000):
+        self.clockbase = float(clockbase)
+        self.reference = reference
+        self.opd_per_mm = opd_per_mm
+        self.time_offset = time_offset
+        self.history = history
+        self.max_pending = max_pending
+        self.clear()
+
+    def clear(self):
+        """Forget the positions and the held back samples, e.g. between two
+        recorder traces."""
+        self.pos_times = np.empty(0)
+        self.positions = np.empty(0)
+        #Held back sample blocks, concatenated once they can be fused
+        self._pending = []
+        self._held = 0
+
+    def set_time_reference(self, timestamp, pos_time):
+        """Set time_offset from one simultaneous pair of a demodulator
+        timestamp (clock ticks) and a position time (s), e.g. the device
+        timestamp read when a recorder-triggering MOV was sent and the
+        time 0 of the recorder trace."""
+        self.time_offset = timestamp/self.clockbase - pos_time
+
+    def add_positions(self, times, positions):
+        """Append positions measured at the increasing times (s, on the
+        position clock)."""
+        times = np.asarray(times, dtype = float) + self.time_offset
+        positions = np.asarray(positions, dtype = float)
+        if len(self.pos_times):
+            keep = times > self.pos_times[-1]
+            times = times[keep]
+            positions = positions[keep]
+        self.pos_times = np.concatenate((self.pos_times, times))[
+                -self.history:]
+        self.positions = np.concatenate((self.positions, positions))[
+                -self.history:]
+
+    def fuse(self, sample = None, flush = False):
+        """Return the samples that can be fused, as a dict of arrays with
+        the sample fields plus 'position' (mm) and 'opd' (um).
+
+        Arguments:
+            sample : Block of samples (dict of arrays as returned by poll
+                or structured array), may be None to only fetch held back
+                samples.
+            flush : Return all held back samples, with NaN positions for
+                those after the last position.
+        """
+        if sample is not None:
+            sample = _take(sample, slice(None))
+            if len(sample['timestamp']):
+                self._pending.append(sample)
+                self._held += len(sample['timestamp'])
+        elif not self._pending:
+            return None
+        else:
+            sample = self._pending[-1]
+        last = self.pos_times[-1] if len(self.pos_times) else -np.inf
+        if not self._pending or (not flush and
+                self._held <= self.max_pending and
+                self._pending[0]['timestamp'][0]/self.clockbase > last):
+            #Nothing to fuse yet, keep the blocks as they are
+            sample = _take(sample, slice(0, 0))
+            times = np.empty(0)
+        else:
+            sample = _concat(self._pending)
+            self._pending = []
+            self._held = 0
+            times = sample['timestamp']/self.clockbase
+            if not flush:
+                ready = np.searchsorted(times, last, side = 'right')
+                ready = max(ready, len(times) - self.max_pending)
+                if ready < len(times):
+                    self._pending = [_take(sample, slice(ready, None))]
+                    self._held = len(times) - ready
+                    sample = _take(sample, slice(0, ready))
+                    times = times[:ready]
+        sample['position'] = interpolate_positions(times, self.pos_times,
+                self.positions)
+        sample['opd'] = position_to_opd(sample['position'],
+                self.reference, self.opd_per_mm)
+        return sample
+
+
+def fuse_record(sample, record, clockbase, reference = 0.0,
+        opd_per_mm = OPD_PER_MM):
+    """Return the demodulator samples of one move with the positions of its
+    data recorder trace, see Position_Fusion.fuse.
+
+    Arguments:
+        sample : Samples streamed during the move (dict of arrays or
+            structured array).
+        record : Recorder trace returned by WL_scan.move with a clock, its
+            'timestamp' is the demodulator timestamp of the MOV (time 0 of
+            the trace).
+        clockbase : Demodulator clockbase in Hz.
+
+    Samples outside of the trace are given NaN positions.
+    """
+    Fusion = Position_Fusion(clockbase, reference, opd_per_mm,
+            history = len(record['time']))
+    Fusion.set_time_reference(record['timestamp'], 0.0)
+    Fusion.add_positions(record['time'], record['position'])
+    return Fusion.fuse(sample, flush = True)
@@ -0,0 +1,127 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Scan trajectory planner                               #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Derive the stage velocity of a scan from the lock-in settings.
+
+Moving the stage at velocity v (mm/s) sweeps the OPD at v*opd_per_mm um/s,
+so the fringes of the shortest wavelength of the band reach the lock-in at
+
+    f_max = v*opd_per_mm/wavelength_min      (Hz)
+
+The fastest usable velocity is the largest one for which
+    - f_max stays within the 3 dB bandwidth of the demodulator filter
+      (zhinst.utils.tc2bw of the time constant and filter order),
+    - every fringe is sampled `oversampling` times at the demod rate,
+    - the stage can actually move that fast.
+The run-up needed to reach that velocity, plus a few time constants for
+the filter to settle, is added on both sides of the scan range.
+"""
+import numpy as np
+
+import zhinst.utils as utils
+
+from Sub_Programs.WL_defaults import DEFAULT_OVERSAMPLING
+from Sub_Programs.WL_fusion import OPD_PER_MM
+
+# Time constants waited for the demodulator filter to settle after the
+# stage has reached its scan velocity.
+SETTLE_TIMECONSTANTS = 5
+# PI parameter: maximum closed-loop velocity of an axis.
+PARAM_MAX_VELOCITY = 0xA
+
+
+def plan_scan(start, stop, wavelength_min, wavelength_max = None,
+        timeconstant = None, order = 1, rate = None,
+        oversampling = DEFAULT_OVERSAMPLING, max_velocity = np.inf,
+        acceleration = None, opd_per_mm = OPD_PER_MM):
+    """Return the plan of a scan from start to stop (mm) as a dict.
+
+    Arguments:
+        start, stop : Scan range in mm (the interferogram must lie within).
+        wavelength_min, wavelength_max : Wavelength band in um.
+        timeconstant : Demodulator time constant in s (None: no filter).
+        order : Demodulator filter order (1 to 8).
+        rate : Demodulator rate in Sa/s (None: not sampled by the
+            lock-in, e.g. a motion only sweep).
+        oversampling : Samples per fringe of wavelength_min, at least 2.
+        max_velocity : Maximum stage velocity in mm/s.
+        acceleration : Stage acceleration in mm/s^2 (None: instantaneous).
+        opd_per_mm : OPD in um per mm of stage displacement.
+
+    Returns:
+        A dict with:
+        'velocity' : Fastest velocity in mm/s.
+        'limit' : What limits it: 'bandwidth', 'rate' or 'stage'.
+        'bandwidth' : 3 dB bandwidth of the filter in Hz (inf if none).
+        'fringe_frequency' : Frequencies (Hz) of the fringes of
+            wavelength_min and wavelength_max at that velocity.
+        'margin' : Distance (mm) added before start and after stop to
+            accelerate and let the filter settle.
+        'step' : Stage displacement between two samples in mm.
+        'points' : Number of samples in [start, stop].
+        'sweep_time' : Time of one sweep including the margins in s.
+    """
+    if oversampling < 2:
+        raise ValueError('oversampling ({}) must be 2 or more'.format(
+            oversampling))
+    if wavelength_max is None:
+        wavelength_max = wavelength_min
+    # Stage velocity per Hz of fringe frequency of wavelength_min.
+    per_hz = wavelength_min/opd_per_mm
+    bandwidth = np.inf
+    limits = {'stage': max_velocity}
+    if timeconstant:
+        bandwidth = utils.tc2bw(timeconstant, order)
+        limits['bandwidth'] = bandwidth*per_hz
+    if rate:
+        limits['rate'] = rate/oversampling*per_hz
+    limit = min(limits, key = limits.get)
+    velocity = limits[limit]
+    if not np.isfinite(velocity):
+        raise ValueError('The velocity is not limited, give max_velocity,'
+                ' timeconstant or rate')
+    run_up = 0.0
+    if acceleration:
+        run_up = velocity**2/(2.0*acceleration)
+    settle_time = SETTLE_TIMECONSTANTS*(timeconstant or 0.0)
+    margin = run_up + velocity*settle_time
+    length = abs(stop - start)
+    step = velocity/rate if rate else np.nan
+    return {'velocity': velocity,
+            'limit': limit,
+            'bandwidth': bandwidth,
+            'fringe_frequency': (velocity*opd_per_mm/wavelength_min,
+                velocity*opd_per_mm/wavelength_max),
+            'margin': margin,
+            'step': step,
+            'points': int(length/step) + 1 if rate else 0,
+            # Each run-up takes twice as long as at constant velocity.
+            'sweep_time': (length + 2*margin + 2*run_up)/velocity}
+
+
+def stage_limits(Dev, Axe):
+    """Return (max_velocity, acceleration) of Axe read from the controller,
+    inf/None when the controller does not report them."""
+    max_velocity = np.inf
+    acceleration = None
+    if Dev.HasqSPA():
+        try:
+            max_velocity = float(Dev.qSPA(Axe, PARAM_MAX_VELOCITY)[Axe][
+                PARAM_MAX_VELOCITY])
+        except (KeyError, TypeError):
+            pass
+    if Dev.HasqACC():
+        acceleration = float(Dev.qACC(Axe)[Axe])
+    return max_velocity, acceleration
+
+
+def demod_settings(daq, device, demod = 0):
+    """Return (timeconstant, order, rate) of a demodulator."""
+    path = '/%s/demods/%d/' % (device, demod)
+    return (daq.getDouble(path + 'timeconstant'),
+            daq.getInt(path + 'order'),
+            daq.getDouble(path + 'rate'))
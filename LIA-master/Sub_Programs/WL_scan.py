@@ -0,0 +1,141 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Stage and lock-in scan logic without the GUI          #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Device logic of a measurement, shared by the GUI and the batch runner.
+
+Nothing here uses Tk: PI_control (WL_backend) runs these functions on its
+motion worker, WL_batch.py runs them directly from the command line.
+"""
+import time
+
+import numpy as np
+from pipython import GCSError, datarectools
+
+#Number of points per table of the PI data recorder
+PI_REC_POINTS = 1024
+#GCS error raised by a command sent after HLT ("controller was stopped
+#by command")
+PI_ERROR_STOPPED = 10
+
+
+def _stopped(stop_request):
+    return stop_request is not None and stop_request.is_set()
+
+
+def halt(Dev, Axe):
+    """Stop Axe with a smooth deceleration (HLT)."""
+    try:
+        Dev.HLT(Axe)
+    except GCSError as e:
+        if e.val != PI_ERROR_STOPPED:
+            raise
+
+
+def wait_on_target(Dev, Axe, stop_request = None, polldelay = 0.05,
+        timeout = 300):
+    """Wait until Axe is on target, as pitools.waitontarget, but halt the
+    axis and return False as soon as stop_request (threading.Event) is
+    set. Returns True on target."""
+    t0 = time.time()
+    while not Dev.qONT(Axe)[Axe]:
+        if _stopped(stop_request):
+            halt(Dev, Axe)
+            return False
+        if time.time() - t0 > timeout:
+            raise SystemError('waitontarget() timed out after %.1f s'
+                    % timeout)
+        time.sleep(polldelay)
+    return True
+
+
+def reference(Dev, Axe, polldelay = 0.1, stop_request = None,
+        timeout = 300):
+    """Reference Axe (FRF), wait until the controller is ready and switch
+    the servo on. Returns True if the controller is ready, False if it
+    failed or stop_request (threading.Event) stopped the referencing."""
+    Dev.FRF()
+    t0 = time.time()
+    while not Dev.IsControllerReady():
+        if _stopped(stop_request):
+            halt(Dev, Axe)
+            return False
+        if time.time() - t0 > timeout:
+            break
+        time.sleep(polldelay)
+    if Dev.IsControllerReady() != 1:
+        return False
+    Dev.SVO(Axe, 1)
+    return True
+
+
+def recorder_init(Dev, Axe, sweep_time, points = PI_REC_POINTS):
+    """Return a data recorder of the actual and commanded position of Axe
+    at the servo rate, triggered by the next MOV. The rate is divided so
+    that a sweep of sweep_time s fits in `points` points."""
+    Rec = datarectools.Datarecorder(Dev)
+    Rec.options = (datarectools.RecordOptions.ACTUAL_POSITION_2,
+            datarectools.RecordOptions.COMMANDED_POSITION_1)
+    Rec.sources = Axe
+    Rec.trigsources = datarectools.TriggerSources.POSITION_CHANGING_COMMAND_1
+    Rec.samplerate = max(1, int(sweep_time/(Rec.servotime*points)) + 1)
+    return Rec
+
+
+def read_record(Rec):
+    """Read the traces of the last recording in one transfer, as a dict of
+    arrays 'time' (s from the trigger), 'position' and 'target' (mm)."""
+    Header, Data = Rec.getdata()
+    Position = np.asarray(Data[0], dtype = float)
+    return {'time': np.arange(len(Position))*Header['SAMPLE_TIME'],
+            'position': Position,
+            'target': np.asarray(Data[1], dtype = float)}
+
+
+def device_time(daq, device):
+    """Return the current timestamp of the lock-in (clockbase ticks)."""
+    return daq.getInt('/%s/status/time' % device)
+
+
+def move(Dev, Axe, Target, Rec = None, stop_request = None, clock = None):
+    """Move Axe to Target and wait on target; with a data recorder, return
+    the positions recorded during the move (see read_record). If
+    stop_request (threading.Event) is set, the axis is halted and None is
+    returned.
+
+    clock (e.g. device_time of the lock-in) gives the lock-in time of the
+    trace time 0, returned as the 'timestamp' of the record so that the
+    trace can be fused with the demodulator samples
+    (WL_fusion.fuse_record). A clock read is itself a round trip to the
+    lock-in, and the MOV that triggers the recorder another one to the
+    controller, so a single read before the MOV would be early by an
+    unknown latency. The clock is read just before and just after the MOV
+    (which returns once the controller has answered the error query):
+    the trigger lies between the two reads, and 'timestamp' is their
+    midpoint. Half their difference is returned as 'timestamp_error'
+    (clockbase ticks), the remaining error of the time reference, to which
+    one servo cycle of the recorder trigger adds. It is typically a few ms
+    over USB: at a velocity v the positions may be offset by up to
+    v*timestamp_error/clockbase."""
+    if Rec is not None:
+        Rec.arm()
+    Before = clock() if clock is not None else None
+    Dev.MOV(Axe, Target)
+    After = clock() if clock is not None else None
+    if not wait_on_target(Dev, Axe, stop_request):
+        return None
+    if Rec is not None:
+        Record = read_record(Rec)
+        if Before is not None:
+            Record['timestamp'] = Before + (After - Before)//2
+            Record['timestamp_error'] = (After - Before)//2
+        return Record
+    return None
+
+
+def travel_range(Dev, Axe):
+    """Return (min, max) travel of Axe in mm."""
+    return Dev.qTMN(Axe)[Axe], Dev.qTMX(Axe)[Axe]
@@ -0,0 +1,179 @@
+###################################################################
+#           WhiteLight Interferometer Program                     #
+#           Fourier transform spectroscopy                        #
+#           For : Ulrafast and Quantum Laboratory                 #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Spectrum of an interferogram sampled on a uniform OPD grid.
+
+spectrum() transforms a whole interferogram at once: remove its mean,
+apodize, zero-pad to a power of two and FFT. The bins are calibrated in
+wavenumber (1/um) and wavelength (um) from the OPD step:
+
+    Spectrum = spectrum(Mean['x'], opd_step = Step*OPD_PER_MM,
+            band = (0.4, 1.0))
+
+Streaming_Spectrum updates the spectrum of the average while the passes
+come in, at the cost of one transform of the new pass. The grid is cut
+into segments of `segment` points that overlap by half. Each pass (as
+resampled on the grid by WL_averaging.Pass_Average.add) is apodized and
+transformed segment by segment, and the complex transforms are averaged
+over the passes. The transform is linear, so this average is the
+transform of the averaged interferogram: when every pass covers the grid,
+the spectrum is the one of spectrum() on Pass_Average.mean, segment by
+segment. The points a pass does not cover count as zero fringes.
+
+    Live = Streaming_Spectrum(len(Grid), opd_step = Step*OPD_PER_MM)
+    for Scan in Scans:
+        Live.add(Average.add(Scan['position'], Scan)['x'])
+        Spectrum = Live.spectrum(band = (0.4, 1.0))
+"""
+import warnings
+
+import numpy as np
+
+APODIZATIONS = {
+        'boxcar': np.ones,
+        'triangle': np.bartlett,
+        'hann': np.hanning,
+        'happ-genzel': np.hamming,
+        'blackman': np.blackman}
+
+
+def window(name, points):
+    """Return the apodization window `name` (see APODIZATIONS)."""
+    try:
+        return APODIZATIONS[name](points)
+    except KeyError:
+        raise ValueError('Unknown apodization {}, use one of {}'.format(
+            name, ', '.join(sorted(APODIZATIONS))))
+
+
+def padded_length(points, zero_pad = 2):
+    """Return the FFT length for `points` samples: at least zero_pad times
+    longer, rounded up to a power of two."""
+    return 1 << int(np.ceil(np.log2(max(points*zero_pad, 2))))
+
+
+def calibrate(length, opd_step, band = None):
+    """Return (index, wavenumber, wavelength) of the rfft bins of a
+    transform of `length` samples spaced by opd_step um, limited to the
+    wavelength band (um) if given. The DC bin is never returned."""
+    wavenumber = np.fft.rfftfreq(length, opd_step)
+    index = np.arange(1, len(wavenumber))
+    if band is not None:
+        low, high = 1.0/max(band), 1.0/min(band)
+        index = index[(wavenumber[index] >= low) &
+                (wavenumber[index] <= high)]
+    return index, wavenumber[index], 1.0/wavenumber[index]
+
+
+def _demean(interferogram):
+    """Fringes around the mean of each row, NaN (not covered) set to 0."""
+    with warnings.catch_warnings():
+        # All NaN rows have no mean, they are zeroed anyway.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(interferogram, axis = -1)
+    return np.nan_to_num(interferogram - mean[..., np.newaxis])
+
+
+def _fringes(interferogram, apodization):
+    """Apodized fringes of interferograms, shape (..., points)."""
+    interferogram = np.asarray(interferogram, dtype = float)
+    return _demean(interferogram)*window(apodization,
+            interferogram.shape[-1])
+
+
+def spectrum(interferogram, opd_step, apodization = 'happ-genzel',
+        zero_pad = 2, band = None, calibration = 1.0):
+    """Return the spectrum of interferograms as a dict of arrays.
+
+    Arguments:
+        interferogram : Samples on a uniform OPD grid, shape (..., points).
+        opd_step : OPD between two samples in um.
+        apodization : Window name, see APODIZATIONS.
+        zero_pad : Minimum ratio of the FFT length to the points.
+        band : (min, max) wavelength in um of the returned bins.
+        calibration : Measured/true wavelength of a reference line (e.g.
+            a laser) measured with the nominal opd_step. The OPD step is
+            divided by it, which moves the reference line to its true
+            wavelength.
+
+    Returns:
+        'wavenumber' (1/um), 'wavelength' (um) and 'intensity' (modulus of
+        the transform, shape (..., bins)).
+    """
+    fringes = _fringes(interferogram, apodization)
+    length = padded_length(fringes.shape[-1], zero_pad)
+    index, wavenumber, wavelength = calibrate(length, opd_step/calibration,
+            band)
+    transform = np.fft.rfft(fringes, length, axis = -1)
+    return {'wavenumber': wavenumber,
+            'wavelength': wavelength,
+            'intensity': np.abs(transform[..., index])}
+
+
+class Streaming_Spectrum(object):
+    """Spectrum of the average of passes on a common grid, updated pass by
+    pass, see the module docstring.
+
+    Arguments:
+        points : Points of the grid.
+        opd_step : OPD between two grid points in um.
+        segment : Points per transformed segment (sets the resolution),
+            None for the whole grid.
+        apodization : Window name, see APODIZATIONS.
+        zero_pad : Minimum ratio of the FFT length to the segment.
+        calibration : Measured/true wavelength of a reference line, see
+            spectrum().
+
+    Attributes:
+        passes : Number of passes added.
+        starts : First grid point of each segment.
+    """
+
+    def __init__(self, points, opd_step, segment = None,
+            apodization = 'happ-genzel', zero_pad = 2, calibration = 1.0):
+        self.points = int(points)
+        self.opd_step = opd_step/calibration
+        self.segment = min(int(segment or self.points), self.points)
+        hop = max(self.segment//2, 1)
+        self.starts = np.arange(0, self.points - self.segment + 1, hop)
+        if self.starts[-1] + self.segment < self.points:
+            # The last segment ends with the grid.
+            self.starts = np.append(self.starts, self.points - self.segment)
+        self.window = window(apodization, self.segment)
+        self.length = padded_length(self.segment, zero_pad)
+        self.clear()
+
+    def clear(self):
+        """Forget the passes."""
+        self.passes = 0
+        self.transform = np.zeros((len(self.starts), self.length//2 + 1),
+                dtype = complex)
+
+    def add(self, interferogram):
+        """Add one pass on the grid (NaN where it is not covered)."""
+        interferogram = np.asarray(interferogram, dtype = float)
+        if interferogram.shape != (self.points,):
+            raise ValueError('Expected a pass of {} points, got {}'.format(
+                self.points, interferogram.shape))
+        segments = interferogram[self.starts[:, np.newaxis] +
+                np.arange(self.segment)]
+        transform = np.fft.rfft(_demean(segments)*self.window, self.length,
+                axis = 1)
+        self.passes += 1
+        self.transform += (transform - self.transform)/self.passes
+
+    def spectrum(self, band = None):
+        """Return the current spectrum as a dict with 'wavenumber' (1/um),
+        'wavelength' (um) and 'intensity' (square root of the summed power
+        spectra of the segments, the modulus of the transform for a single
+        segment)."""
+        index, wavenumber, wavelength = calibrate(self.length,
+                self.opd_step, band)
+        power = np.sum(np.abs(self.transform[:, index])**2, axis = 0)
+        return {'wavenumber': wavenumber,
+                'wavelength': wavelength,
+                'intensity': np.sqrt(power)}
@@ -0,0 +1,262 @@
+###################################################################
+#                   WhiteLight Interferometer Program             #
+#                   Headless scan runner                          #
+#                   For : Ultrafast and Quantum Laboratory        #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Run White Light Interferometer scans from the command line, without Tk.
+
+    python WL_batch.py recipe.json
+    python WL_batch.py recipe.json --simulate     # offline, sweep mode only
+
+The recipe is a JSON file:
+
+    {
+        "stage": {"controller": "C-891", "usb": "0123456789", "axis": "1",
+                  "min": 5.0, "max": 20.0},
+        "iterations": 100,
+        "mode": "sweep",                # or "flyscan" (HW trigger)
+        "wavelength": [0.4, 1.0],       # um, for the velocity planner
+        "oversampling": 4,
+        "lockin": {"device": "dev2318", "demod": 0,
+                   "settings": {"demods/0/rate": 13393,
+                                "demods/0/timeconstant": 0.0001,
+                                "demods/0/order": 4}},
+        "output": "D:/Data/WL/run_01"
+    }
+
+The stage is connected by USB serial number ("usb"), by IP address ("ip")
+or to the first USB controller found. Optional keys: "velocity" (mm/s,
+upper limit of the planned velocity), "step" (mm, flyscan trigger step,
+at least the step of the plan so that the stage triggers at most at half
+the demodulator rate),
+"reference" (false to skip the referencing), "dc_level" (DC level of the
+detector for the fringe visibility: a value in V, "baseline" (default) for
+the baseline of X away from the fringes, or "auxin0"/"auxin1" for the mean
+of an aux input of the lock-in wired to the DC output of the detector).
+
+Every pass is saved as it is measured to <output>/pass_NNNN.npz. In sweep
+mode a pass holds the demodulator samples with the stage position and OPD
+interpolated at each sample ('position', 'opd', NaN outside of the move,
+see WL_fusion) and the trace of the PI data recorder ('record_*'). In
+flyscan mode it holds the samples tagged with their trigger
+positions, and the passes are also averaged into average.npz. The recipe
+and a summary are saved as JSON next to them.
+
+The simulation (--simulate) has no hardware triggered acquisition
+(dataAcquisitionModule), so the flyscan mode needs the real devices.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from Sub_Programs.WL_defaults import DEFAULT_OVERSAMPLING
+
+
+def load_recipe(filename):
+    with open(filename) as f:
+        Recipe = json.load(f)
+    for key in ('stage', 'lockin', 'output'):
+        if key not in Recipe:
+            raise ValueError('The recipe has no "{}" entry'.format(key))
+    Recipe.setdefault('iterations', 1)
+    Recipe.setdefault('mode', 'sweep')
+    Recipe.setdefault('wavelength', [0.4, 1.0])
+    Recipe.setdefault('oversampling', DEFAULT_OVERSAMPLING)
+    return Recipe
+
+
+def connect_stage(Stage):
+    from pipython import GCSDevice
+    Dev = GCSDevice(Stage.get('controller', 'C-891'))
+    if 'ip' in Stage:
+        Dev.ConnectTCPIP(Stage['ip'])
+    else:
+        Serial = Stage.get('usb')
+        if Serial is None:
+            Found = Dev.EnumerateUSB(mask = Stage.get('controller', ''))
+            if not Found:
+                raise RuntimeError('No USB controller found')
+            Serial = Found[0]
+        Dev.ConnectUSB(Serial)
+    Axe = str(Stage.get('axis', Dev.axes[0]))
+    if Dev.HasEAX():
+        Dev.EAX(Axe, True)
+    return Dev, Axe
+
+
+def connect_lockin(Lockin):
+    import zhinst.utils as utils
+    (DAQ, Device, _) = utils.create_api_session(Lockin['device'], 6)
+    Settings = [['/%s/%s' % (Device, Path), Value] for Path, Value in
+            Lockin.get('settings', {}).items()]
+    if Settings:
+        DAQ.set(Settings)
+    DAQ.setInt('/%s/demods/%d/enable' % (Device, Lockin.get('demod', 0)), 1)
+    DAQ.sync()
+    return DAQ, Device
+
+
+def save(Folder, Name, Data):
+    np.savez(os.path.join(Folder, Name), **Data)
+
+
+def run_sweeps(Recipe, Dev, Axe, DAQ, Device, Plan, Log):
+    """Sweep mode: stream the demodulator during every move, record the
+    stage positions with the PI data recorder and fuse them."""
+    from zhinst.ringbuffer import DemodRingBuffer
+    from zhinst.streaming import DemodStreamer
+    from Sub_Programs import WL_scan
+    from Sub_Programs.WL_fusion import fuse_record
+    Demod = Recipe['lockin'].get('demod', 0)
+    Rate = DAQ.getDouble('/%s/demods/%d/rate' % (Device, Demod))
+    Clockbase = DAQ.getInt('/%s/clockbase' % Device)
+    Sweep_Time = Plan['sweep_time'] + 1.0
+    Ring = DemodRingBuffer(int(2*Rate*Sweep_Time) + 1)
+    Streamer = DemodStreamer(DAQ, '/%s/demods/%d/sample' % (Device, Demod),
+            maxsize = None,
+            callback = lambda path, sample : Ring.append(sample))
+    Rec = WL_scan.recorder_init(Dev, Axe, Sweep_Time)
+    Low, High = Plan['range']
+    WL_scan.move(Dev, Axe, Low)
+    Dev.VEL(Axe, Plan['velocity'])
+    Passes = 0
+    with Streamer:
+        for i in range(Recipe['iterations']):
+            for Target in (High, Low):
+                Seen = Ring.total
+                Record = WL_scan.move(Dev, Axe, Target, Rec,
+                        clock = lambda : WL_scan.device_time(
+                            Streamer.session, Device))
+                time.sleep(2*Streamer.poll_length)
+                Data = fuse_record(Ring.since(Seen).copy(), Record,
+                        Clockbase)
+                Data.update(('record_' + Key, Value) for Key, Value in
+                        Record.items())
+                save(Recipe['output'], 'pass_%04d' % Passes, Data)
+                Passes += 1
+                Log('pass {}: {} samples, {} with a position'.format(
+                    Passes, len(Data['x']),
+                    np.count_nonzero(np.isfinite(Data['position']))))
+    return {'passes': Passes}
+
+
+def run_flyscans(Recipe, Dev, Axe, DAQ, Device, Plan, Log):
+    """Flyscan mode: the stage triggers one lock-in sample every step."""
+    from Sub_Programs.WL_flyscan import (Fly_Scan, max_velocity,
+            trigger_positions)
+    from Sub_Programs.WL_averaging import Pass_Average
+    from Sub_Programs import WL_analysis, WL_spectrum
+    from Sub_Programs.WL_fusion import OPD_PER_MM
+    Low, High = Recipe['stage']['min'], Recipe['stage']['max']
+    Level = Recipe.get('dc_level', 'baseline')
+    Signals = ('x', 'y')
+    if Level in ('auxin0', 'auxin1'):
+        Signals += (Level,)
+    Scan = Fly_Scan(Dev, Axe, DAQ, Device,
+            demod = Recipe['lockin'].get('demod', 0), signals = Signals)
+    # At most one trigger every second demodulator sample: half the
+    # planned velocity, the step of the plan is the finest step.
+    Velocity = min(Plan['velocity'], max_velocity(Plan['step'], Scan.Rate()))
+    Step = Recipe.get('step', Plan['step'])
+    if Step < Plan['step']:
+        Log('step {:g} mm triggers faster than half the demodulator rate, '
+                'using {:g} mm'.format(Step, Plan['step']))
+        Step = Plan['step']
+    Average = Pass_Average(trigger_positions(Low, High, Step), Scan.signals)
+    Passes = 0
+    for i in range(Recipe['iterations']):
+        for Start, End in ((Low, High), (High, Low)):
+            Pass = Scan.Run(Start, End, Step, Velocity)
+            save(Recipe['output'], 'pass_%04d' % Passes, Pass)
+            Average.add(Pass['position'], Pass)
+            Passes += 1
+            Log('pass {}: {} triggers'.format(Passes, len(Pass['x'])))
+    Mean = Average.result()
+    save(Recipe['output'], 'average', Mean)
+    Summary = {'passes': Passes, 'step': Step}
+    if Average.count.any():
+        if Level in ('auxin0', 'auxin1'):
+            Level = np.nanmedian(Mean[Level])
+        Result = WL_analysis.analyze(Mean['x'], Mean['position'],
+                level = Level)
+        save(Recipe['output'], 'spectrum',
+                WL_spectrum.spectrum(Mean['x'], Step*OPD_PER_MM,
+                    band = Recipe['wavelength']))
+        Visibility = float(Result['visibility'])
+        Summary.update(zpd = float(Result['zpd']),
+                visibility = None if np.isnan(Visibility) else Visibility)
+    return Summary
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = 'Run White Light '
+            'Interferometer scans without the GUI.')
+    Parser.add_argument('recipe', help = 'JSON scan recipe')
+    Parser.add_argument('--simulate', action = 'store_true',
+            help = 'use the simulated lock-in and stage (sweep mode only, '
+            'the simulation has no hardware triggered acquisition)')
+    Parser.add_argument('--quiet', action = 'store_true')
+    Args = Parser.parse_args(argv)
+    Log = (lambda Text : None) if Args.quiet else print
+    Recipe = load_recipe(Args.recipe)
+    if Args.simulate and Recipe['mode'] == 'flyscan':
+        Parser.error('--simulate cannot run the flyscan mode, the '
+                'simulated lock-in has no dataAcquisitionModule')
+    if Args.simulate:
+        import zhinst.simulation
+        from Sub_Programs import PI_Simulation
+        zhinst.simulation.install()
+        PI_Simulation.install()
+    from Sub_Programs import WL_planner, WL_scan
+
+    os.makedirs(Recipe['output'], exist_ok = True)
+    with open(os.path.join(Recipe['output'], 'recipe.json'), 'w') as f:
+        json.dump(Recipe, f, indent = 4)
+
+    Dev, Axe = connect_stage(Recipe['stage'])
+    DAQ, Device = connect_lockin(Recipe['lockin'])
+    if Recipe['stage'].get('reference', True):
+        Log('Referencing axis {}'.format(Axe))
+        if not WL_scan.reference(Dev, Axe):
+            raise RuntimeError('Referencing failed')
+
+    Low, High = Recipe['stage']['min'], Recipe['stage']['max']
+    Max_Vel, Acc = WL_planner.stage_limits(Dev, Axe)
+    if 'velocity' in Recipe:
+        Max_Vel = min(Max_Vel, float(Recipe['velocity']))
+    Plan = WL_planner.plan_scan(Low, High, min(Recipe['wavelength']),
+            max(Recipe['wavelength']),
+            *WL_planner.demod_settings(DAQ, Device,
+                Recipe['lockin'].get('demod', 0)),
+            oversampling = Recipe['oversampling'],
+            max_velocity = Max_Vel, acceleration = Acc)
+    Tmin, Tmax = WL_scan.travel_range(Dev, Axe)
+    Plan['range'] = (max(Low - Plan['margin'], Tmin),
+            min(High + Plan['margin'], Tmax))
+    Log('Velocity {:.4g} mm/s (limited by {}), {:.3g} s per sweep'.format(
+        Plan['velocity'], Plan['limit'], Plan['sweep_time']))
+
+    Start = time.time()
+    if Recipe['mode'] == 'flyscan':
+        Summary = run_flyscans(Recipe, Dev, Axe, DAQ, Device, Plan, Log)
+    elif Recipe['mode'] == 'sweep':
+        Summary = run_sweeps(Recipe, Dev, Axe, DAQ, Device, Plan, Log)
+    else:
+        raise ValueError('Unknown mode {}'.format(Recipe['mode']))
+    Summary.update(duration = time.time() - Start,
+            velocity = Plan['velocity'], limit = Plan['limit'])
+    with open(os.path.join(Recipe['output'], 'summary.json'), 'w') as f:
+        json.dump(Summary, f, indent = 4)
+    Log('Finished in {:.1f} s'.format(Summary['duration']))
+    Dev.CloseConnection()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
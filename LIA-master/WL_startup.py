@@ -0,0 +1,106 @@
+###################################################################
+#                   WhiteLight Interferometer Program             #
+#                   Startup time benchmark                        #
+#                   For : Ultrafast and Quantum Laboratory        #
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+###################################################################
+"""Measure how long WhiteLight.py takes to show its window.
+
+    python WL_startup.py                  # 5 cold starts
+    python WL_startup.py --runs 10 --limit 1.5
+
+Every run starts a new Python interpreter, which imports WhiteLight, creates
+the window and draws it once (update()). It reports the import time, the
+time until the window is drawn, and the heavy modules (numpy, matplotlib,
+pipython, zhinst.ziPython, scipy) that were already imported before the
+window was drawn. These are loaded on first use or in the background by
+WL_backend.Warm_Up, so any of them in the list is a regression.
+
+The exit code is 1 if a heavy module is imported before the window, or if
+the median startup time exceeds --limit seconds. Without a display, only
+the import time and the imported modules are checked.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ('numpy', 'matplotlib', 'pipython', 'zhinst.ziPython',
+        'scipy')
+
+
+def child():
+    """One cold start, the result is printed as JSON."""
+    Start = time.perf_counter()
+    import WhiteLight
+    Result = {'import': time.perf_counter() - Start, 'window': None}
+    try:
+        app = WhiteLight.White_Light_Inteferometer()
+    except Exception as e:
+        # No display, or the icon is missing
+        Result['error'] = str(e)
+    else:
+        Result['heavy'] = [Name for Name in HEAVY_MODULES
+                if Name in sys.modules]
+        app.update()
+        Result['window'] = time.perf_counter() - Start
+        app.destroy()
+    Result.setdefault('heavy', [Name for Name in HEAVY_MODULES
+        if Name in sys.modules])
+    print(json.dumps(Result))
+
+
+def run(runs):
+    """Return the results of `runs` cold starts."""
+    Folder = os.path.dirname(os.path.abspath(__file__))
+    Results = []
+    for i in range(runs):
+        Output = subprocess.run([sys.executable, os.path.abspath(__file__),
+            '--child'], cwd = Folder, stdout = subprocess.PIPE,
+            check = True, universal_newlines = True).stdout
+        Results.append(json.loads(Output.strip().splitlines()[-1]))
+    return Results
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = 'Benchmark the startup '
+            'of WhiteLight.py.')
+    Parser.add_argument('--runs', type = int, default = 5)
+    Parser.add_argument('--limit', type = float, default = None,
+            help = 'maximum median startup time in s')
+    Parser.add_argument('--child', action = 'store_true',
+            help = argparse.SUPPRESS)
+    Args = Parser.parse_args(argv)
+    if Args.child:
+        child()
+        return 0
+
+    Results = run(Args.runs)
+    Import = statistics.median(R['import'] for R in Results)
+    print('import WhiteLight : {:.3f} s (median of {})'.format(Import,
+        len(Results)))
+    Windows = [R['window'] for R in Results if R['window'] is not None]
+    Startup = Import
+    if Windows:
+        Startup = statistics.median(Windows)
+        print('window drawn      : {:.3f} s'.format(Startup))
+    else:
+        print('window not drawn  : {}'.format(Results[0].get('error')))
+    Heavy = sorted(set(Name for R in Results for Name in R['heavy']))
+    print('heavy modules before the window : {}'.format(
+        ', '.join(Heavy) or 'none'))
+
+    Failed = bool(Heavy)
+    if Args.limit is not None and Startup > Args.limit:
+        print('Startup {:.3f} s exceeds the limit of {:.3f} s'.format(
+            Startup, Args.limit))
+        Failed = True
+    return 1 if Failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,17 +13,22 @@ from tkinter import filedialog
 #Sub_Programs
 import Sub_Programs as SP
 from Sub_Programs import WL_backend as backend
+from Sub_Programs.WL_events import BUS
 #Pathlib
 from pathlib import Path
-#Zurich Instrumente Librairies:
-import zhinst.utils as utils
-import zhinst.Save_Zi as Save_Zi
+#Zurich Instrumente Librairies are imported when first used (they load
+#numpy and ziPython), backend.Warm_Up loads them once the window is shown
 #Os python package:
 import os
 #Font Size
 LARGE_FONT = ("Arial", 12)
 NORM_FONT = ("Arial", 10)
 SMALL_FONT = ("Arial", 8)
+#Demodulator samples kept for the live plot
+RING_SIZE = 10**6
+#Lock-in nodes read from the node cache, kept up to date by the streamer
+CACHED_NODES = ('demods/*/rate', 'demods/*/timeconstant', 'demods/*/order',
+        'sigins/*/range', 'oscs/*/freq')
 
 class White_Light_Inteferometer(tk.Tk):
 
@@ -60,8 +65,17 @@ class White_Light_Inteferometer(tk.Tk):
         height = self.winfo_screenheight()
         #Initialisation of different elements
         Mainframe = ttk.Frame(self, padding = (6,6,6,6))
-        GraphBox = backend.Graphic(parent = Mainframe, width = 175,
-                height = 150)
+        self.Ring = None
+        self.Streamer = None
+        #(DAQ, device id, demodulator, node cache) of the stream
+        self.Stream = None
+        GraphBox = backend.Graphic(parent = Mainframe, width = 350,
+                height = 250)
+        self.GraphBox = GraphBox
+        #Spectrum of the averaged passes, updated after each pass
+        SpectrumBox = backend.Graphic(parent = Mainframe, width = 350,
+                height = 250)
+        self.SpectrumBox = SpectrumBox
         CCBox = ttk.Combobox(Mainframe, textvariable = '',
                 state = 'readonly')
         CCBox.grid(row = 0, column = 0,sticky = 'nw')
@@ -92,9 +106,10 @@ class White_Light_Inteferometer(tk.Tk):
         #Mainframe configuration
         Mainframe.grid(row = 0, column = 0)
         #GraphBox configuration
-        GraphBox.create_text(175/2, 75, text = "Awesome Graph",font
-            = LARGE_FONT, fill = "black")
+        GraphBox.Title('Demodulator R')
         GraphBox.grid(row = 0, column = 1, padx = 5, pady = 5)
+        SpectrumBox.Title('Spectrum')
+        SpectrumBox.grid(row = 0, column = 2, padx = 5, pady = 5)
         #File location/reading configuration
         File_Dialog.grid(row = 1, column = 1, padx = 2, pady = 2)
 
@@ -112,10 +127,17 @@ class White_Light_Inteferometer(tk.Tk):
                         File_Dialog.File_InDir, self.PI_Data,
                         self.Zi_Data))
 
-        File_Dialog.Stop.bind('<Button-1>',
-                    lambda : self.Stop_Measurement(
-                        self.PI_Data,
-                        self.Zi_Data))
+        File_Dialog.Stop.configure(command = self.Stop_Measurement)
+        #Workers talk to the widgets through the event bus, drained
+        #from the Tk loop
+        BUS.subscribe('pi/connected', self.PI_Connected)
+        BUS.subscribe('zi/connected', self.Zi_Connected)
+        BUS.subscribe('zi/demod', self.Demod_Changed)
+        BUS.subscribe('motion/spectrum', self.Show_Spectrum, latest = True)
+        BUS.start(self)
+        #Heavy modules are imported in the background once the window
+        #is drawn
+        self.after_idle(backend.Warm_Up)
 
 
 
@@ -125,6 +147,7 @@ class White_Light_Inteferometer(tk.Tk):
     def Save_Setting(self, Folder, PI_Data, ZI_Data):
 
         def Save(Dir, ZI_Data, PI_Data):
+            import zhinst.utils as utils
             utils.save_settings( ZI_Data['DAQ'],
                     ZI_Data['Device_id'].get(),
                     Dir.get()+os.sep+'_zi_settings.xml')
@@ -145,6 +168,7 @@ class White_Light_Inteferometer(tk.Tk):
     def Load_Setting(self, Folder, PI_Data, ZI_Data):
 
         def Load(Dir, ZI_Data, PI_Data):
+            import zhinst.utils as utils
             utils.load_settings( ZI_Data['DAQ'],
                     ZI_Data['Device_id'].get(),
                     Dir.get()+os.sep+'_zi_settings.xml')
@@ -162,30 +186,73 @@ class White_Light_Inteferometer(tk.Tk):
                     message = 'Settings as been saved to the'+
                     'desiered folder.')
 
-    def Stop_Measurement(self, ):
-        print('stop')
-
-def Refresh(app, Frame, receiver):
-    if app.Frame.connected==False:
-        app.after(1000, Refresh, app, Frame, receiver)
-    else:
-        if app.Frame == app.frame:
-            app.PI_Control.Devices = app.frame.Devices_connected
-            app.PI_Data = app.PI_Control.Show_device()
-        elif app.Frame == app.ZiFrame:
-            app.ZI_Control(DAQ = app.ZiFrame.DAQ,
-                    Device = app.ZiFrame.device,
-                    Prop = app.ZiFrame.proprieties)
-            app.Zi_Data = app.ZI_Control.Zi_Setting_List
-
-app = White_Light_Inteferometer()
-app.frame.CbmBox.bind("<<ComboboxSelected>>",app.frame.Meth_show)
-
-app.frame.CButton.bind('<Button-1>', lambda x : Refresh(app, frame,
-    PI_Control ))
-app.ZiFrame.CButton.bind('<Button-1>', lambda x : Refresh(app,
-    ZiFrame, ZI_Control))
-
-app.geometry("+{}+{}".format(int(width/5),int(height/5)))
-app.mainloop()
+    def Stop_Measurement(self):
+        #Halts the stage and drops the queued sweeps
+        self.PI_Control.Stop_Motion()
+
+    def Start_Streaming(self, DAQ, Device_id, Demod = 0, Nodes = None):
+        #The poll thread fills the ring buffer, the live plot reads it,
+        #and keeps the node cache Nodes up to date. DAQ is the
+        #LockedSession shared with the Tk thread and the motion worker.
+        from zhinst.ringbuffer import DemodRingBuffer
+        from zhinst.streaming import DemodStreamer
+        if self.Streamer is not None:
+            self.Streamer.stop()
+        if self.Ring is None:
+            self.Ring = DemodRingBuffer(RING_SIZE)
+        self.Ring.clear()
+        #The ring is the only consumer, no queue
+        self.Streamer = DemodStreamer(DAQ,
+                '/%s/demods/%d/sample' % (Device_id, Demod),
+                maxsize = None, node_cache = Nodes,
+                callback = lambda path, sample : self.Ring.append(sample))
+        self.Stream = (DAQ, Device_id, Demod, Nodes)
+        self.Streamer.start()
+        self.GraphBox.Attach(self.Ring,
+                (Nodes or DAQ).getInt('/%s/clockbase' % Device_id))
+
+    def Demod_Changed(self, Demod):
+        if self.Streamer is not None and self.Stream[2] != Demod:
+            DAQ, Device_id, _, Nodes = self.Stream
+            self.Start_Streaming(DAQ, Device_id, Demod, Nodes)
+
+    def Show_Spectrum(self, Spectrum):
+        #Bins in increasing wavelength
+        if len(Spectrum['wavelength']):
+            self.SpectrumBox.Plot(Spectrum['wavelength'][::-1],
+                    Spectrum['intensity'][::-1], 'Wavelength [um]')
+
+    def PI_Connected(self, Devices):
+        self.PI_Control.Devices = Devices
+        self.PI_Data = self.PI_Control.Show_device()
+
+    def Zi_Connected(self, Session):
+        from zhinst.nodecache import NodeCache
+        from zhinst.streaming import LockedSession
+        DAQ, Device_id, Prop, _ = Session
+        #The poll thread, the motion worker and the Tk thread share the
+        #session: every API call goes through its lock
+        DAQ = LockedSession(DAQ)
+        #Repeated node reads (scan planning, flyscan, plot) are answered
+        #by the cache instead of a round trip to the Data Server
+        Nodes = NodeCache(DAQ, ['/%s/%s' % (Device_id, Node)
+            for Node in CACHED_NODES])
+        self.ZI_Control.Set_Device(Nodes, Device_id, Prop)
+        self.Zi_Data = self.ZI_Control.Zi_Setting_List
+        self.Start_Streaming(DAQ, Device_id,
+                self.ZI_Control.Zi_Setting_List['Demodulator'].get(), Nodes)
+        #Sweeps fuse the streamed samples with the recorded positions
+        self.PI_Control.Set_Lockin(Nodes, Device_id, self.Ring,
+                2*self.Streamer.poll_length,
+                self.ZI_Control.Zi_Setting_List['Demodulator'])
+
+def main():
+    app = White_Light_Inteferometer()
+    app.frame.CbmBox.bind("<<ComboboxSelected>>",app.frame.Meth_show)
+
+    app.geometry("+{}+{}".format(int(width/5),int(height/5)))
+    app.mainloop()
+
+if __name__ == '__main__':
+    main()
 
@@ -0,0 +1,13 @@
+"""Run the tests against the simulated lock-in (zhinst.simulation) and the
+simulated PI stage (Sub_Programs.PI_Simulation), without ziPython, pipython
+or any device."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zhinst.simulation
+from Sub_Programs import PI_Simulation
+
+zhinst.simulation.install()
+PI_Simulation.install()
@@ -0,0 +1,127 @@
+"""The asyncio facade runs the blocking API calls in the session's executor
+and waits for the modules on the event loop."""
+import asyncio
+import threading
+
+import pytest
+
+import zhinst.aio as aio
+import zhinst.utils as utils
+
+
+class Module(object):
+    # Stands for a LabOne module, which the simulated lock-in does not have:
+    # finished after `checks` calls of finished().
+    def __init__(self, checks=3):
+        self.checks = checks
+        self.settings = {}
+        self.threads = set()
+        self.executed = self.cleared = False
+
+    def set(self, path, value):
+        self.settings[path] = value
+
+    def execute(self):
+        self.executed = True
+
+    def finished(self):
+        self.threads.add(threading.current_thread().name)
+        self.checks -= 1
+        return self.checks < 0
+
+    def progress(self):
+        return [1.0 / (1 + max(self.checks, 0))]
+
+    def read(self, flat):
+        return {'flat': flat}
+
+    def clear(self):
+        self.cleared = True
+
+
+def test_session_calls_in_executor():
+    daq, device, _ = utils.create_api_session('dev2318', 6)
+    adaq = aio.AsyncDAQServer(daq)
+    path = '/%s/demods/0/rate' % device
+    threads = []
+    get_double = daq.getDouble
+    daq.getDouble = lambda *args: (threads.append(threading.current_thread()),
+                                   get_double(*args))[1]
+
+    async def measure():
+        await adaq.set([['/%s/demods/0/enable' % device, 1]])
+        await adaq.setDouble(path, 1000.0)
+        await adaq.sync()
+        await adaq.subscribe('/%s/demods/0/sample' % device)
+        rate = await adaq.getDouble(path)
+        data = await adaq.poll(0.05, 100)
+        await adaq.unsubscribe('/%s/demods/0/sample' % device)
+        return rate, data
+
+    rate, data = asyncio.run(measure())
+    adaq.close()
+    assert rate == pytest.approx(daq.getDouble(path))
+    assert '/%s/demods/0/sample' % device in data
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_wait_finished_on_the_loop():
+    modules = [Module(3), Module(5)]
+    asyncs = [aio.AsyncModule(module) for module in modules]
+    progress = []
+    ticks = []
+
+    async def ticker():
+        # The loop stays free while the modules are waited for
+        for _ in range(5):
+            ticks.append(1)
+            await asyncio.sleep(0)
+
+    async def run():
+        for module in asyncs:
+            module.execute()
+        await asyncio.gather(asyncs[0].wait_finished(callback=progress.append),
+                             asyncs[1].wait_finished(), ticker())
+        return await asyncs[0].read()
+
+    assert asyncio.run(run()) == {'flat': True}
+    assert all(module.executed and module.checks == -1 for module in modules)
+    assert progress == pytest.approx([1 / 3, 1 / 2, 1.0])
+    assert len(ticks) == 5
+    assert threading.main_thread().name not in modules[0].threads
+
+
+def test_wait_finished_timeout():
+    module = aio.AsyncModule(Module(10 ** 6))
+    with pytest.raises(RuntimeError):
+        asyncio.run(module.wait_finished(timeout=0.05))
+
+
+class Session(object):
+    def __init__(self, module):
+        self.module = module
+
+    def deviceSettings(self):
+        return self.module
+
+
+def test_load_settings(tmp_path):
+    module = Module(2)
+    adaq = aio.AsyncDAQServer(Session(module))
+    asyncio.run(aio.load_settings(adaq, 'dev2318', str(tmp_path / 'setup.xml')))
+    adaq.close()
+    assert module.settings == {'deviceSettings/device': 'dev2318',
+                               'deviceSettings/filename': 'setup',
+                               'deviceSettings/path': str(tmp_path),
+                               'deviceSettings/command': 'load'}
+    assert module.executed and module.cleared
+
+
+def test_save_settings_timeout():
+    module = Module(10 ** 6)
+    adaq = aio.AsyncDAQServer(Session(module))
+    with pytest.raises(RuntimeError, match='save device settings'):
+        asyncio.run(aio.save_settings(adaq, 'dev2318', 'setup.xml', timeout=0.05))
+    adaq.close()
+    assert module.settings['deviceSettings/path'].startswith('.')
+    assert module.cleared
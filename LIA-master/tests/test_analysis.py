@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from Sub_Programs import WL_analysis
+
+
+def fringe_packet(zpd = 0.1234, level = 2.0, amplitude = 0.5,
+        points = 4001):
+    #Fringes of a 1 um carrier under a gaussian coherence envelope, on a
+    #baseline level (chopped beam: X follows the detector intensity)
+    grid = np.linspace(-10.0, 10.0, points)
+    envelope = amplitude*np.exp(-((grid - zpd)/1.5)**2)
+    return grid, level + envelope*np.cos(2*np.pi*(grid - zpd))
+
+
+def test_find_peak_sub_sample():
+    index = np.arange(50)
+    values = -(index - 20.3)**2
+    peak_index, peak = WL_analysis.find_peak(values)
+    assert peak_index == pytest.approx(20.3)
+    assert peak == pytest.approx(0.0)
+
+
+def test_find_peak_rows():
+    index = np.arange(50)
+    values = np.stack([-(index - 10.25)**2, 3 - (index - 40.5)**2])
+    peak_index, peak = WL_analysis.find_peak(values)
+    assert peak_index == pytest.approx([10.25, 40.5])
+    assert peak == pytest.approx([0.0, 3.0])
+
+
+def test_zpd_and_visibility_with_level():
+    grid, x = fringe_packet()
+    Result = WL_analysis.analyze(x, grid, level = 2.0)
+    assert Result['zpd'] == pytest.approx(0.1234, abs = 5e-3)
+    assert Result['peak'] == pytest.approx(0.5, rel = 1e-2)
+    assert Result['visibility'] == pytest.approx(0.25, rel = 1e-2)
+
+
+def test_visibility_from_baseline():
+    grid, x = fringe_packet()
+    Result = WL_analysis.analyze(x, grid, level = 'baseline')
+    assert Result['level'] == pytest.approx(2.0, rel = 1e-3)
+    assert Result['visibility'] == pytest.approx(0.25, rel = 1e-2)
+
+
+def test_batch_of_scans():
+    grid, x1 = fringe_packet(zpd = -1.0, level = 1.0)
+    _, x2 = fringe_packet(zpd = 2.0, level = 4.0)
+    Result = WL_analysis.analyze(np.stack([x1, x2]), grid,
+            level = 'baseline')
+    assert Result['zpd'] == pytest.approx([-1.0, 2.0], abs = 5e-3)
+    assert Result['visibility'] == pytest.approx([0.5, 0.125], rel = 1e-2)
+
+
+def test_no_visibility_without_level():
+    grid, x = fringe_packet(level = 0.0)
+    assert np.isnan(WL_analysis.analyze(x, grid)['visibility'])
+    #No DC level on the baseline of the demodulated fringes
+    Result = WL_analysis.analyze(x, grid, level = 'baseline')
+    assert np.isnan(Result['visibility'])
+
+
+def test_unknown_level():
+    grid, x = fringe_packet()
+    with pytest.raises(ValueError):
+        WL_analysis.analyze(x, grid, level = 'auxin0')
@@ -0,0 +1,31 @@
+import numpy as np
+
+from Sub_Programs.WL_averaging import Pass_Average
+
+
+def test_welford_matches_numpy():
+    rng = np.random.RandomState(1)
+    grid = np.linspace(0.0, 1.0, 101)
+    passes = [rng.normal(size=len(grid)) for _ in range(20)]
+    average = Pass_Average(grid, ('x',))
+    for i, x in enumerate(passes):
+        if i % 2:
+            # Backward pass: decreasing positions.
+            average.add(grid[::-1], {'x': x[::-1]})
+        else:
+            average.add(grid, {'x': x})
+    np.testing.assert_allclose(average.mean['x'], np.mean(passes, axis=0))
+    np.testing.assert_allclose(average.variance('x'), np.var(passes, axis=0, ddof=1))
+    assert average.passes == 20
+    assert np.all(average.count == 20)
+
+
+def test_uncovered_points_and_nan_positions():
+    grid = np.linspace(0.0, 10.0, 11)
+    average = Pass_Average(grid, ('x',))
+    positions = np.array([np.nan, 8.0, 6.0, 4.0, np.nan])
+    average.add(positions, {'x': np.array([9.0, 8.0, 6.0, 4.0, 9.0])})
+    np.testing.assert_array_equal(average.count, [0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0])
+    result = average.result()
+    np.testing.assert_allclose(result['x'][4:9], [4.0, 5.0, 6.0, 7.0, 8.0])
+    assert np.isnan(result['x'][0])
@@ -0,0 +1,57 @@
+"""WL_batch runs a recipe headless against the simulated lock-in and stage."""
+import json
+
+import numpy as np
+import pytest
+
+import WL_batch
+
+
+def write_recipe(tmp_path, **entries):
+    recipe = {'stage': {'controller': 'C-891', 'usb': '0000000000', 'axis': '1',
+                        'min': 10.0, 'max': 10.5},
+              'iterations': 1,
+              'lockin': {'device': 'dev2318', 'demod': 0,
+                         'settings': {'demods/0/rate': 13393,
+                                      'demods/0/timeconstant': 0.0001}},
+              'output': str(tmp_path / 'run')}
+    recipe.update(entries)
+    filename = tmp_path / 'recipe.json'
+    filename.write_text(json.dumps(recipe))
+    return filename
+
+
+def test_simulated_sweeps(tmp_path):
+    assert WL_batch.main([str(write_recipe(tmp_path)), '--simulate', '--quiet']) == 0
+    run = tmp_path / 'run'
+    assert sorted(path.name for path in run.iterdir()) == [
+        'pass_0000.npz', 'pass_0001.npz', 'recipe.json', 'summary.json']
+    summary = json.loads((run / 'summary.json').read_text())
+    assert summary['passes'] == 2
+    assert summary['velocity'] > 0 and summary['duration'] > 0
+    assert json.loads((run / 'recipe.json').read_text())['oversampling'] > 0
+    for name, (start, end) in (('pass_0000.npz', (10.0, 10.5)),
+                               ('pass_0001.npz', (10.5, 10.0))):
+        with np.load(str(run / name)) as data:
+            assert {'timestamp', 'x', 'y', 'position', 'opd',
+                    'record_position'} <= set(data.files)
+            position = data['position'][np.isfinite(data['position'])]
+            assert len(position) > 0
+            # The samples of the move, inside of its range with the margin
+            assert position.min() > min(start, end) - 1.0
+            assert position.max() < max(start, end) + 1.0
+            # Forward then backward
+            assert np.sign(position[-1] - position[0]) == np.sign(end - start)
+
+
+def test_simulated_flyscan_refused(tmp_path):
+    with pytest.raises(SystemExit):
+        WL_batch.main([str(write_recipe(tmp_path, mode='flyscan')), '--simulate'])
+    assert not (tmp_path / 'run').exists()
+
+
+def test_recipe_without_output(tmp_path):
+    filename = tmp_path / 'recipe.json'
+    filename.write_text(json.dumps({'stage': {}, 'lockin': {}}))
+    with pytest.raises(ValueError, match='output'):
+        WL_batch.load_recipe(str(filename))
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import zhinst.utils as utils
+
+
+@pytest.fixture(params=['pandas', 'loadtxt'])
+def parser(request, monkeypatch):
+    # Run each test with pandas.read_csv() and with the numpy.loadtxt() fallback.
+    if request.param == 'pandas':
+        pytest.importorskip('pandas')
+    else:
+        monkeypatch.setitem(sys.modules, 'pandas', None)
+    return request.param
+
+
+def write(path, text):
+    path.write_text(text)
+    return path
+
+
+def test_csv_column_types_follow_the_header(tmp_path, parser):
+    # The first data lines look like integers: the values column must still
+    # be read as float, timestamp and chunk as integers.
+    csv = write(tmp_path / 'dev2004_pids_0_error_00000.csv',
+                'chunk;timestamp;value\n0;100;1\n0;200;2\n1;300;2.5\n')
+    data = utils.load_labone_csv(csv)
+    assert data.dtype['chunk'] == np.dtype('u8')
+    assert data.dtype['timestamp'] == np.dtype('u8')
+    assert data.dtype['value'] == np.dtype('f8')
+    np.testing.assert_array_equal(data['value'], [1.0, 2.0, 2.5])
+    np.testing.assert_array_equal(data['timestamp'], [100, 200, 300])
+
+
+def test_csv_without_data_lines(tmp_path, parser):
+    csv = write(tmp_path / 'empty.csv', 'chunk;timestamp;value\n')
+    data = utils.load_labone_csv(csv)
+    assert len(data) == 0
+    assert data.dtype.names == ('chunk', 'timestamp', 'value')
+
+
+def test_csv_without_header(tmp_path, parser):
+    with pytest.raises(ValueError):
+        utils.load_labone_csv(write(tmp_path / 'none.csv', ''))
+
+
+def test_csv_parsed_in_chunks(tmp_path, parser):
+    lines = ''.join('0;%d;%d.5\n' % (i, i) for i in range(25))
+    csv = write(tmp_path / 'chunked.csv', 'chunk;timestamp;value\n' + lines)
+    data = utils._read_csv_chunks(csv, [('timestamp', 'u8'), ('value', 'f8')], [1, 2], 10)
+    np.testing.assert_array_equal(data['timestamp'], np.arange(25))
+    np.testing.assert_array_equal(data['value'], np.arange(25) + 0.5)
+
+
+def test_pandas_not_imported_with_utils():
+    # zhinst.utils only imports pandas when a CSV file is first loaded.
+    code = ('import sys, zhinst.simulation; zhinst.simulation.install(); '
+            'import zhinst.utils; print("pandas" in sys.modules)')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(utils.__file__)))
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+    assert out.strip() == b'False'
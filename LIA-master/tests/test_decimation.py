@@ -0,0 +1,44 @@
+import numpy as np
+
+from Sub_Programs.WL_decimation import MinMax_Decimator, lttb, minmax
+
+
+def test_minmax_keeps_the_extrema_of_every_bucket():
+    x = np.arange(12.0)
+    y = np.array([0, 5, -1, 2, 2, 2, 9, 1, 3, -4, 0, 7.0])
+    X, Y = minmax(x, y, 4)
+    np.testing.assert_array_equal(Y, [5, -1, 9, 1, -4, 7])
+    np.testing.assert_array_equal(X, [1, 2, 6, 7, 9, 11])
+
+
+def test_minmax_decimator_is_bounded_and_keeps_the_envelope():
+    decimator = MinMax_Decimator(points=100)
+    t = np.arange(100000.0)
+    y = np.sin(t/50.0)
+    y[12345] = 10.0
+    y[54321] = -10.0
+    for start in range(0, len(t), 7000):
+        decimator.add(t[start:start + 7000], y[start:start + 7000])
+    X, Y = decimator.data()
+    assert len(X) <= 4*decimator.points
+    assert np.all(np.diff(X) >= 0)
+    assert Y.max() == 10.0
+    assert Y.min() == -10.0
+    assert decimator.total == len(t)
+
+
+def test_lttb_keeps_the_ends_and_the_peak():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[500] = 1.0
+    X, Y = lttb(x, y, 50)
+    assert len(X) == 50
+    assert X[0] == 0 and X[-1] == 999
+    assert 1.0 in Y
+    assert np.all(np.diff(X) > 0)
+
+
+def test_lttb_returns_short_series_unchanged():
+    x = np.arange(10.0)
+    X, Y = lttb(x, x, 20)
+    np.testing.assert_array_equal(X, x)
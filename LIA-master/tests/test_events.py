@@ -0,0 +1,92 @@
+"""The event bus dispatches the events of any thread on the draining thread."""
+import threading
+
+from Sub_Programs.WL_events import Event_Bus
+
+
+class Widget(object):
+    # Stands for the Tk widget whose after() runs the draining tick.
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, func):
+        self.pending.append((ms, func))
+
+    def run(self):
+        ms, func = self.pending.pop(0)
+        func()
+
+
+def test_events_in_order_on_the_draining_thread():
+    bus = Event_Bus()
+    received = []
+    bus.subscribe('motion/message', lambda value:
+                  received.append((value, threading.current_thread().name)))
+    worker = threading.Thread(target=lambda: [bus.publish('motion/message', i)
+                                              for i in range(3)], name='Worker')
+    worker.start()
+    worker.join()
+    assert received == []
+    assert bus.drain() == 3
+    assert received == [(i, threading.current_thread().name) for i in range(3)]
+    assert bus.drain() == 0
+
+
+def test_latest_only_receives_the_last_value_of_a_batch():
+    bus = Event_Bus()
+    every, latest = [], []
+    bus.subscribe('motion/progress', every.append)
+    bus.subscribe('motion/progress', latest.append, latest=True)
+    for value in (0.1, 0.2, 0.3):
+        bus.publish('motion/progress', value)
+    bus.publish('motion/done')
+    bus.drain()
+    assert every == [0.1, 0.2, 0.3]
+    assert latest == [0.3]
+
+
+def test_batch_limit():
+    bus = Event_Bus(batch=2)
+    received = []
+    bus.subscribe('zi/sample', received.append)
+    for i in range(5):
+        bus.publish('zi/sample', i)
+    assert bus.drain() == 2
+    assert received == [0, 1]
+    assert bus.drain() + bus.drain() == 3
+    assert received == list(range(5))
+
+
+def test_failing_subscriber_and_unsubscribe(capsys):
+    bus = Event_Bus()
+    received = []
+
+    def fail(value):
+        raise RuntimeError('subscriber failed')
+    bus.subscribe('pi/error', fail)
+    bus.subscribe('pi/error', received.append)
+    bus.publish('pi/error', 'a')
+    bus.drain()
+    assert received == ['a']
+    assert 'subscriber failed' in capsys.readouterr().err
+    bus.unsubscribe('pi/error', received.append)
+    bus.publish('pi/error', 'b')
+    bus.drain()
+    assert received == ['a']
+
+
+def test_tick_until_stopped():
+    bus = Event_Bus(period=5)
+    widget = Widget()
+    received = []
+    bus.subscribe('motion/message', received.append)
+    bus.start(widget)
+    assert widget.pending[0][0] == 5
+    bus.publish('motion/message', 'moving')
+    widget.run()
+    assert received == ['moving']
+    # The tick is scheduled again until stop()
+    assert len(widget.pending) == 1
+    bus.stop()
+    widget.run()
+    assert widget.pending == []
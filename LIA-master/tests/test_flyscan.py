@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from pipython import GCSDevice
+
+import zhinst.utils as utils
+from Sub_Programs import WL_scan
+from Sub_Programs.WL_flyscan import (Fly_Scan, MAX_TRIGGER_FRACTION, max_velocity,
+                                     trigger_positions)
+
+
+class DataAcquisitionModule(object):
+    # Stands for the dataAcquisitionModule, which the simulated lock-in
+    # does not have: every grid row is triggered, its value is its index.
+    def __init__(self):
+        self.settings = {}
+        self.subscribed = []
+        self.executed = self.cleared = False
+
+    def set(self, path, value):
+        self.settings[path] = value
+
+    def subscribe(self, path):
+        self.subscribed.append(path)
+
+    def execute(self):
+        self.executed = True
+
+    def finished(self):
+        return True
+
+    def read(self, flat):
+        rows = self.settings['dataAcquisitionModule/grid/rows']
+        return {path: [{'value': np.arange(rows, dtype=float)[:, np.newaxis],
+                        'timestamp': np.arange(rows, dtype=np.uint64)[:, np.newaxis]}]
+                for path in self.subscribed}
+
+    def finish(self):
+        pass
+
+    def clear(self):
+        self.cleared = True
+
+
+@pytest.fixture
+def scan(monkeypatch):
+    daq, device, _ = utils.create_api_session('dev2318', 6)
+    daq.setDouble('/%s/demods/0/rate' % device, 1000.0)
+    module = DataAcquisitionModule()
+    monkeypatch.setattr(daq, 'dataAcquisitionModule', lambda: module, raising=False)
+    dev = GCSDevice('C-891')
+    dev.ConnectUSB('0000000000')
+    axis = dev.axes[0]
+    dev.EAX(axis, True)
+    assert WL_scan.reference(dev, axis)
+    dev.VEL(axis, 20.0)
+    return Fly_Scan(dev, axis, daq, device), module
+
+
+def test_max_velocity():
+    # One trigger every second sample at most.
+    assert MAX_TRIGGER_FRACTION == 0.5
+    assert max_velocity(0.01, 1000.0) == max_velocity(-0.01, 1000.0) == pytest.approx(5.0)
+
+
+def test_run_tags_one_sample_per_trigger(scan):
+    scan, module = scan
+    data = scan.Run(12.0, 10.0, 0.01, 5.0)
+    positions = trigger_positions(12.0, 10.0, 0.01)
+    np.testing.assert_allclose(data['position'], positions)
+    np.testing.assert_array_equal(data['x'], np.arange(len(positions)))
+    assert module.executed and module.cleared
+    assert module.settings['dataAcquisitionModule/grid/rows'] == len(positions)
+    assert module.settings['dataAcquisitionModule/triggernode'].endswith('sample.TrigIn1')
+    config = scan.Dev.qCTO()[1]
+    assert config['enabled'] is False
+    assert config[1] == pytest.approx(0.01)
+
+
+def test_trigger_rate_is_limited(scan):
+    scan, module = scan
+    # 1000 Sa/s: a trigger every 0.01 mm allows 5 mm/s.
+    with pytest.raises(ValueError):
+        scan.Run(10.0, 12.0, 0.01, 10.0)
+    assert not module.executed
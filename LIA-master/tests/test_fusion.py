@@ -0,0 +1,26 @@
+import numpy as np
+
+from Sub_Programs.WL_fusion import Position_Fusion, fuse_record
+
+
+def test_fuse_record():
+    record = {'timestamp': 1000, 'time': np.array([0.0, 1.0]),
+              'position': np.array([5.0, 6.0])}
+    sample = {'timestamp': np.array([500, 1000, 1500, 2000, 2500], dtype=np.uint64),
+              'x': np.ones(5)}
+    fused = fuse_record(sample, record, clockbase=1000.0)
+    np.testing.assert_allclose(fused['position'], [np.nan, 5.0, 5.5, 6.0, np.nan])
+    np.testing.assert_allclose(fused['opd'][1:4], [10000.0, 11000.0, 12000.0])
+
+
+def test_fusion_holds_back_a_bounded_number_of_samples():
+    fusion = Position_Fusion(1000.0, max_pending=50)
+    for start in range(0, 100, 10):
+        fused = fusion.fuse({'timestamp': np.arange(start, start + 10, dtype=float),
+                             'x': np.zeros(10)})
+        assert fusion._held <= 50
+    fusion.add_positions([0.0, 0.2], [0.0, 2.0])
+    fused = fusion.fuse()
+    assert len(fused['x']) == 50
+    np.testing.assert_allclose(fused['position'][:2], [0.5, 0.51])
+    assert fusion.fuse() is None
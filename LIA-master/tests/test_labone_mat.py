@@ -0,0 +1,75 @@
+import io
+
+import numpy as np
+import pytest
+
+scipy_io = pytest.importorskip('scipy.io')
+
+import zhinst.utils as utils
+
+
+def sample(n, offset):
+    node = np.empty((1, 1), dtype=[('timestamp', 'O'), ('x', 'O'), ('y', 'O')])
+    node[0, 0] = (np.arange(n, dtype=np.uint64)[np.newaxis], offset + np.arange(n)[np.newaxis]*1.0,
+                  -np.arange(n)[np.newaxis]*1.0)
+    return node
+
+
+def device(points):
+    demods = np.empty((1, 2), dtype=[('sample', 'O')])
+    demods[0, 0] = (sample(10, 0.0),)
+    demods[0, 1] = (sample(points, 5.0),)
+    dev = np.empty((1, 1), dtype=[('demods', 'O'), ('clockbase', 'O')])
+    dev[0, 0] = (demods, np.array([[1.8e9]]))
+    return dev
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'compressed'])
+def matfile(request, tmp_path):
+    filename = str(tmp_path / 'session.mat')
+    scipy_io.savemat(filename, {'dev88': device(100000), 'dev99': device(20)},
+                     do_compression=request.param)
+    return filename
+
+
+def test_nodes_match_loadmat(matfile):
+    full = utils.load_labone_mat(matfile)
+    lazy = utils.LabOneMatFile(matfile)
+    assert lazy.keys() == ['dev88', 'dev99']
+    for path in ('/dev88/demods/0/sample', '/dev88/demods/1/sample', '/dev99/demods/1/sample'):
+        node = utils._labone_mat_node(full, path)
+        for field in ('timestamp', 'x', 'y'):
+            np.testing.assert_array_equal(lazy[path][field], np.ravel(node[field]))
+    assert lazy['/dev88/clockbase'] == [1.8e9]
+
+
+def test_only_the_node_is_loaded(matfile, monkeypatch):
+    # Every loadmat() call gets a MAT file holding only the node.
+    loaded = []
+    loadmat = scipy_io.loadmat
+
+    def spy(f, **kwargs):
+        loaded.append(len(f.getvalue()) if isinstance(f, io.BytesIO) else f)
+        return loadmat(f, **kwargs)
+
+    monkeypatch.setattr(scipy_io, 'loadmat', spy)
+    lazy = utils.LabOneMatFile(matfile)
+    x = lazy['/dev88/demods/0/sample']['x']
+    np.testing.assert_array_equal(x, np.arange(10.0))
+    # The 100000 samples of demodulator 1 (2.4 MB) were skipped.
+    assert len(loaded) == 1 and loaded[0] < 1000
+    assert lazy._loaded == {}
+
+
+def test_struct_array_element_loads_the_device(matfile):
+    lazy = utils.LabOneMatFile(matfile)
+    np.testing.assert_array_equal(lazy['/dev99/demods/1']['sample']['y'], -np.arange(20.0))
+    assert list(lazy._loaded) == ['dev99']
+
+
+def test_missing_nodes(matfile):
+    lazy = utils.LabOneMatFile(matfile)
+    assert '/dev88/demods/0/sample' in lazy
+    assert '/dev88/demods/0/scope' not in lazy
+    assert '/dev88/demods/2/sample' not in lazy
+    assert '/dev77/demods/0/sample' not in lazy
@@ -0,0 +1,106 @@
+"""PI_control plans and runs the measurements on its motion worker."""
+import threading
+
+import numpy as np
+import pytest
+from pipython import GCSDevice
+
+from Sub_Programs import WL_backend, WL_planner
+from Sub_Programs.WL_events import Event_Bus
+
+
+class Var(object):
+    # Stands for the Tk variables of the PI_control widgets.
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+@pytest.fixture
+def control(monkeypatch):
+    bus = Event_Bus()
+    monkeypatch.setattr(WL_backend, 'BUS', bus)
+    messages = []
+    monkeypatch.setattr(WL_backend.messagebox, 'showinfo',
+                        lambda **kwargs: messages.append(kwargs['message']))
+    control = WL_backend.PI_control.__new__(WL_backend.PI_control)
+    control.Records = []
+    control.Progress = Var(0)
+    control.Lockin = control.Demod = control.Ring = control.Average = None
+    control.Level_Source = 'baseline'
+    control.Worker = WL_backend.Motion_Worker()
+    control.Worker.start()
+    bus.subscribe('motion/plan', control.Set_Plan)
+    yield control, bus, messages
+    control.Worker.Close()
+    control.Worker.join(5)
+
+
+def wait_done(bus, timeout=10):
+    done = threading.Event()
+    bus.subscribe('motion/done', lambda name: done.set())
+    errors = []
+    bus.subscribe('motion/error', errors.append)
+    while not done.is_set():
+        bus.drain()
+        timeout -= 0.01
+        assert timeout > 0
+        done.wait(0.01)
+    bus.drain()
+    return errors
+
+
+def test_measurement_without_stage(control):
+    control, bus, messages = control
+    control.Do_Mesure(Var(20), Var(10), (Var(0.4), Var(1.0), Var(4)), Var(1),
+                      Var(0), Var(0), 0, '')
+    assert messages == ['There is no stage connected']
+    assert control.Worker.Commands.empty()
+
+
+def test_scan_planned_on_the_worker(control, monkeypatch):
+    control, bus, messages = control
+    threads = []
+    stage_limits = WL_planner.stage_limits
+    monkeypatch.setattr(WL_planner, 'stage_limits', lambda *args: (
+        threads.append(threading.current_thread().name), stage_limits(*args))[1])
+    dev = GCSDevice('C-891')
+    dev.ConnectUSB('0000000000')
+    axis = dev.axes[0]
+    dev.EAX(axis, True)
+    control.Prepare_Axis(dev, axis)
+    T = Var(0)
+    control.Do_Mesure(Var(11), Var(10), (Var(0.4), Var(1.0), Var(4)), Var(1),
+                      Var(0), T, dev, axis)
+    assert wait_done(bus) == []
+    assert threads == ['Motion_Worker']
+    # Sweep time of the plan, shown on the Tk thread
+    assert T.get() > 0
+
+
+@pytest.mark.parametrize('source', ['Baseline', 'Aux In 1'])
+def test_visibility_reported(control, source):
+    from Sub_Programs.WL_averaging import Pass_Average
+    control, bus, messages = control
+    reported = []
+    bus.subscribe('motion/message', reported.append)
+    control.Level_Source = WL_backend.DC_LEVEL_SOURCES[source]
+    grid = np.linspace(10.0, 11.0, 2001)
+    fringes = 0.5*np.exp(-((grid - 10.5)/0.05)**2)*np.cos(
+        2*np.pi*(grid - 10.5)/0.002)
+    # Chopped beam on X, or demodulated fringes with the DC output of the
+    # detector on Aux In 1
+    dc = 2.0 if source == 'Baseline' else 0.0
+    control.Average = Pass_Average(grid, WL_backend.AVERAGED_FIELDS)
+    control.Average.add(grid, {'x': dc + fringes, 'y': 0*grid,
+                               'auxin0': 2.0 + 0*grid, 'auxin1': 0*grid})
+    control.Analyze_Average(grid[1] - grid[0])
+    bus.drain()
+    assert control.Result['zpd'] == pytest.approx(10.5, abs=1e-3)
+    assert control.Result['visibility'] == pytest.approx(0.25, rel=1e-2)
+    assert 'Visibility 0.25' in reported[-1]
@@ -0,0 +1,128 @@
+"""NodeCache answers the static and tracked nodes from memory and does not
+cache a node set through it before its change is confirmed."""
+import numpy as np
+import pytest
+
+import zhinst.utils
+from zhinst.nodecache import NodeCache
+
+RATE = '/dev1/demods/0/rate'
+
+
+class Session(object):
+    # A session whose settings are applied by the device later, on apply().
+    def __init__(self, values):
+        self.values = dict(values)
+        self.pending = []
+        self.reads = []
+        self.subscribed = []
+
+    def subscribe(self, path):
+        self.subscribed.append(path)
+
+    def unsubscribe(self, path):
+        self.subscribed.remove(path)
+
+    def getAsEvent(self, path):
+        pass
+
+    def getDouble(self, path):
+        self.reads.append(path)
+        return self.values[path]
+
+    getInt = getDouble
+
+    def setDouble(self, path, value):
+        self.pending.append((path, value))
+
+    def set(self, path, value):
+        self.pending.append((path, value))
+
+    def apply(self):
+        # poll() data of the changes
+        data = {}
+        for path, value in self.pending:
+            self.values[path] = value
+            data[path] = {'timestamp': np.array([0]), 'value': np.array([value])}
+        self.pending = []
+        return data
+
+
+def event(value):
+    return {'timestamp': np.array([0]), 'value': np.array([value])}
+
+
+def test_static_and_tracked_nodes():
+    session = Session({'/dev1/clockbase': 60e6, RATE: 1000.0,
+                       '/dev1/sigins/0/range': 1.0})
+    nodes = NodeCache(session, RATE)
+    assert session.subscribed == [RATE]
+    assert nodes.getInt('/dev1/clockbase') == 60000000
+    assert nodes.getInt('/DEV1/clockbase/') == 60000000
+    # Untracked nodes are read every time
+    nodes.getDouble('/dev1/sigins/0/range')
+    nodes.getDouble('/dev1/sigins/0/range')
+    assert session.reads == ['/dev1/clockbase', '/dev1/sigins/0/range',
+                             '/dev1/sigins/0/range']
+    assert nodes.update({RATE: event(1674.0)}) == 1
+    assert nodes.getDouble(RATE) == 1674.0
+    assert session.reads.count(RATE) == 0
+    assert nodes.hits == 2
+
+
+def test_set_not_cached_before_confirmed():
+    session = Session({RATE: 1000.0})
+    nodes = NodeCache(session, RATE)
+    nodes.update({RATE: event(1000.0)})
+    nodes.setDouble(RATE, 2000.0)
+    # Not applied yet: the old value is read back but not cached
+    assert nodes.getDouble(RATE) == 1000.0
+    assert nodes.getDouble(RATE) == 1000.0
+    assert session.reads == [RATE, RATE]
+    # An event of the old value still in flight does not confirm the set
+    assert nodes.update({RATE: event(1000.0)}) == 0
+    assert nodes.getDouble(RATE) == 1000.0
+    assert len(session.reads) == 3
+    # The device rounds the rate
+    session.pending = [(RATE, 2009.0)]
+    nodes.update(session.apply())
+    assert nodes.getDouble(RATE) == 2009.0
+    assert len(session.reads) == 3
+    # Confirmed: later changes are followed as before
+    nodes.update({RATE: event(1000.0)})
+    assert nodes.getDouble(RATE) == 1000.0
+
+
+def test_set_wildcard_and_read_without_previous_value():
+    other = '/dev1/demods/1/rate'
+    session = Session({RATE: 1000.0, other: 1000.0})
+    nodes = NodeCache(session, '/dev1/demods/*/rate')
+    nodes.update({RATE: event(1000.0)})
+    nodes.set('/dev1/demods/*/rate', 500.0)
+    # Neither node is cached from a read before their change is seen
+    session.values[other] = 500.0
+    assert nodes.getDouble(other) == 500.0
+    assert nodes.getDouble(other) == 500.0
+    assert session.reads == [other, other]
+    # No value before the set for demods/1: any event confirms it
+    nodes.update({other: event(500.0), RATE: event(1000.0)})
+    assert nodes.getDouble(other) == 500.0
+    assert nodes.getDouble(RATE) == 1000.0
+    assert session.reads == [other, other, RATE]
+
+
+def test_simulated_lockin():
+    daq, device, _ = zhinst.utils.create_api_session('dev2318', 6)
+    path = '/%s/demods/0/rate' % device
+    nodes = NodeCache(daq, path)
+    before = nodes.refresh()
+    assert nodes.getDouble(path) == pytest.approx(daq.getDouble(path))
+    nodes.setDouble(path, 2 * daq.getDouble(path))
+    nodes.refresh()
+    assert nodes.getDouble(path) == pytest.approx(daq.getDouble(path))
+    hits = nodes.hits
+    nodes.getDouble(path)
+    assert nodes.hits == hits + 1
+    assert path in before
+    nodes.untrack()
+    assert not nodes.is_cached(path)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from zhinst.ringbuffer import DemodRingBuffer
+
+
+def block(start, stop):
+    return {'timestamp': np.arange(start, stop, dtype=np.uint64),
+            'x': np.arange(start, stop, dtype=float)}
+
+
+def test_wraparound_keeps_the_latest_samples_in_order():
+    ring = DemodRingBuffer(5)
+    ring.append(block(0, 3))
+    ring.append(block(3, 7))
+    assert len(ring) == 5
+    assert ring.total == 7
+    np.testing.assert_array_equal(ring.latest()['timestamp'], np.arange(2, 7))
+    np.testing.assert_array_equal(ring.latest(2)['x'], [5.0, 6.0])
+
+
+def test_block_larger_than_the_capacity():
+    ring = DemodRingBuffer(4)
+    ring.append(block(0, 10))
+    np.testing.assert_array_equal(ring.latest()['timestamp'], np.arange(6, 10))
+    assert ring.total == 10
+
+
+def test_since_until_does_not_skip_or_repeat():
+    ring = DemodRingBuffer(8)
+    seen = 0
+    read = []
+    ring.append(block(0, 2))
+    for start in range(2, 30, 2):
+        until = ring.total
+        # Appended by the poll thread between reading total and since().
+        ring.append(block(start, start + 2))
+        read.append(ring.since(seen, until)['timestamp'].copy())
+        seen = until
+    read.append(ring.since(seen)['timestamp'].copy())
+    np.testing.assert_array_equal(np.concatenate(read), np.arange(30))
+
+
+def test_since_until_excludes_later_samples():
+    ring = DemodRingBuffer(8)
+    ring.append(block(0, 4))
+    until = ring.total
+    ring.append(block(4, 6))
+    np.testing.assert_array_equal(ring.since(1, until)['timestamp'], [1, 2, 3])
+    np.testing.assert_array_equal(ring.since(until)['timestamp'], [4, 5])
+
+
+def test_since_overwritten_samples_are_not_returned():
+    ring = DemodRingBuffer(4)
+    ring.append(block(0, 10))
+    np.testing.assert_array_equal(ring.since(0, 8)['timestamp'], [6, 7])
+    assert len(ring.since(0, 5)) == 0
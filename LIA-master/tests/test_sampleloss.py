@@ -0,0 +1,32 @@
+import numpy as np
+
+import zhinst.utils as utils
+
+
+def test_sample_loss_within_and_between_chunks():
+    detector = utils.SampleLossDetector()
+    detector.update(np.array([0, 10, 20, 50], dtype=np.uint64))
+    index, dropped = detector.update(np.array([60, 90, 100], dtype=np.uint64))
+    np.testing.assert_array_equal(index, [4])
+    np.testing.assert_array_equal(dropped, [2])
+    index, dropped = detector.gaps()
+    np.testing.assert_array_equal(index, [2, 4])
+    np.testing.assert_array_equal(dropped, [2, 2])
+    assert detector.gap_count == 2
+    assert detector.dropped_samples == 4
+
+
+def test_sample_loss_unsigned_timestamps_going_back():
+    # A timestamp smaller than the previous one is not a gap (no wraparound
+    # of the unsigned difference).
+    detector = utils.SampleLossDetector()
+    index, dropped = detector.update(np.array([10, 5, 20, 25, 30, 45], dtype=np.uint32))
+    np.testing.assert_array_equal(index, [1, 4])
+    np.testing.assert_array_equal(dropped, [2, 2])
+
+
+def test_no_sample_loss():
+    detector = utils.SampleLossDetector(dtimestamp=10)
+    index, _ = detector.update(np.arange(0, 1000, 10))
+    assert len(index) == 0
+    assert detector.count == 100
@@ -0,0 +1,53 @@
+import threading
+
+import numpy as np
+import pytest
+from pipython import GCSDevice
+
+from Sub_Programs import WL_scan
+
+
+@pytest.fixture
+def stage():
+    dev = GCSDevice('C-891')
+    dev.ConnectUSB('0000000000')
+    axis = dev.axes[0]
+    dev.EAX(axis, True)
+    assert WL_scan.reference(dev, axis)
+    return dev, axis
+
+
+def test_recorded_move_has_a_time_reference(stage):
+    dev, axis = stage
+    dev.VEL(axis, 20.0)
+    rec = WL_scan.recorder_init(dev, axis, 1.0)
+    # The clock is read around the MOV: the trigger lies between the reads.
+    reads = iter([1000, 1400])
+    record = WL_scan.move(dev, axis, 14.0, rec, clock=lambda: next(reads))
+    assert record['timestamp'] == 1200
+    assert record['timestamp_error'] == 200
+    assert record['position'][-1] == pytest.approx(14.0, abs=1e-3)
+    assert np.all(np.diff(record['time']) > 0)
+
+
+def test_time_reference_brackets_the_move(stage):
+    import zhinst.utils
+    daq, device, _ = zhinst.utils.create_api_session('dev2318', 6)
+    dev, axis = stage
+    dev.VEL(axis, 20.0)
+    rec = WL_scan.recorder_init(dev, axis, 1.0)
+    start = WL_scan.device_time(daq, device)
+    record = WL_scan.move(dev, axis, 14.0, rec,
+                          clock=lambda: WL_scan.device_time(daq, device))
+    assert record['timestamp_error'] >= 0
+    assert start <= record['timestamp'] - record['timestamp_error']
+    assert record['timestamp'] + record['timestamp_error'] <= WL_scan.device_time(daq, device)
+
+
+def test_stop_request_halts_the_move(stage):
+    dev, axis = stage
+    dev.VEL(axis, 1.0)
+    stop = threading.Event()
+    threading.Timer(0.1, stop.set).start()
+    assert WL_scan.move(dev, axis, 20.0, stop_request=stop) is None
+    assert dev.qPOS(axis)[axis] < 19.0
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import zhinst.utils as utils
+
+
+def write_csv(path, chunk, timestamps):
+    # A LabOne demodulator sample file: x is the timestamp, y its negative.
+    lines = [';'.join(utils.LABONE_DEMOD_NAMES)]
+    for t in timestamps:
+        lines.append('%d;%d;%g;%g;1e5;0;3;0;0.5;0' % (chunk, t, t, -t))
+    path.write_text('\n'.join(lines) + '\n')
+
+
+@pytest.fixture
+def series(tmp_path):
+    # Three files, the second overlapping the first, written out of order.
+    write_csv(tmp_path / 'dev2004_demods_0_sample_00002.csv', 2, range(200, 300, 10))
+    write_csv(tmp_path / 'dev2004_demods_0_sample_00000.csv', 0, range(0, 120, 10))
+    write_csv(tmp_path / 'dev2004_demods_0_sample_00001.csv', 1, range(100, 200, 10))
+    return tmp_path
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_series_ordered_without_duplicates(series, processes):
+    sample = utils.load_labone_series(str(series), processes=processes)
+    assert sample.dtype.names == utils.LABONE_DEMOD_NAMES
+    np.testing.assert_array_equal(sample['timestamp'], np.arange(0, 300, 10))
+    np.testing.assert_array_equal(sample['x'], np.arange(0, 300, 10))
+    np.testing.assert_array_equal(sample['chunk'], [0]*12 + [1]*8 + [2]*10)
+    assert sample['dio'].dtype == np.dtype('u4')
+
+
+def test_series_columns(series):
+    sample = utils.load_labone_series(str(series / '*_sample_*.csv'), ('y', 'x'), processes=1)
+    # chunk and timestamp are only used to merge the files
+    assert sample.dtype.names == ('x', 'y')
+    np.testing.assert_array_equal(sample['y'], -np.arange(0, 300, 10))
+
+
+def test_series_of_other_nodes(series):
+    write_csv(series / 'dev2004_demods_1_sample_00000.csv', 0, range(0, 50, 10))
+    with pytest.raises(ValueError, match='2 series'):
+        utils.load_labone_series(str(series))
+    sample = utils.load_labone_series(str(series / 'dev2004_demods_1_sample_*.csv'))
+    np.testing.assert_array_equal(sample['timestamp'], np.arange(0, 50, 10))
+
+
+def test_series_without_files(tmp_path):
+    with pytest.raises(IOError):
+        utils.load_labone_series(str(tmp_path))
+    with pytest.raises(AssertionError):
+        utils.load_labone_series(str(tmp_path), ('x', 'r'))
+
+
+def test_series_of_mat_files(tmp_path):
+    scipy_io = pytest.importorskip('scipy.io')
+    for i, start in enumerate((0, 50)):
+        node = np.empty((1, 1), dtype=[('timestamp', 'O'), ('x', 'O')])
+        node[0, 0] = (np.arange(start, start + 60, 10, dtype=np.uint64)[np.newaxis],
+                      np.arange(start, start + 60, 10)[np.newaxis] * 1.0)
+        demods = np.empty((1, 1), dtype=[('sample', 'O')])
+        demods[0, 0] = (node,)
+        dev = np.empty((1, 1), dtype=[('demods', 'O')])
+        dev[0, 0] = (demods,)
+        scipy_io.savemat(str(tmp_path / ('session_%05d.mat' % i)), {'dev2004': dev})
+    sample = utils.load_labone_series(str(tmp_path), ('chunk', 'timestamp', 'x', 'y'),
+                                      processes=1)
+    # The chunk is the file's position; y is not saved in the files
+    np.testing.assert_array_equal(sample['timestamp'], np.arange(0, 110, 10))
+    np.testing.assert_array_equal(sample['chunk'], [0]*6 + [1]*5)
+    np.testing.assert_array_equal(sample['y'], 0.0)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from Sub_Programs.WL_averaging import Pass_Average
+from Sub_Programs.WL_spectrum import Streaming_Spectrum, spectrum
+
+STEP = 0.05  # OPD step in um
+
+
+def fringe_packet(opd, wavelength=0.6, width=3.0):
+    return 1.0 + np.exp(-(opd/width)**2)*np.cos(2*np.pi*opd/wavelength)
+
+
+@pytest.fixture
+def passes():
+    grid = np.linspace(-0.01, 0.01, 801)
+    clean = fringe_packet((grid - grid.mean())*2000.0)
+    rng = np.random.RandomState(2)
+    noisy = [clean + rng.normal(scale=0.5, size=len(grid)) for _ in range(40)]
+    return grid, clean, noisy
+
+
+def test_live_spectrum_is_the_spectrum_of_the_average(passes):
+    grid, clean, noisy = passes
+    average = Pass_Average(grid, ('x',))
+    live = Streaming_Spectrum(len(grid), STEP)
+    for i, x in enumerate(noisy):
+        # Backward passes are resampled on the grid by the average.
+        positions, values = (grid, x) if i % 2 == 0 else (grid[::-1], x[::-1])
+        live.add(average.add(positions, {'x': values})['x'])
+        expected = spectrum(average.mean['x'], STEP, band=(0.4, 1.0))
+        result = live.spectrum(band=(0.4, 1.0))
+        np.testing.assert_allclose(result['wavelength'], expected['wavelength'])
+        np.testing.assert_allclose(result['intensity'], expected['intensity'], atol=1e-9)
+    assert live.passes == len(noisy)
+
+
+def test_live_spectrum_converges_to_the_clean_spectrum(passes):
+    grid, clean, noisy = passes
+    target = spectrum(clean, STEP)['intensity']
+    live = Streaming_Spectrum(len(grid), STEP)
+    errors = []
+    for x in noisy:
+        live.add(x)
+        errors.append(np.linalg.norm(live.spectrum()['intensity'] - target))
+    assert errors[-1] < errors[0]/4
+    peak = live.spectrum()
+    assert peak['wavelength'][np.argmax(peak['intensity'])] == pytest.approx(0.6, rel=0.05)
+
+
+def test_overlapping_segments_cover_the_grid():
+    live = Streaming_Spectrum(1000, STEP, segment=256)
+    np.testing.assert_array_equal(live.starts, [0, 128, 256, 384, 512, 640, 744])
+    x = fringe_packet((np.arange(1000) - 500)*STEP)
+    live.add(x)
+    result = live.spectrum(band=(0.4, 1.0))
+    assert result['wavelength'][np.argmax(result['intensity'])] == pytest.approx(0.6, rel=0.05)
+    with pytest.raises(ValueError):
+        live.add(x[:-1])
@@ -0,0 +1,28 @@
+"""WL_startup checks that WhiteLight shows its window before the heavy
+modules are imported."""
+import WL_startup
+
+
+def test_cold_start_without_heavy_modules(capsys):
+    # A real cold start in a new interpreter; without a display only the
+    # import is measured.
+    assert WL_startup.main(['--runs', '1']) == 0
+    output = capsys.readouterr().out
+    assert 'import WhiteLight' in output
+    assert 'heavy modules before the window : none' in output
+
+
+def test_regressions_fail(monkeypatch, capsys):
+    results = [{'import': 0.1, 'window': 0.5, 'heavy': []},
+               {'import': 0.2, 'window': 0.7, 'heavy': []},
+               {'import': 0.3, 'window': 0.9, 'heavy': []}]
+    monkeypatch.setattr(WL_startup, 'run', lambda runs: results[:runs])
+    assert WL_startup.main(['--runs', '3', '--limit', '1.0']) == 0
+    assert 'window drawn      : 0.700 s' in capsys.readouterr().out
+    # The median startup exceeds the limit
+    assert WL_startup.main(['--runs', '3', '--limit', '0.6']) == 1
+    assert 'exceeds the limit' in capsys.readouterr().out
+    # A heavy module imported before the window
+    results[1]['heavy'] = ['numpy']
+    assert WL_startup.main(['--runs', '3']) == 1
+    assert 'heavy modules before the window : numpy' in capsys.readouterr().out
@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+import pytest
+
+import zhinst.utils as utils
+from zhinst.streaming import DemodStreamer
+
+
+@pytest.fixture
+def session():
+    daq, device, _ = utils.create_api_session('dev2318', 6)
+    daq.setInt('/%s/demods/0/enable' % device, 1)
+    daq.setDouble('/%s/demods/0/rate' % device, 10000)
+    return daq, '/%s/demods/0/sample' % device
+
+
+def wait_for(condition, timeout=5.0):
+    start = time.time()
+    while not condition():
+        assert time.time() - start < timeout
+        time.sleep(0.01)
+
+
+def test_full_queue_drops_the_oldest_block(session):
+    daq, path = session
+    polled = []
+    streamer = DemodStreamer(daq, path, poll_length=0.01, maxsize=1,
+                             callback=lambda path, sample: polled.append(sample))
+    with streamer:
+        wait_for(lambda: streamer.dropped_blocks >= 3)
+    blocks = streamer.get_all()
+    assert len(blocks) == 1
+    # The queued block is the last one polled.
+    np.testing.assert_array_equal(blocks[0][1]['timestamp'], polled[-1]['timestamp'])
+    assert streamer.dropped_blocks == streamer.polled_blocks - 1
+
+
+def test_callback_only_mode(session):
+    daq, path = session
+    polled = []
+    streamer = DemodStreamer(daq, path, poll_length=0.01, maxsize=None,
+                             callback=lambda path, sample: polled.append(len(sample['timestamp'])))
+    with streamer:
+        wait_for(lambda: len(polled) >= 3)
+    assert streamer.queue is None
+    assert sum(polled) == streamer.polled_samples
+    with pytest.raises(RuntimeError):
+        streamer.get(timeout=0.1)
+    with pytest.raises(ValueError):
+        DemodStreamer(daq, path, maxsize=None)
+
+
+def test_stop_joins_the_thread_and_unsubscribes(session):
+    daq, path = session
+    streamer = DemodStreamer(daq, path, poll_length=0.01)
+    streamer.start()
+    assert streamer.is_running()
+    with pytest.raises(RuntimeError):
+        streamer.start()
+    wait_for(lambda: streamer.polled_blocks)
+    thread = streamer._thread
+    streamer.stop()
+    assert not thread.is_alive()
+    assert not streamer.is_running()
+    assert path not in daq._subscribed
+    # The blocks queued before the stop are kept.
+    assert streamer.get_all()
+
+
+def test_get_raises_the_poll_thread_exception(session):
+    daq, path = session
+
+    def poll(*args):
+        time.sleep(0.05)
+        raise IOError('connection lost')
+
+    daq.poll = poll
+    streamer = DemodStreamer(daq, path)
+    streamer.start()
+    start = time.time()
+    with pytest.raises(IOError):
+        streamer.get()
+    assert time.time() - start < 2.0
+    assert isinstance(streamer.error, IOError)
+    streamer.stop()
+
+
+def test_session_calls_are_serialized(session):
+    daq, path = session
+    calls = []
+    active = []
+    poll, get_int = daq.poll, daq.getInt
+
+    def call(func, *args):
+        # Fails if another thread is inside the session at the same time.
+        active.append(func)
+        calls.append(len(active))
+        try:
+            time.sleep(0.001)
+            return func(*args)
+        finally:
+            active.remove(func)
+
+    daq.poll = lambda *args: call(poll, *args)
+    daq.getInt = lambda *args: call(get_int, *args)
+    streamer = DemodStreamer(daq, path, poll_length=0.001)
+    node = '/%s/status/time' % path.split('/')[1]
+    with streamer:
+        for _ in range(200):
+            streamer.session.getInt(node)
+        wait_for(lambda: streamer.polled_blocks)
+    assert max(calls) == 1
+    assert calls.count(1) > 200
@@ -0,0 +1,118 @@
+"""Dev_Config_Init only sends the settings that differ from the device."""
+import pytest
+
+import zhinst.utils as utils
+from Sub_Programs import WL_backend
+
+
+class Var(object):
+    # Stands for the Tk variables of the Zi_settings widgets.
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Widget(object):
+    # Stands for the Tk widgets, remembers the order they are laid out in.
+    layout = []
+
+    def __init__(self, parent=None, **options):
+        self.options = options
+
+    def grid(self, **options):
+        Widget.layout.append(self)
+
+
+@pytest.fixture
+def zi(monkeypatch):
+    monkeypatch.setattr(WL_backend.messagebox, 'showinfo', lambda **kwargs: None)
+    monkeypatch.setattr(WL_backend.tk, 'StringVar', Var)
+    daq, device, props = utils.create_api_session('dev2318', 6)
+    sent = []
+    set_nodes, sync = daq.set, daq.sync
+    monkeypatch.setattr(daq, 'set', lambda settings: (sent.append(settings), set_nodes(settings)))
+    monkeypatch.setattr(daq, 'sync', lambda: (sent.append('sync'), sync()))
+    settings = WL_backend.Zi_settings.__new__(WL_backend.Zi_settings)
+    settings.Zi_Setting_List = {}
+    settings.Set_Device(daq, device, props)
+    data = dict(settings.Zi_Setting_List, Demodulator=Var(0), Input=Var(0), Output=Var(0),
+                Oscillator=Var(0), AC=Var('Enabled'), Input_Scale=Var(1.0), Phase=Var(0.0),
+                Output_Rate=Var(13393.0), LowPassOrder=Var(4), LowPassDBValue=Var(100.0),
+                Harmonics=Var(1), **{'50 Ohm': Var('Disabled'), 'Osc. Freq': Var(1000)})
+    return settings, data, sent, device
+
+
+def test_first_configuration_resets_and_sends_everything(zi):
+    settings, data, sent, device = zi
+    settings.Dev_Config_Init(data)
+    assert sent[-1] == 'sync'
+    assert len(sent[0]) == 4 + len(settings.Config_Settings(data, 0))
+
+
+def test_unchanged_configuration_sends_nothing(zi):
+    settings, data, sent, device = zi
+    settings.Dev_Config_Init(data)
+    del sent[:]
+    settings.Dev_Config_Init(data)
+    assert sent == []
+
+
+def test_only_the_changed_setting_is_sent(zi):
+    settings, data, sent, device = zi
+    settings.Dev_Config_Init(data)
+    del sent[:]
+    data['Output_Rate'] = Var(2000.0)
+    settings.Dev_Config_Init(data)
+    # Synchronized before the accepted value is read back
+    assert sent == [[['/%s/demods/0/rate' % device, 2000.0]], 'sync']
+
+
+def test_other_channel_resets_again(zi):
+    settings, data, sent, device = zi
+    settings.Dev_Config_Init(data)
+    del sent[:]
+    data['Demodulator'] = Var(1)
+    settings.Dev_Config_Init(data)
+    assert sent[-1] == 'sync'
+
+
+def test_filter_without_order_is_not_sent(zi):
+    settings, data, sent, device = zi
+    data['LowPassOrder'] = Var(0)
+    settings.Dev_Config_Init(data)
+    assert sent == []
+
+
+def test_filter_entries_set_the_filter(monkeypatch):
+    # Enter the filter order and bandwidth in the widgets next to their
+    # labels, the configuration must use them.
+    for name, default in (('IntVar', 0), ('DoubleVar', 0.0), ('StringVar', '')):
+        monkeypatch.setattr(WL_backend.tk, name, lambda value=default: Var(value))
+    for name in ('Label', 'Spinbox', 'Entry'):
+        monkeypatch.setattr(WL_backend.tk, name, Widget)
+    for name in ('Checkbutton', 'Button'):
+        monkeypatch.setattr(WL_backend.ttk, name, Widget)
+    monkeypatch.setattr(WL_backend.ttk.Labelframe, '__init__', lambda self, parent: None)
+    monkeypatch.setattr(WL_backend.ttk.Labelframe, 'configure', lambda self, **options: None)
+    monkeypatch.setattr(Widget, 'layout', [])
+    daq, device, props = utils.create_api_session('dev2318', 6)
+    settings = WL_backend.Zi_settings(None, None, daq, device, props)
+
+    def enter(label, value):
+        i = [w.options.get('text') for w in Widget.layout].index(label)
+        Widget.layout[i + 1].options['textvariable'].set(value)
+
+    enter('Low-Pass Filer Order: ', 4)
+    enter('BW 3 dB: ', 100.0)
+    enter('Selected Harmonic: ', 2)
+    data = settings.Zi_Setting_List
+    data['Device_id'] = Var(device)
+    nodes = dict(settings.Config_Settings(data, 0))
+    assert nodes['/%s/demods/0/order' % device] == 4
+    assert nodes['/%s/demods/0/timeconstant' % device] == pytest.approx(utils.bw2tc(100.0, 4))
+    assert nodes['/%s/demods/0/harmonic' % device] == 2
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import zhinst.utils as utils
+
+
+def write_zibin(path, n=5):
+    # ziControl saves every sample as 7 big-endian float64 values.
+    rows = np.arange(n * len(utils.ZICONTROL_NAMES), dtype='>f8').reshape(n, -1)
+    rows[:, utils.ZICONTROL_NAMES.index('dio')] = 0xFF00 + np.arange(n)
+    rows.tofile(str(path))
+    return rows
+
+
+def test_zibin_fields(tmp_path):
+    rows = write_zibin(tmp_path / 'Freq1.ziBin')
+    sample = utils.load_zicontrol_zibin(str(tmp_path / 'Freq1.ziBin'))
+    assert isinstance(sample, np.memmap)
+    assert sample.dtype.names == utils.ZICONTROL_NAMES
+    for col, name in enumerate(utils.ZICONTROL_NAMES):
+        np.testing.assert_array_equal(sample[name], rows[:, col])
+
+
+def test_zibin_dio_is_float(tmp_path):
+    # The file's float64 type is kept (ziControl's CSV loader gives u4).
+    write_zibin(tmp_path / 'Freq1.ziBin')
+    sample = utils.load_zicontrol_zibin(str(tmp_path / 'Freq1.ziBin'))
+    assert sample.dtype['dio'] == np.dtype('>f8')
+    dio = sample['dio'].astype('u4')
+    np.testing.assert_array_equal(dio, 0xFF00 + np.arange(5))
+
+
+def test_zibin_columns_are_views(tmp_path):
+    rows = write_zibin(tmp_path / 'Freq1.ziBin')
+    sample = utils.load_zicontrol_zibin(str(tmp_path / 'Freq1.ziBin'), ('y', 't'))
+    # In the order of the file, not of column_names
+    assert sample.dtype.names == ('t', 'y')
+    assert sample.dtype.itemsize == rows.shape[1] * 8
+    np.testing.assert_array_equal(sample['y'], rows[:, 2])
+
+
+def test_zibin_modes(tmp_path):
+    filename = str(tmp_path / 'Freq1.ziBin')
+    rows = write_zibin(filename)
+    with pytest.raises(ValueError):
+        utils.load_zicontrol_zibin(filename)['x'][0] = -1
+    sample = utils.load_zicontrol_zibin(filename, mode='c')
+    sample['x'][0] = -1
+    # Copy-on-write: the file is unchanged
+    assert utils.load_zicontrol_zibin(filename)['x'][0] == rows[0, 1]
+
+
+def test_zibin_empty_and_truncated(tmp_path):
+    empty = tmp_path / 'empty.ziBin'
+    empty.write_bytes(b'')
+    sample = utils.load_zicontrol_zibin(str(empty), ('t', 'x'))
+    assert len(sample) == 0 and sample.dtype.names == ('t', 'x')
+    truncated = tmp_path / 'truncated.ziBin'
+    truncated.write_bytes(b'\0' * (7 * 8 * 2 + 8))
+    with pytest.raises(AssertionError):
+        utils.load_zicontrol_zibin(str(truncated))
+    with pytest.raises(AssertionError):
+        utils.load_zicontrol_zibin(str(empty), ('t', 'phase'))
@@ -5,4 +5,5 @@ Contains the API driver, utility functions and examples for Zurich Instruments
 devices.
 """
 
-__all__ = ['ziPython', 'utils']
+__all__ = ['ziPython', 'utils', 'streaming', 'ringbuffer', 'aio', 'simulation',
+           'nodecache']
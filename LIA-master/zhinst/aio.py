@@ -0,0 +1,287 @@
+"""
+Zurich Instruments LabOne Python API asyncio Interface.
+
+This module wraps a ziDAQServer API session and its modules
+(dataAcquisitionModule, scopeModule, sweep, awgModule, deviceSettings) with
+awaitable methods so that many instruments and modules can be driven
+concurrently from a single asyncio event loop.
+
+Blocking calls into the API session (set, get, poll, sync, ...) are executed
+in one worker thread per session; this serializes the calls on a session
+whilst keeping the event loop responsive. Waiting for a module to finish does
+not occupy a thread while waiting: the module's finished() flag is checked in
+the executor between short asyncio.sleep() calls on the event loop, instead
+of the ``while not finished(): time.sleep(0.05)`` loop used in the examples.
+
+Requires Python 3.7 or later.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import os
+import time
+
+
+class AsyncDAQServer(object):
+    """
+    An asyncio wrapper of a ziDAQServer API session.
+
+    Arguments:
+
+      daq (ziDAQServer): An instance of the ziPython.ziDAQServer class
+        (representing an API session connected to a Data Server).
+
+      executor (concurrent.futures.Executor, optional): The executor used to
+        run blocking API calls. Default is a dedicated single-thread executor,
+        which serializes all calls on this session.
+
+    Example:
+
+      import asyncio
+      import zhinst.utils
+      import zhinst.aio
+      (daq, device, _) = zhinst.utils.create_api_session('dev2318', 6)
+      adaq = zhinst.aio.AsyncDAQServer(daq)
+
+      async def measure():
+          await adaq.set([['/%s/demods/0/enable' % device, 1]])
+          await adaq.sync()
+          await adaq.subscribe('/%s/demods/0/sample' % device)
+          return await adaq.poll(0.1, 500)
+
+      data = asyncio.run(measure())
+    """
+
+    def __init__(self, daq, executor=None):
+        self.daq = daq
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.executor = executor
+
+    def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
+
+    def close(self):
+        """Shut down the executor used to run the blocking API calls."""
+        self.executor.shutdown(wait=True)
+
+    async def set(self, *args):
+        """Awaitable ziDAQServer set(); the arguments are passed unchanged."""
+        return await self._call(self.daq.set, *args)
+
+    async def get(self, *args, **kwargs):
+        """Awaitable ziDAQServer get(); the arguments are passed unchanged."""
+        return await self._call(self.daq.get, *args, **kwargs)
+
+    async def setInt(self, path, value):
+        return await self._call(self.daq.setInt, path, value)
+
+    async def setDouble(self, path, value):
+        return await self._call(self.daq.setDouble, path, value)
+
+    async def setString(self, path, value):
+        return await self._call(self.daq.setString, path, value)
+
+    async def getInt(self, path):
+        return await self._call(self.daq.getInt, path)
+
+    async def getDouble(self, path):
+        return await self._call(self.daq.getDouble, path)
+
+    async def getString(self, path):
+        return await self._call(self.daq.getString, path)
+
+    async def sync(self):
+        """Awaitable ziDAQServer sync()."""
+        return await self._call(self.daq.sync)
+
+    async def subscribe(self, path):
+        return await self._call(self.daq.subscribe, path)
+
+    async def unsubscribe(self, path):
+        return await self._call(self.daq.unsubscribe, path)
+
+    async def poll(self, recording_time, timeout, flags=0, flat=True):
+        """
+        Awaitable ziDAQServer poll().
+
+        Arguments:
+
+          recording_time (float): The recording time in seconds.
+
+          timeout (int): The poll timeout in milliseconds.
+
+          flags (int, optional): The poll flags.
+
+          flat (bool, optional): Whether to return a flat dictionary keyed by
+            node path.
+
+        Returns:
+
+          data (dict): The data returned by poll().
+        """
+        return await self._call(self.daq.poll, recording_time, timeout, flags, flat)
+
+    def dataAcquisitionModule(self):
+        """Return an AsyncModule wrapping a new dataAcquisitionModule."""
+        return AsyncModule(self.daq.dataAcquisitionModule(), self.executor)
+
+    def scopeModule(self):
+        """Return an AsyncModule wrapping a new scopeModule."""
+        return AsyncModule(self.daq.scopeModule(), self.executor)
+
+    def sweep(self):
+        """Return an AsyncModule wrapping a new sweep module."""
+        return AsyncModule(self.daq.sweep(), self.executor)
+
+    def awgModule(self):
+        """Return an AsyncModule wrapping a new awgModule."""
+        return AsyncModule(self.daq.awgModule(), self.executor)
+
+    def deviceSettings(self):
+        """Return an AsyncModule wrapping a new deviceSettings module."""
+        return AsyncModule(self.daq.deviceSettings(), self.executor)
+
+
+class AsyncModule(object):
+    """
+    An asyncio wrapper of a LabOne module (e.g., dataAcquisitionModule,
+    scopeModule, sweep, awgModule or deviceSettings).
+
+    The module's own methods set(), get(), subscribe(), execute() and so on
+    return quickly and are called directly. read(), progress() and the
+    finished() checks of wait_finished() are blocking API calls and run in
+    the session's executor; the waiting between two checks is done on the
+    event loop.
+
+    Arguments:
+
+      module: The module instance as returned by, e.g., ziDAQServer's
+        dataAcquisitionModule().
+
+      executor (concurrent.futures.Executor, optional): The executor used to
+        run the blocking module calls. Default is the event loop's default
+        executor.
+    """
+
+    def __init__(self, module, executor=None):
+        self.module = module
+        self.executor = executor
+
+    def __getattr__(self, name):
+        # Forward any other module method (set, get, subscribe, execute, ...).
+        return getattr(self.module, name)
+
+    def _call(self, method, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, functools.partial(method, *args))
+
+    async def progress(self):
+        """Return the module's progress as a float between 0 and 1."""
+        return float((await self._call(self.module.progress))[0])
+
+    async def finished(self):
+        """Awaitable module finished()."""
+        return await self._call(self.module.finished)
+
+    async def read(self, flat=True):
+        """Awaitable module read()."""
+        return await self._call(self.module.read, flat)
+
+    async def wait_finished(self, timeout=None, interval=0.005, callback=None):
+        """
+        Wait until the module has finished without blocking the event loop.
+
+        Arguments:
+
+          timeout (float, optional): The maximum time to wait in seconds. Wait
+            indefinitely if None.
+
+          interval (float, optional): The time in seconds between two checks
+            of the module's finished() flag.
+
+          callback (callable, optional): If specified, called with the module's
+            progress (float between 0 and 1) at every check.
+
+        Raises:
+
+          RuntimeError: If the module has not finished within `timeout`.
+        """
+        t0 = time.time()
+        while not await self.finished():
+            if callback is not None:
+                callback(await self.progress())
+            if timeout is not None and time.time() - t0 > timeout:
+                raise RuntimeError("The module failed to finish after %.f seconds." % timeout)
+            await asyncio.sleep(interval)
+
+
+async def _device_settings(adaq, device, filename, command, timeout):
+    path, filename = os.path.split(filename)
+    filename_noext = os.path.splitext(filename)[0]
+    device_settings = adaq.deviceSettings()
+    device_settings.set('deviceSettings/device', device)
+    device_settings.set('deviceSettings/filename', filename_noext)
+    if path:
+        device_settings.set('deviceSettings/path', path)
+    else:
+        device_settings.set('deviceSettings/path', '.' + os.sep)
+    device_settings.set('deviceSettings/command', command)
+    try:
+        device_settings.execute()
+        try:
+            await device_settings.wait_finished(timeout)
+        except RuntimeError:
+            raise RuntimeError("Unable to %s device settings after %.f seconds." % (command, timeout))
+    finally:
+        device_settings.clear()
+
+
+async def load_settings(adaq, device, filename, timeout=60):
+    """
+    Awaitable version of `zhinst.utils.load_settings`: Load a LabOne settings
+    file to the specified device.
+
+    Arguments:
+
+      adaq (AsyncDAQServer): An asyncio API session.
+
+      device (str): The device ID specifying where to load the settings,
+      e.g., 'dev123'.
+
+      filename (str): The filename of the xml settings file to load. The
+      filename can include a relative or full path.
+
+      timeout (float, optional): The maximum time to wait in seconds.
+
+    Raises:
+
+      RuntimeError: If loading the settings times out.
+    """
+    await _device_settings(adaq, device, filename, 'load', timeout)
+
+
+async def save_settings(adaq, device, filename, timeout=60):
+    """
+    Awaitable version of `zhinst.utils.save_settings`: Save settings from the
+    specified device to a LabOne settings file.
+
+    Arguments:
+
+      adaq (AsyncDAQServer): An asyncio API session.
+
+      device (str): The device ID specifying where to load the settings,
+      e.g., 'dev123'.
+
+      filename (str): The filename of the LabOne xml settings file. The filename
+      can include a relative or full path.
+
+      timeout (float, optional): The maximum time to wait in seconds.
+
+    Raises:
+
+      RuntimeError: If saving the settings times out.
+    """
+    await _device_settings(adaq, device, filename, 'save', timeout)
@@ -0,0 +1,286 @@
+"""
+Zurich Instruments LabOne Python API Node Value Cache.
+
+Every getInt(), getDouble() or getString() call on a ziDAQServer is a round
+trip to the Data Server, which is slow when the Data Server runs on another
+host. Code that reads the same nodes again and again (the clockbase, the
+demodulator rate, the input range, ...) can read them through a NodeCache
+instead. It answers from memory for:
+
+- the static nodes (see STATIC_NODES), which do not change during a session;
+
+- the tracked nodes (see track()). The cache subscribes to these nodes and
+  calls getAsEvent() on them, so that the Data Server pushes their current
+  value and then every change into the poll() data of the session. The cache
+  is kept up to date by passing the poll() data to update(); a DemodStreamer
+  does it for its poll thread when given the cache as `node_cache`, refresh()
+  does it when nothing else polls the session.
+
+Other nodes are read from the Data Server on every call, as without the
+cache. Setting a node through the cache discards its cached value, so the
+value as accepted by the device (e.g. a rounded demodulator rate) is read
+back instead of the requested one. As set() does not wait for the device,
+the node is then read from the Data Server, without caching, until the
+poll() data confirms the change: an event with a value other than the one
+cached before the set (any event if there was none). sync() would also
+wait for the device, but it discards the data buffered for the session,
+e.g. the samples of a DemodStreamer polling the same session.
+"""
+
+from __future__ import print_function
+import fnmatch
+import re
+import threading
+
+# Nodes that keep their value during an API session, cached on first read.
+STATIC_NODES = ('/*/clockbase', '/*/features/devtype', '/*/features/serial',
+                '/*/features/options', '/zi/about/*')
+
+# Marks a node whose change was seen in the poll() data after a set().
+_CONFIRMED = object()
+
+
+def _normalize(path):
+    return '/' + path.strip().strip('/').lower()
+
+
+def _match(node, pattern):
+    """Return True if `node` matches `pattern`, which may contain wildcards or
+    specify a branch of the node tree."""
+    if re.search(r'[*?]', pattern):
+        return fnmatch.fnmatchcase(node, pattern)
+    return node == pattern or node.startswith(pattern + '/')
+
+
+def _last_value(entry):
+    """Return the last value of a poll() entry of a setting node, None for
+    other nodes (e.g. demodulator samples)."""
+    if isinstance(entry, (list, tuple)):
+        # Older API levels return a list of events per node.
+        entry = entry[-1] if entry else None
+    if not isinstance(entry, dict):
+        return None
+    values = entry.get('value', entry.get('vector'))
+    if values is None:
+        return None
+    if isinstance(values, (str, bytes)):
+        value = values
+    else:
+        if not len(values):
+            return None
+        value = values[-1]
+    if isinstance(value, bytes):
+        value = value.decode()
+    return value
+
+
+class NodeCache(object):
+    """
+    A ziDAQServer API session whose node reads are answered from a cache, see
+    the module docstring.
+
+    The cache provides getInt(), getDouble(), getString(), set(), setInt(),
+    setDouble() and setString(); any other method (poll, subscribe, sync,
+    dataAcquisitionModule, ...) is forwarded unchanged to the session, so the
+    cache can be passed wherever the session is expected.
+
+    Arguments:
+
+      daq (ziDAQServer): An instance of the ziPython.ziDAQServer class
+        (representing an API session connected to a Data Server).
+
+      paths (str or list of str, optional): Node paths (wildcards allowed) to
+        track, see track().
+
+      static (list of str, optional): Patterns of the nodes cached on first
+        read without a subscription.
+
+    Example:
+
+      import zhinst.utils
+      import zhinst.nodecache
+      import zhinst.streaming
+      (daq, device, _) = zhinst.utils.create_api_session('dev2318', 6)
+      # The streamer's poll thread and this thread share the session.
+      session = zhinst.streaming.LockedSession(daq)
+      nodes = zhinst.nodecache.NodeCache(session, ['/%s/demods/*/rate' % device,
+                                                   '/%s/sigins/*/range' % device])
+      streamer = zhinst.streaming.DemodStreamer(session, '/%s/demods/0/sample' % device,
+                                                node_cache=nodes)
+      with streamer:
+          clockbase = nodes.getInt('/%s/clockbase' % device)  # one round trip
+          rate = nodes.getDouble('/%s/demods/0/rate' % device)  # follows changes
+    """
+
+    def __init__(self, daq, paths=None, static=STATIC_NODES):
+        self.daq = daq
+        self.static = [_normalize(pattern) for pattern in static]
+        self.tracked = []
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+        # Paths set through the cache: {path: {node: value before the set, or
+        # _CONFIRMED}} for the nodes cached at that time.
+        self._unconfirmed = {}
+        self._lock = threading.Lock()
+        if paths is not None:
+            self.track(paths)
+
+    def __getattr__(self, name):
+        # Forward any other session method (poll, sync, subscribe, ...).
+        return getattr(self.daq, name)
+
+    def track(self, paths):
+        """
+        Subscribe to the node(s) `paths` and request their current value with
+        getAsEvent(). From then on, their values are read from the cache.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        for path in paths:
+            path = _normalize(path)
+            self.daq.subscribe(path)
+            self.daq.getAsEvent(path)
+            with self._lock:
+                if path not in self.tracked:
+                    self.tracked.append(path)
+
+    def untrack(self, paths=None):
+        """Unsubscribe from the tracked node(s) `paths`, default all, and
+        forget their values."""
+        if paths is None:
+            paths = list(self.tracked)
+        elif isinstance(paths, str):
+            paths = [paths]
+        for path in paths:
+            path = _normalize(path)
+            self.daq.unsubscribe(path)
+            with self._lock:
+                if path in self.tracked:
+                    self.tracked.remove(path)
+                for node in list(self._values):
+                    if _match(node, path) and not self._is_static(node):
+                        del self._values[node]
+
+    def _is_static(self, node):
+        return any(_match(node, pattern) for pattern in self.static)
+
+    def _is_unconfirmed(self, node):
+        return any(_match(node, pattern) and before.get(node) is not _CONFIRMED
+                   for pattern, before in self._unconfirmed.items())
+
+    def _confirm(self, node, value):
+        # Return True if `value` may be the value of `node` after its sets.
+        patterns = [before for pattern, before in self._unconfirmed.items()
+                    if _match(node, pattern)]
+        if any(node in before and before[node] is not _CONFIRMED and before[node] == value
+               for before in patterns):
+            # The value before the set, possibly still in flight.
+            return False
+        for before in patterns:
+            before[node] = _CONFIRMED
+        return True
+
+    def is_cached(self, path):
+        """Return True if the value of `path` is kept by the cache."""
+        node = _normalize(path)
+        return self._is_static(node) or any(_match(node, pattern) for pattern in self.tracked)
+
+    def update(self, data):
+        """
+        Update the cache with the data returned by poll() in flat mode (a
+        dictionary keyed by node path). The entries of nodes that are not
+        setting nodes, e.g. demodulator samples, are ignored. Returns the
+        number of nodes updated.
+        """
+        count = 0
+        for path, entry in data.items():
+            value = _last_value(entry)
+            if value is None:
+                continue
+            node = _normalize(path)
+            if self.is_cached(node):
+                with self._lock:
+                    if not self._confirm(node, value):
+                        continue
+                    self._values[node] = value
+                count += 1
+        return count
+
+    def refresh(self, recording_time=0.0, timeout=0, flags=0):
+        """
+        Poll the session and update the cache; return the poll() data (flat).
+
+        Only use it if nothing else polls the session: the data of the
+        subscribed nodes (e.g. demodulator samples) is returned here and
+        missing in the other poll() calls.
+        """
+        data = self.daq.poll(recording_time, timeout, flags, True)
+        self.update(data)
+        return data
+
+    def invalidate(self, path=None):
+        """Forget the cached value of `path` (wildcards allowed), default of
+        all nodes; the next read goes to the Data Server."""
+        with self._lock:
+            if path is None:
+                self._values.clear()
+                return
+            pattern = _normalize(path)
+            for node in list(self._values):
+                if _match(node, pattern):
+                    del self._values[node]
+
+    def _get(self, path, read):
+        node = _normalize(path)
+        with self._lock:
+            if node in self._values:
+                self.hits += 1
+                return self._values[node]
+        value = read(node)
+        self.misses += 1
+        if self.is_cached(node):
+            with self._lock:
+                # Not before the set is confirmed, the device may not have
+                # applied it yet.
+                if not self._is_unconfirmed(node):
+                    self._values.setdefault(node, value)
+        return value
+
+    def _changed(self, path):
+        # Forget the value of a node set through the cache until the poll()
+        # data confirms its change.
+        pattern = _normalize(path)
+        with self._lock:
+            self._unconfirmed[pattern] = {node: value for node, value in self._values.items()
+                                          if _match(node, pattern)}
+            for node in self._unconfirmed[pattern]:
+                del self._values[node]
+
+    def getInt(self, path):
+        return int(self._get(path, self.daq.getInt))
+
+    def getDouble(self, path):
+        return float(self._get(path, self.daq.getDouble))
+
+    def getString(self, path):
+        return str(self._get(path, self.daq.getString))
+
+    def set(self, *args):
+        """ziDAQServer set(): set(path, value) or set([[path, value], ...])."""
+        settings = [args] if len(args) == 2 else args[0]
+        self.daq.set(*args)
+        for path, _ in settings:
+            self._changed(path)
+
+    def setInt(self, path, value):
+        self.daq.setInt(path, value)
+        self._changed(path)
+
+    def setDouble(self, path, value):
+        self.daq.setDouble(path, value)
+        self._changed(path)
+
+    def setString(self, path, value):
+        self.daq.setString(path, value)
+        self._changed(path)
@@ -0,0 +1,166 @@
+"""
+Zurich Instruments LabOne Python API Ring Buffer.
+
+This module provides a fixed-capacity ring buffer for demodulator samples
+using the structured `zhinst.utils.LABONE_DEMOD_DTYPE` layout. Memory is
+allocated once; the sample dictionaries returned by poll() are copied into
+the preallocated columns and readers obtain views of the most recent samples
+without any further copies.
+"""
+
+from __future__ import print_function
+import threading
+import numpy as np
+import zhinst.utils
+
+
+class DemodRingBuffer(object):
+    """
+    A fixed-capacity ring buffer of demodulator samples.
+
+    The samples are stored twice, at index ``i`` and ``i + capacity`` of an
+    array of length ``2*capacity``. This way the most recent `n` samples
+    (``n <= capacity``) are always contiguous in memory and can be returned as
+    a numpy view instead of a copy, at the cost of twice the memory and
+    writing every sample twice.
+
+    Arguments:
+
+      capacity (int): The maximum number of samples held by the buffer.
+
+      dtype (numpy dtype, optional): The structured dtype of a sample. Default
+        is `zhinst.utils.LABONE_DEMOD_DTYPE`.
+
+    Example:
+
+      import zhinst.ringbuffer
+      import zhinst.streaming
+      ring = zhinst.ringbuffer.DemodRingBuffer(10**7)
+      streamer = zhinst.streaming.DemodStreamer(daq, '/dev2318/demods/0/sample',
+                                                callback=lambda path, sample: ring.append(sample))
+      ...
+      recent = ring.latest(100000)
+      r = np.abs(recent['x'] + 1j*recent['y'])
+    """
+
+    def __init__(self, capacity, dtype=None):
+        if capacity < 1:
+            raise ValueError("The capacity ({}) must be a positive integer.".format(capacity))
+        if dtype is None:
+            dtype = zhinst.utils.LABONE_DEMOD_DTYPE
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self.total = 0
+        self._data = np.zeros(2*self.capacity, dtype=self.dtype)
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        """Discard all samples held by the buffer (no memory is released)."""
+        with self._lock:
+            self._head = 0
+            self._size = 0
+            self.total = 0
+
+    def append(self, sample):
+        """
+        Copy a block of samples into the buffer, overwriting the oldest samples
+        once the buffer is full.
+
+        Arguments:
+
+          sample (dict of numpy arrays or numpy structured array): A block of
+            demodulator samples as returned by ziDAQServer's poll() for a
+            demodulator sample node. Fields that are not present in the block
+            (e.g., 'chunk') are set to zero.
+
+        Returns:
+
+          n (int): The number of samples in the block.
+        """
+        names = sample.dtype.names if isinstance(sample, np.ndarray) else sample.keys()
+        fields = [name for name in self.dtype.names if name in names]
+        n = len(sample['timestamp'])
+        if n == 0:
+            return 0
+        # Only the last `capacity` samples of a large block can be held.
+        offset = max(n - self.capacity, 0)
+        count = n - offset
+        with self._lock:
+            start = self._head
+            first = min(count, self.capacity - start)
+            rest = count - first
+            for name in self.dtype.names:
+                column = self._data[name]
+                if name in fields:
+                    values = np.asarray(sample[name])[offset:]
+                    head, tail = values[:first], values[first:]
+                else:
+                    head = tail = 0
+                column[start:start + first] = head
+                column[start + self.capacity:start + self.capacity + first] = head
+                if rest:
+                    column[:rest] = tail
+                    column[self.capacity:self.capacity + rest] = tail
+            self._head = (start + count) % self.capacity
+            self._size = min(self._size + count, self.capacity)
+            self.total += n
+        return n
+
+    def latest(self, n=None):
+        """
+        Return a view of the most recent samples, oldest first.
+
+        The returned array is a view into the buffer's memory, it is
+        overwritten once another `capacity` samples have been appended. Use
+        ``latest(n).copy()`` to retain the data.
+
+        Arguments:
+
+          n (int, optional): The number of samples to return. Default is all
+            samples held in the buffer.
+
+        Returns:
+
+          sample (numpy ndarray): A structured array view of shape (n,) with
+            the buffer's dtype.
+        """
+        with self._lock:
+            if n is None or n > self._size:
+                n = self._size
+            end = self._head + self.capacity
+            return self._data[end - n:end]
+
+    def since(self, total, until=None):
+        """
+        Return a view of the samples appended after the buffer had received
+        `total` samples (as given by the ``total`` attribute), i.e., the samples
+        that a reader has not yet seen. At most `capacity` samples are
+        returned.
+
+        Samples may be appended by another thread at any time: read
+        ``total`` once, pass it as `until` and keep it as the next `total`,
+        so that no sample is skipped or returned twice::
+
+          until = ring.total
+          new = ring.since(seen, until).copy()
+          seen = until
+
+        Arguments:
+
+          total (int): The value of ``total`` when the reader last read.
+
+          until (int, optional): Only return the samples appended before the
+            buffer had received `until` samples. Default is all samples.
+        """
+        with self._lock:
+            later = 0 if until is None else self.total - until
+            n = min(self.total - later - total, self._size - later)
+            end = self._head + self.capacity - later
+            if n <= 0:
+                return self._data[end:end]
+            return self._data[end - n:end]
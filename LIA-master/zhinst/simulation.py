@@ -0,0 +1,517 @@
+"""
+Zurich Instruments LabOne Python API Simulation.
+
+This module provides in-process stand-ins for the ziPython ziDAQServer and
+ziDiscovery classes. They serve the node tree of a simulated lock-in
+amplifier (demodulators, oscillators, signal inputs and outputs, clockbase,
+status/time, /zi/about) and generate demodulator sample streams at the
+configured demod rates, so that the acquisition and GUI code can be run
+and benchmarked without an instrument.
+
+The simulated demodulator signal is the interferogram of a white-light
+Michelson interferometer whose optical path difference (OPD) is scanned,
+see SimulatedDevice.
+
+Example:
+
+  import zhinst.simulation
+  zhinst.simulation.install()  # `import zhinst.ziPython` now uses the simulation.
+  import zhinst.utils
+  (daq, device, props) = zhinst.utils.create_api_session('dev2318', 6)
+  daq.set([['/%s/demods/0/enable' % device, 1], ['/%s/demods/0/rate' % device, 100e3]])
+  daq.subscribe('/%s/demods/0/sample' % device)
+  data = daq.poll(0.1, 500, 0, True)
+"""
+
+from __future__ import print_function
+import fnmatch
+import re
+import sys
+import threading
+import time
+import numpy as np
+
+# The version reported by the simulated API and Data Server.
+VERSION = '17.12'
+REVISION = 51345
+
+# The simulated devices, shared by all ziDiscovery and ziDAQServer instances in
+# the process (as devices are shared by all sessions of a Data Server).
+_devices = {}
+_devices_lock = threading.Lock()
+
+
+def device(device_id, devtype='UHFLI'):
+    """Return the SimulatedDevice `device_id`, creating it if necessary."""
+    device_id = device_id.lower()
+    with _devices_lock:
+        if device_id not in _devices:
+            _devices[device_id] = SimulatedDevice(device_id, devtype)
+        return _devices[device_id]
+
+
+def install():
+    """
+    Register this module as `zhinst.ziPython`, so that code which uses
+    ``zhinst.ziPython.ziDAQServer`` and ``zhinst.ziPython.ziDiscovery`` (e.g.,
+    `zhinst.utils.create_api_session`) runs against the simulation.
+    """
+    import zhinst
+    module = sys.modules[__name__]
+    sys.modules['zhinst.ziPython'] = module
+    zhinst.ziPython = module
+
+
+def white_light_interferogram(opd, wavelength=0.8, bandwidth=0.1, amplitude=0.1, offset=0.0):
+    """
+    Return the AC intensity of a white-light interferogram.
+
+    Arguments:
+
+      opd (numpy array): The optical path difference in um.
+
+      wavelength (float, optional): The center wavelength of the source in um.
+
+      bandwidth (float, optional): The spectral FWHM of the (Gaussian) source
+        in um.
+
+      amplitude (float, optional): The fringe amplitude in V.
+
+      offset (float, optional): The OPD in um at which the path difference is
+        zero.
+
+    Returns:
+
+      signal (numpy array): The interferogram in V.
+    """
+    opd = np.asarray(opd, dtype=float) - offset
+    # Coherence length of a Gaussian spectrum: lc = 2 ln2/pi * lambda**2/dlambda.
+    coherence_length = 2*np.log(2)/np.pi*wavelength**2/bandwidth
+    envelope = np.exp(-(2*opd/coherence_length)**2*np.log(2))
+    return amplitude*envelope*np.cos(2*np.pi*opd/wavelength)
+
+
+class TriangleScan(object):
+    """
+    The default OPD trajectory of a SimulatedDevice: a triangular scan
+    between `opd_min` and `opd_max` (um) at the constant `velocity` (um/s).
+    Instances are callables that map time (s) to OPD (um).
+    """
+
+    def __init__(self, opd_min=-50.0, opd_max=50.0, velocity=20.0):
+        self.opd_min = opd_min
+        self.opd_max = opd_max
+        self.velocity = velocity
+
+    def __call__(self, t):
+        span = self.opd_max - self.opd_min
+        phase = np.mod(np.asarray(t, dtype=float)*self.velocity, 2*span)
+        return self.opd_min + np.where(phase < span, phase, 2*span - phase)
+
+
+class SimulatedDevice(object):
+    """
+    The node tree and signal model of a simulated lock-in amplifier.
+
+    The demodulator outputs are ``x + iy = s(opd(t)) exp(i phaseshift)`` plus
+    white Gaussian noise, where ``s`` is the white-light interferogram
+    (white_light_interferogram()) and ``opd(t)`` the optical path difference
+    at the sample time.
+
+    Attributes:
+
+      opd (callable): Maps time in seconds (numpy array, relative to the
+        device's creation) to OPD in um. Default is a TriangleScan; e.g.,
+        assign a function of a simulated stage's position to couple the
+        signal to a stage.
+
+      wavelength, bandwidth, amplitude, offset (float): The interferogram
+        parameters, see white_light_interferogram().
+
+      noise (float): The standard deviation of the noise added to x and y in
+        V.
+    """
+
+    num_demods = 8
+    num_oscs = 2
+    num_sigins = 2
+    num_sigouts = 2
+
+    def __init__(self, device_id, devtype='UHFLI'):
+        self.device_id = device_id
+        self.devtype = devtype
+        self.options = ['MF', 'PID']
+        self.clockbase = 1800000000
+        self.t0 = time.time()
+        self.opd = TriangleScan()
+        self.wavelength = 0.8
+        self.bandwidth = 0.1
+        self.amplitude = 0.1
+        self.offset = 0.0
+        self.noise = 1e-4
+        self.lock = threading.Lock()
+        self._rng = np.random.RandomState(0)
+        prefix = '/' + device_id
+        nodes = {prefix + '/clockbase': self.clockbase,
+                 prefix + '/features/devtype': devtype,
+                 prefix + '/features/options': '\n'.join(self.options),
+                 prefix + '/features/serial': device_id}
+        for i in range(self.num_demods):
+            nodes.update({prefix + '/demods/%d/enable' % i: 0,
+                          prefix + '/demods/%d/rate' % i: 1674.0,
+                          prefix + '/demods/%d/order' % i: 4,
+                          prefix + '/demods/%d/timeconstant' % i: 0.0101,
+                          prefix + '/demods/%d/oscselect' % i: 0,
+                          prefix + '/demods/%d/adcselect' % i: 0,
+                          prefix + '/demods/%d/harmonic' % i: 1,
+                          prefix + '/demods/%d/phaseshift' % i: 0.0,
+                          prefix + '/demods/%d/trigger' % i: 0,
+                          prefix + '/demods/%d/sinc' % i: 0})
+        for i in range(self.num_oscs):
+            nodes[prefix + '/oscs/%d/freq' % i] = 100e3
+        for i in range(self.num_sigins):
+            nodes.update({prefix + '/sigins/%d/ac' % i: 0,
+                          prefix + '/sigins/%d/imp50' % i: 0,
+                          prefix + '/sigins/%d/diff' % i: 0,
+                          prefix + '/sigins/%d/range' % i: 1.0,
+                          prefix + '/sigins/%d/scaling' % i: 1.0,
+                          prefix + '/sigins/%d/autorange' % i: 0})
+        for i in range(self.num_sigouts):
+            nodes.update({prefix + '/sigouts/%d/on' % i: 0,
+                          prefix + '/sigouts/%d/add' % i: 0,
+                          prefix + '/sigouts/%d/range' % i: 1.0,
+                          prefix + '/sigouts/%d/offset' % i: 0.0})
+            for j in range(self.num_demods):
+                nodes[prefix + '/sigouts/%d/enables/%d' % (i, j)] = 0
+                nodes[prefix + '/sigouts/%d/amplitudes/%d' % (i, j)] = 0.0
+        nodes[prefix + '/scopes/0/enable'] = 0
+        self.nodes = nodes
+        # The path of each demodulator's streaming sample node.
+        self.sample_paths = [prefix + '/demods/%d/sample' % i for i in range(self.num_demods)]
+
+    def timestamp(self, t=None):
+        """Return the device timestamp (clockbase ticks) at time `t`."""
+        if t is None:
+            t = time.time()
+        return int((t - self.t0)*self.clockbase)
+
+    def demod_samples(self, demod, ts_start, ts_end):
+        """
+        Return the samples of demodulator `demod` with timestamps in
+        [ts_start, ts_end) as a dictionary of numpy arrays (as returned by
+        poll()) and the timestamp of the next sample.
+        """
+        prefix = '/%s/demods/%d/' % (self.device_id, demod)
+        rate = float(self.nodes[prefix + 'rate'])
+        if not self.nodes[prefix + 'enable'] or rate <= 0:
+            return None, ts_end
+        dt = max(int(round(self.clockbase/rate)), 1)
+        n = max((ts_end - ts_start + dt - 1)//dt, 0)
+        timestamps = ts_start + np.arange(n, dtype=np.uint64)*np.uint64(dt)
+        t = timestamps/float(self.clockbase)
+        signal = white_light_interferogram(self.opd(t), self.wavelength, self.bandwidth, self.amplitude,
+                                           self.offset)
+        phase = np.deg2rad(self.nodes[prefix + 'phaseshift'])
+        osc = int(self.nodes[prefix + 'oscselect'])
+        freq = self.nodes['/%s/oscs/%d/freq' % (self.device_id, osc)]*self.nodes[prefix + 'harmonic']
+        sample = {'timestamp': timestamps,
+                  'x': signal*np.cos(phase) + self.noise*self._rng.standard_normal(n),
+                  'y': -signal*np.sin(phase) + self.noise*self._rng.standard_normal(n),
+                  'freq': np.full(n, float(freq)),
+                  'phase': np.mod(2*np.pi*freq*t, 2*np.pi),
+                  'dio': np.zeros(n, dtype=np.uint32),
+                  'trigger': np.zeros(n, dtype=np.uint32),
+                  'auxin0': np.zeros(n),
+                  'auxin1': np.zeros(n)}
+        return sample, ts_start + n*dt
+
+
+class ziDiscovery(object):
+    """A stand-in of ziPython's ziDiscovery class for simulated devices."""
+
+    def __init__(self, host='localhost', port=8004):
+        self.host = host
+        self.port = port
+
+    def find(self, device_serial):
+        """Return the device ID of `device_serial`, e.g., 'uhf-dev2318' ->
+        'dev2318'."""
+        match = re.search(r'dev\d+', device_serial, re.IGNORECASE)
+        if match is None:
+            raise RuntimeError("Device `{}` not found.".format(device_serial))
+        device_id = match.group(0).lower()
+        device(device_id)
+        return device_id.upper()
+
+    def get(self, device_id):
+        """Return the discovery properties of the device `device_id`."""
+        dev = device(device_id)
+        return {'deviceid': dev.device_id.upper(),
+                'devicetype': dev.devtype,
+                'options': list(dev.options),
+                'serveraddress': self.host,
+                'serverport': self.port,
+                'apilevel': 6,
+                'connected': dev.device_id.upper(),
+                'discoverable': True,
+                'interfaces': ['1GbE'],
+                'status': ['OK']}
+
+
+class ziDAQServer(object):
+    """
+    A stand-in of ziPython's ziDAQServer class (an API session) that serves
+    the node trees of the simulated devices.
+
+    Arguments:
+
+      host (str): Ignored; accepted for compatibility.
+
+      port (int): Ignored; accepted for compatibility.
+
+      api_level (int): The API level of the session.
+
+      realtime (bool, optional): If True (default), poll() blocks for the
+        recording time and returns the samples generated in real time since
+        the last poll(). If False, poll() returns immediately with
+        `recording_time` seconds worth of samples; this allows measuring the
+        throughput of the processing code independently of wall-clock time.
+    """
+
+    def __init__(self, host='localhost', port=8004, api_level=6, realtime=True):
+        self.host = host
+        self.port = port
+        self.api_level = api_level
+        self.realtime = realtime
+        self._subscribed = set()
+        self._next_timestamp = {}
+        self._events = []
+        self._lock = threading.Lock()
+
+    # Session information.
+    def version(self):
+        return VERSION
+
+    def revision(self):
+        return REVISION
+
+    def connectDevice(self, device_id, interface, params=''):
+        device(device_id)
+
+    def disconnectDevice(self, device_id):
+        pass
+
+    # Node tree.
+    def _devices(self):
+        with _devices_lock:
+            return list(_devices.values())
+
+    def _zi_nodes(self):
+        return {'/zi/about/version': VERSION,
+                '/zi/about/revision': REVISION,
+                '/zi/about/copyright': 'Simulation',
+                '/zi/config/port': self.port,
+                '/zi/devices/connected': ','.join(dev.device_id for dev in self._devices())}
+
+    def _find(self, path, sample_nodes=False):
+        """Return a list of (device, node) of the nodes matching `path`, which
+        may contain wildcards or specify a branch of the node tree; device is
+        None for /zi nodes."""
+        path = '/' + path.strip('/').lower()
+        matches = []
+        for dev in self._devices():
+            nodes = list(dev.nodes) + (dev.sample_paths if sample_nodes else [])
+            matches += [(dev, node) for node in nodes if _match(node, path)]
+        matches += [(None, node) for node in self._zi_nodes() if _match(node, path)]
+        return matches
+
+    def _set(self, path, value):
+        matches = self._find(path)
+        if not matches and not re.search(r'[*?]', path):
+            raise RuntimeError("ZIAPINotFoundException: Path `{}` not found.".format(path))
+        for dev, node in matches:
+            if dev is None:
+                continue
+            with dev.lock:
+                current = dev.nodes[node]
+                if isinstance(current, str):
+                    dev.nodes[node] = str(value)
+                elif isinstance(current, int) and not isinstance(current, bool):
+                    dev.nodes[node] = int(value)
+                else:
+                    dev.nodes[node] = float(value)
+                self._node_event(dev, node)
+
+    def _get(self, path):
+        path = path.lower()
+        if path.startswith('/zi/'):
+            return self._zi_nodes()[path]
+        for dev in self._devices():
+            if path in dev.nodes:
+                return dev.nodes[path]
+            if path == '/%s/status/time' % dev.device_id:
+                return dev.timestamp()
+        raise RuntimeError("ZIAPINotFoundException: Path `{}` not found.".format(path))
+
+    def _node_event(self, dev, node):
+        # Called with dev.lock held; the events are shared with poll().
+        with self._lock:
+            if node in self._subscribed:
+                self._events.append((node, dev.timestamp(), dev.nodes[node]))
+
+    def set(self, *args):
+        """Set one or more nodes: set(path, value) or set([[path, value], ...])."""
+        if len(args) == 2:
+            settings = [args]
+        else:
+            settings = args[0]
+        for path, value in settings:
+            self._set(path, value)
+
+    def setInt(self, path, value):
+        self._set(path, int(value))
+
+    def setDouble(self, path, value):
+        self._set(path, float(value))
+
+    def setString(self, path, value):
+        self._set(path, str(value))
+
+    def syncSetInt(self, path, value):
+        self._set(path, int(value))
+        return self.getInt(path)
+
+    def syncSetDouble(self, path, value):
+        self._set(path, float(value))
+        return self.getDouble(path)
+
+    def getInt(self, path):
+        return int(self._get(path))
+
+    def getDouble(self, path):
+        return float(self._get(path))
+
+    def getString(self, path):
+        return str(self._get(path))
+
+    def get(self, paths, flat=False, flags=0):
+        """Return the values of the (comma separated, wildcard) node `paths`."""
+        data = {}
+        for path in paths.split(','):
+            for dev, node in self._find(path.strip()):
+                value = dev.nodes[node] if dev is not None else self._zi_nodes()[node]
+                timestamp = dev.timestamp() if dev is not None else 0
+                data[node] = {'timestamp': np.array([timestamp], dtype=np.uint64), 'value': np.array([value])}
+        return data if flat else _nested(data)
+
+    def getAsEvent(self, path):
+        """Push the current value of `path` to the poll() data of the session."""
+        for dev, node in self._find(path):
+            if dev is not None:
+                with self._lock:
+                    self._events.append((node, dev.timestamp(), dev.nodes[node]))
+
+    def listNodes(self, path, flags=0):
+        """
+        Return the nodes below `path`. The flags are a bitmask of 1 (recursive),
+        2 (absolute paths) and 4 (leaves only) as in ziPython.
+        """
+        base = '/' + path.strip('/').lower()
+        recursive = flags & 1
+        absolute = flags & 2
+        leaves_only = flags & 4
+        nodes = set()
+        for _, node in self._find(base, sample_nodes=True):
+            if node == base or re.search(r'[*?]', base):
+                nodes.add(node if absolute else node.rsplit('/', 1)[-1])
+                continue
+            parts = node[len(base):].strip('/').split('/')
+            if recursive:
+                entries = [parts] if leaves_only else [parts[:k] for k in range(1, len(parts) + 1)]
+            elif leaves_only and len(parts) > 1:
+                entries = []
+            else:
+                entries = [parts[:1]]
+            for entry in entries:
+                name = '/'.join(entry)
+                nodes.add(base.rstrip('/') + '/' + name if absolute else name)
+        return sorted(nodes)
+
+    # Streaming.
+    def subscribe(self, path):
+        with self._lock:
+            for dev, node in self._find(path, sample_nodes=True):
+                if node not in self._subscribed:
+                    self._subscribed.add(node)
+                    if dev is not None:
+                        self._next_timestamp[node] = dev.timestamp()
+
+    def unsubscribe(self, path):
+        with self._lock:
+            pattern = '/' + path.strip('/').lower()
+            for node in list(self._subscribed):
+                if _match(node, pattern):
+                    self._subscribed.discard(node)
+                    self._next_timestamp.pop(node, None)
+
+    def sync(self):
+        """Discard all data buffered for this session since the last poll()."""
+        with self._lock:
+            for dev in self._devices():
+                now = dev.timestamp()
+                for node in self._next_timestamp:
+                    if node.startswith('/' + dev.device_id + '/'):
+                        self._next_timestamp[node] = now
+            self._events = []
+
+    def poll(self, recording_time, timeout, flags=0, flat=False):
+        """
+        Return the data of the subscribed nodes, see the class' `realtime`
+        argument for the duration covered.
+        """
+        if self.realtime:
+            time.sleep(recording_time)
+        data = {}
+        with self._lock:
+            for dev in self._devices():
+                for demod, path in enumerate(dev.sample_paths):
+                    if path not in self._subscribed:
+                        continue
+                    ts_start = self._next_timestamp[path]
+                    if self.realtime:
+                        ts_end = dev.timestamp()
+                    else:
+                        ts_end = ts_start + int(recording_time*dev.clockbase)
+                    sample, self._next_timestamp[path] = dev.demod_samples(demod, ts_start, ts_end)
+                    if sample is not None and len(sample['timestamp']):
+                        data[path] = sample
+            for node, timestamp, value in self._events:
+                entry = data.setdefault(node, {'timestamp': [], 'value': []})
+                entry['timestamp'].append(timestamp)
+                entry['value'].append(value)
+            self._events = []
+        for node in data:
+            if 'value' in data[node]:
+                data[node] = {'timestamp': np.array(data[node]['timestamp'], dtype=np.uint64),
+                              'value': np.array(data[node]['value'])}
+        return data if flat else _nested(data)
+
+
+def _match(node, path):
+    """Return True if `node` matches `path`, which may contain wildcards or
+    specify a branch of the node tree."""
+    if re.search(r'[*?]', path):
+        return fnmatch.fnmatchcase(node, path)
+    return path == '/' or node == path or node.startswith(path + '/')
+
+
+def _nested(data):
+    """Convert a flat dictionary keyed by node path into a nested dictionary."""
+    nested = {}
+    for path, value in data.items():
+        parts = path.strip('/').split('/')
+        level = nested
+        for part in parts[:-1]:
+            level = level.setdefault(part, {})
+        level[parts[-1]] = value
+    return nested
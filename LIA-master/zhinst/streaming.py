@@ -0,0 +1,295 @@
+"""
+Zurich Instruments LabOne Python API Streaming Utilities.
+
+This module provides a background acquisition engine that continuously
+polls subscribed demodulator sample nodes from a Data Server and hands the
+returned sample blocks to the caller through a bounded queue, or only to
+a callback.
+
+In contrast to the one-shot subscribe/sleep/poll pattern used in
+`zhinst.examples.common.example_poll`, the Data Server's buffers are drained
+continuously, so long measurements do not accumulate data on the server and
+the calling thread (e.g., a Tk main loop) never blocks inside poll().
+
+A ziDAQServer session must not be used by several threads at once. The
+streamer therefore calls the session through a LockedSession, which
+serializes the API calls with a lock, and polls without waiting so that the
+lock is only held for the transfer of the buffered data. Other threads that
+use the same session (node reads, clock reads, settings) must go through
+the streamer's `session` (or the LockedSession it was given).
+"""
+
+from __future__ import print_function
+import functools
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class LockedSession(object):
+    """
+    A ziDAQServer API session that can be shared by threads: every method
+    call on the session is made while holding `lock`.
+
+    Attributes of the session are forwarded; modules created with it (e.g.
+    dataAcquisitionModule()) are returned as they are.
+
+    Arguments:
+
+      daq (ziDAQServer): An instance of the ziPython.ziDAQServer class
+        (representing an API session connected to a Data Server).
+
+    Example:
+
+      session = zhinst.streaming.LockedSession(daq)
+      streamer = zhinst.streaming.DemodStreamer(session, '/dev2318/demods/0/sample')
+      session.getInt('/dev2318/status/time')  # from any thread
+    """
+
+    def __init__(self, daq):
+        self.daq = daq
+        self.lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.daq, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            with self.lock:
+                return attribute(*args, **kwargs)
+        return call
+
+
+class DemodStreamer(object):
+    """
+    Continuously poll demodulator sample nodes in a background thread.
+
+    Each call to ziDAQServer's poll() returns a block of samples per
+    subscribed node; every block is pushed into a bounded queue as a tuple
+    ``(path, sample)`` where ``sample`` is the dictionary of numpy arrays
+    returned by poll() for that node (fields 'timestamp', 'x', 'y', 'freq',
+    'phase', 'dio', 'trigger', 'auxin0', 'auxin1').
+
+    If the consumer falls behind and the queue is full, the oldest queued
+    block is discarded so that the poll loop keeps draining the Data Server;
+    the number of discarded blocks is reported by ``dropped_blocks``.
+
+    Arguments:
+
+      daq (ziDAQServer or LockedSession): The API session. A ziDAQServer is
+        wrapped in a new LockedSession, available as `session`; use it for
+        the other calls on the session while the streamer runs.
+
+      paths (str or list of str): The node path(s) to subscribe to, e.g.,
+        '/dev2318/demods/0/sample'.
+
+      poll_length (float, optional): The period in seconds of the poll()
+        calls, each returns the data received since the previous one. Short
+        values reduce latency, long values reduce the per-call overhead.
+
+      poll_flags (int, optional): The flags passed to poll().
+
+      maxsize (int or None, optional): The maximum number of sample blocks held
+        in the queue. None: no queue, the blocks are only passed to `callback`
+        (e.g. a ring buffer that is the only consumer), get() and blocks()
+        are not available.
+
+      sync (bool, optional): Whether to call ziDAQServer's sync() before
+        subscribing in order to clear any stale data from the API's buffers.
+
+      callback (callable, optional): If specified, called from the poll thread
+        as ``callback(path, sample)`` for every block before it is queued,
+        e.g., to write the block into a ring buffer.
+
+      node_cache (NodeCache, optional): If specified, the poll() data is passed
+        to its update() method, which keeps the values of the nodes it tracks up
+        to date (see zhinst.nodecache). Create the cache on the streamer's
+        session.
+
+    Example:
+
+      import zhinst.utils
+      import zhinst.streaming
+      (daq, device, _) = zhinst.utils.create_api_session('dev2318', 6)
+      streamer = zhinst.streaming.DemodStreamer(daq, '/%s/demods/0/sample' % device)
+      with streamer:
+          for path, sample in streamer.blocks(timeout=1.0):
+              print(path, len(sample['timestamp']))
+    """
+
+    def __init__(self, daq, paths, poll_length=0.05, poll_flags=0, maxsize=1024, sync=True,
+                 callback=None, node_cache=None):
+        if isinstance(paths, str):
+            paths = [paths]
+        if not isinstance(daq, LockedSession):
+            daq = LockedSession(daq)
+        self.daq = daq
+        self.paths = [path.lower() for path in paths]
+        self.poll_length = poll_length
+        self.poll_flags = poll_flags
+        self.sync = sync
+        self.callback = callback
+        self.node_cache = node_cache
+        if maxsize is None:
+            if callback is None:
+                raise ValueError("A streamer without a queue (maxsize None) needs a callback.")
+            self.queue = None
+        else:
+            self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped_blocks = 0
+        self.polled_blocks = 0
+        self.polled_samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        """Subscribe to the configured paths and start the poll thread."""
+        if self.is_running():
+            raise RuntimeError("The streamer is already running.")
+        if self.sync:
+            self.daq.sync()
+        for path in self.paths:
+            self.daq.subscribe(path)
+        self._stop_event.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='DemodStreamer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the poll thread and unsubscribe from the configured paths.
+
+        Blocks that are already queued remain available via get().
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for path in self.paths:
+            self.daq.unsubscribe(path)
+
+    @property
+    def session(self):
+        """The LockedSession the streamer polls, to share with other threads."""
+        return self.daq
+
+    def is_running(self):
+        """Return True if the poll thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def error(self):
+        """The exception that terminated the poll thread, or None."""
+        return self._error
+
+    def get(self, timeout=None):
+        """
+        Return the next ``(path, sample)`` block from the queue.
+
+        Arguments:
+
+          timeout (float, optional): The maximum time in seconds to wait for a
+            block. Wait indefinitely if None.
+
+        Raises:
+
+          queue.Empty: If no block arrived within `timeout`.
+
+          Exception: The exception that terminated the poll thread, once the
+            blocks queued before it have been returned, also while waiting.
+
+          RuntimeError: If the streamer has no queue.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self._raise_error()
+            # Wait in short steps so that a failure of the poll thread is
+            # raised instead of waiting forever.
+            wait = 0.1 if deadline is None else min(0.1, max(deadline - time.time(), 0))
+            try:
+                return self.queue.get(timeout=wait)
+            except queue.Empty:
+                if deadline is not None and time.time() >= deadline:
+                    raise
+
+    def get_all(self):
+        """Return all currently queued ``(path, sample)`` blocks without
+        blocking; an empty list is returned if no data is queued."""
+        self._raise_error()
+        blocks = []
+        while True:
+            try:
+                blocks.append(self.queue.get_nowait())
+            except queue.Empty:
+                return blocks
+
+    def blocks(self, timeout=None):
+        """
+        Yield ``(path, sample)`` blocks until the streamer has been stopped and
+        the queue has been emptied, or until no block arrived within
+        `timeout` seconds.
+        """
+        while True:
+            try:
+                yield self.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                if timeout is None and self.is_running():
+                    continue
+                return
+
+    def _raise_error(self):
+        if self.queue is None:
+            raise RuntimeError("The streamer has no queue, its blocks are passed to the callback.")
+        if self._error is not None and self.queue.empty():
+            raise self._error
+
+    def _put(self, block):
+        if self.queue is None:
+            return
+        while True:
+            try:
+                self.queue.put_nowait(block)
+                return
+            except queue.Full:
+                # Keep draining the Data Server: discard the oldest block rather
+                # than blocking the poll loop.
+                try:
+                    self.queue.get_nowait()
+                    self.dropped_blocks += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        poll_return_flat_dict = True
+        try:
+            while not self._stop_event.wait(self.poll_length):
+                # No recording time nor timeout: the session lock is not held
+                # while waiting for the data.
+                data = self.daq.poll(0.0, 0, self.poll_flags, poll_return_flat_dict)
+                if not data:
+                    continue
+                if self.node_cache is not None:
+                    self.node_cache.update(data)
+                for path, sample in data.items():
+                    if path.lower() not in self.paths:
+                        continue
+                    if self.callback is not None:
+                        self.callback(path, sample)
+                    self._put((path, sample))
+                    self.polled_blocks += 1
+                    self.polled_samples += len(sample['timestamp'])
+        except Exception as e:
+            self._error = e
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
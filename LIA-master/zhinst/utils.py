@@ -20,13 +20,11 @@ import re
 import warnings
 import os
 import time
-try:
-    # load_labone_mat() requires scipy.io.loadmat()
-    import scipy.io
-except ImportError as e:
-    # No fallback. No complaints upon importing zhinst.utils, handle/raise
-    # exception when the function load_labone_mat() is called.
-    __scipy_import_error = e
+import hashlib
+import io
+import itertools
+import struct
+import zlib
 import numpy as np
 import zhinst.ziPython
 
@@ -612,18 +610,170 @@ ZICONTROL_FORMATS = ('f8', 'f8', 'f8', 'f8', 'u4', 'f8', 'f8')
 ZICONTROL_DTYPE = list(zip(ZICONTROL_NAMES, ZICONTROL_FORMATS))
 
 
-def load_labone_demod_csv(fname, column_names=LABONE_DEMOD_NAMES):
+# The directory used to cache the arrays parsed by load_labone_demod_csv() and
+# load_labone_csv() when called with cache=True.
+LABONE_CSV_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.zhinst', 'csv_cache')
+
+# The maximum total size in bytes of the cached arrays; the least recently used
+# arrays are deleted when a new array would exceed it.
+LABONE_CSV_CACHE_MAX_BYTES = 2*1024**3
+
+# The formats of the columns of a generic LabOne CSV file that hold integers;
+# all other columns are loaded as float64.
+LABONE_CSV_INT_FORMATS = {'chunk': 'u8', 'timestamp': 'u8', 'dio': 'u4', 'trigger': 'u4'}
+
+# The number of CSV lines parsed at once by the LabOne CSV loaders.
+LABONE_CSV_CHUNKSIZE = 1000000
+
+
+def _csv_cache_filename(fname, key, cache_dir):
+    """Return the cache filename for the CSV file `fname` or None if `fname`
+    is not a filename. The cache filename depends on the file's absolute
+    path, size and modification time and the `key` of the requested data."""
+    try:
+        fname = os.fspath(fname)
+    except TypeError:
+        # A file object.
+        return None
+    if isinstance(fname, bytes):
+        fname = os.fsdecode(fname)
+    stat = os.stat(fname)
+    key = repr((os.path.abspath(fname), stat.st_size, stat.st_mtime, key))
+    return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy')
+
+
+def _csv_cache_load(cache_filename):
+    if cache_filename is None or not os.path.isfile(cache_filename):
+        return None
+    try:
+        data = np.load(cache_filename)
+        # Mark the array as recently used, see _csv_cache_evict().
+        os.utime(cache_filename)
+        return data
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _csv_cache_evict(cache_dir, max_bytes):
+    """Delete the least recently used arrays in `cache_dir` until their total
+    size is at most `max_bytes`."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.npy'):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+            total -= size
+        except OSError:
+            pass
+
+
+def _csv_cache_save(cache_filename, data):
+    if cache_filename is None:
+        return
+    try:
+        cache_dir = os.path.dirname(cache_filename)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # Write to a temporary file first in order to never leave an incomplete
+        # cache file behind.
+        tmp_filename = cache_filename + '.%d.tmp' % os.getpid()
+        with open(tmp_filename, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp_filename, cache_filename)
+        _csv_cache_evict(cache_dir, LABONE_CSV_CACHE_MAX_BYTES)
+    except (IOError, OSError) as e:
+        warnings.warn("Unable to write the CSV cache file `{}`: {}.".format(cache_filename, e))
+
+
+def _pandas():
+    """
+    Import and return pandas, or None if it is not installed.
+
+    The LabOne CSV loaders use pandas.read_csv() if available and otherwise
+    fall back to numpy.loadtxt(). pandas is imported on first use rather than
+    with zhinst.utils, whose import it would slow down.
+    """
+    try:
+        import pandas
+    except ImportError:
+        return None
+    return pandas
+
+
+def _read_csv_chunks(fname, dtype, usecols, chunksize):
+    """Parse the data lines (all but the first line) of a `;` delimited CSV
+    file in chunks of `chunksize` lines, only converting the columns in
+    `usecols`. Return a numpy structured array of the given `dtype`."""
+    dtype = np.dtype(dtype)
+    chunks = []
+    pandas = _pandas()
+    if pandas is not None:
+        try:
+            reader = pandas.read_csv(fname, sep=';', header=None, skiprows=1, usecols=usecols,
+                                     dtype={col: dtype[i] for i, col in enumerate(usecols)}, engine='c',
+                                     chunksize=chunksize)
+        except pandas.errors.EmptyDataError:
+            reader = []
+        for frame in reader:
+            chunk = np.empty(len(frame), dtype=dtype)
+            for name, col in zip(dtype.names, usecols):
+                chunk[name] = frame[col].values
+            chunks.append(chunk)
+    else:
+        f = fname if hasattr(fname, 'read') else open(fname, 'r')
+        try:
+            # Skip the header line.
+            next(f, None)
+            while True:
+                lines = list(itertools.islice(f, chunksize))
+                if not lines:
+                    break
+                chunks.append(np.loadtxt(lines, delimiter=';', dtype=dtype, usecols=usecols, ndmin=1))
+        finally:
+            if f is not fname:
+                f.close()
+    if not chunks:
+        return np.empty(0, dtype=dtype)
+    if len(chunks) == 1:
+        return chunks[0]
+    return np.concatenate(chunks)
+
+
+def load_labone_demod_csv(fname, column_names=LABONE_DEMOD_NAMES, cache=False, cache_dir=LABONE_CSV_CACHE_DIR):
     """
     Load a CSV file containing demodulator samples as saved by the LabOne User
     Interface into a numpy structured array.
 
+    The file is parsed in chunks with pandas' C parser (if pandas is
+    installed, otherwise numpy.loadtxt() is used) and only the columns in
+    `column_names` are converted. With `cache`, the parsed array is cached as
+    a ``.npy`` file in `cache_dir`; subsequent calls load the cached array as
+    long as the CSV file's path, size and modification time are unchanged. The
+    least recently used arrays are deleted when the cache exceeds
+    LABONE_CSV_CACHE_MAX_BYTES.
+
     Arguments:
 
-      fname (file or str): The file or filename of the CSV file to load.
+      fname (file, str or path): The file or filename of the CSV file to load.
 
       column_names (list or tuple of str, optional): A list (or tuple) of column
       names to load from the CSV file. Default is to load all columns.
 
+      cache (bool, optional): Whether to use the on-disk cache (default off).
+      Only used if `fname` is a filename.
+
+      cache_dir (str, optional): The directory where cached arrays are saved.
+
     Returns:
 
       sample (numpy ndarray): A numpy structured array of shape (num_points,)
@@ -642,18 +792,33 @@ def load_labone_demod_csv(fname, column_names=LABONE_DEMOD_NAMES):
         'Invalid name in ``column_names``, valid names are: %s' % str(LABONE_DEMOD_NAMES)
     cols = [col for col, dtype in enumerate(LABONE_DEMOD_DTYPE) if dtype[0] in column_names]
     dtype = [dt for dt in LABONE_DEMOD_DTYPE if dt[0] in column_names]
-    sample = np.genfromtxt(fname, delimiter=';', dtype=dtype, usecols=cols, skip_header=1)
+    cache_filename = _csv_cache_filename(fname, ('demod', cols), cache_dir) if cache else None
+    sample = _csv_cache_load(cache_filename)
+    if sample is None:
+        sample = _read_csv_chunks(fname, dtype, cols, LABONE_CSV_CHUNKSIZE)
+        _csv_cache_save(cache_filename, sample)
     return sample
 
 
-def load_labone_csv(fname):
+def load_labone_csv(fname, cache=False, cache_dir=LABONE_CSV_CACHE_DIR):
     """
     Load a CSV file containing generic data as saved by the LabOne User
     Interface into a numpy structured array.
 
+    The column names are read from the first line of the file. The columns
+    listed in LABONE_CSV_INT_FORMATS (chunk, timestamp, dio, trigger) are
+    loaded as integers, all other columns as float64, whatever the values of
+    the first data lines. A file without data lines returns an empty array
+    with these fields. See load_labone_demod_csv() for a description of the
+    parser and the on-disk cache.
+
     Arguments:
 
-      filename (str): The filename of the CSV file to load.
+      filename (str or path): The filename of the CSV file to load.
+
+      cache (bool, optional): Whether to use the on-disk cache (default off).
+
+      cache_dir (str, optional): The directory where cached arrays are saved.
 
     Returns:
 
@@ -670,11 +835,22 @@ def load_labone_csv(fname):
       # Plot the error
       plt.plot(data['timestamp'], data['value'])
     """
-    data = np.genfromtxt(fname, delimiter=';', dtype=None, names=True)
+    cache_filename = _csv_cache_filename(fname, ('generic',), cache_dir) if cache else None
+    data = _csv_cache_load(cache_filename)
+    if data is not None:
+        return data
+    with open(fname, 'r') as f:
+        header = f.readline()
+    if not header.strip():
+        raise ValueError("The CSV file `{}` has no header line.".format(fname))
+    names = [re.sub(r'\W', '_', name.strip()) for name in header.split(';')]
+    dtype = [(name, LABONE_CSV_INT_FORMATS.get(name, 'f8')) for name in names]
+    data = _read_csv_chunks(fname, dtype, list(range(len(names))), LABONE_CSV_CHUNKSIZE)
+    _csv_cache_save(cache_filename, data)
     return data
 
 
-def load_labone_mat(filename):
+def load_labone_mat(filename, lazy=False):
     """
     A wrapper function for loading a MAT file as saved by the LabOne User
     Interface with scipy.io's loadmat() function. This function is included
@@ -685,12 +861,16 @@ def load_labone_mat(filename):
 
       filename (str): the name of the MAT file to load.
 
+      lazy (bool, optional): If True, return a LabOneMatFile instead of loading
+      the file: its data is addressed by node path and only loaded when
+      accessed, see ``Example``.
+
     Returns:
 
-      data (dict): a nested dictionary containing the instrument data as
-      specified in the LabOne User Interface. The nested structure of ``data``
-      corresponds to the path of the data's node in the instrument's node
-      hierarchy.
+      data (dict or LabOneMatFile): a nested dictionary containing the
+      instrument data as specified in the LabOne User Interface. The nested
+      structure of ``data`` corresponds to the path of the data's node in the
+      instrument's node hierarchy.
 
     Further comments:
 
@@ -726,18 +906,457 @@ def load_labone_mat(filename):
       # If multiple demodulator's are saved, data from the second demodulator,
       # e.g., is accessed as following:
       x = data[device][0,0]['demods'][0,1]['sample'][0,0]['x'][0]
+
+      # The same data accessed lazily by node path:
+      data = zhinst.utils.load_labone_mat(filename, lazy=True)
+      x = data['/dev88/demods/1/sample']['x']
+    """
+    if lazy:
+        return LabOneMatFile(filename)
+    return _scipy_io().loadmat(filename)
+
+
+def _scipy_io():
+    """
+    Import and return scipy.io, which is only needed to load MAT files.
+
+    scipy is imported on first use rather than with zhinst.utils: importing it
+    takes longer than the rest of the module.
     """
     try:
-        data = scipy.io.loadmat(filename)
-        return data
-    except (NameError, AttributeError):
+        import scipy.io
+    except ImportError:
         print("\n\n *** Please install the ``scipy`` package and verify you can use scipy.io.loadmat() "
               "in order to use zhinst.utils.load_labone_mat. *** \n\n")
-        print("Whilst calling import scipy.io an exception was raised with the message: {}.", str(__scipy_import_error))
-        print("Whilst calling scipy.io.loadmat() the following exception was raised:")
-        raise
-    except:
         raise
+    return scipy.io
+
+
+def _labone_mat_node(data, path):
+    """
+    Return the struct of the node `path` (e.g., '/dev88/demods/0/sample') from
+    the nested data structure returned by scipy.io.loadmat() for a MAT file
+    saved by the LabOne User Interface, applying the (1, 1) struct array
+    indexing described in load_labone_mat().
+    """
+    components = [c for c in path.split('/') if c]
+    node = data[components[0]]
+    indexed = False
+    for component in components[1:]:
+        if component.isdigit():
+            # A numeric path component selects an element of a struct array.
+            node = node.flat[int(component)]
+            indexed = True
+        else:
+            if not indexed:
+                node = node[0, 0]
+            node = node[component]
+            indexed = False
+    if not indexed and node.dtype.names is not None:
+        node = node[0, 0]
+    return node
+
+
+# MAT v5 data types and array classes read by _MatReader.
+_MI_INT8 = 1
+_MI_INT32 = 5
+_MI_UINT32 = 6
+_MI_MATRIX = 14
+_MI_COMPRESSED = 15
+_MX_STRUCT_CLASS = 2
+
+
+class _MatUnsupported(Exception):
+    """The node cannot be read on its own, load the whole variable."""
+
+
+class _MatReader(object):
+    """
+    Sequential reader of the data elements of a MAT v5 file `f`, or of the
+    `compressed` bytes of a compressed element starting at the current
+    position of `f`, which are decompressed as they are read. Skipped data
+    is never kept in memory.
+    """
+
+    def __init__(self, f, endian, compressed=None):
+        self.f = f
+        self.endian = endian
+        self._left = compressed
+        self._zlib = zlib.decompressobj() if compressed is not None else None
+        self._buffer = b''
+
+    def read(self, n):
+        if self._zlib is None:
+            data = self.f.read(n)
+        else:
+            while len(self._buffer) < n and self._left:
+                chunk = self.f.read(min(self._left, 1 << 16))
+                if not chunk:
+                    break
+                self._left -= len(chunk)
+                self._buffer += self._zlib.decompress(chunk)
+            data, self._buffer = self._buffer[:n], self._buffer[n:]
+        if len(data) < n:
+            raise _MatUnsupported('Truncated MAT file.')
+        return data
+
+    def skip(self, n):
+        if self._zlib is None:
+            self.f.seek(n, 1)
+            return
+        while n > 0:
+            n -= len(self.read(min(n, 1 << 20)))
+
+    def tag(self):
+        """Return (type, nbytes, data) of the next element; data is only
+        returned for the small data element format, else None."""
+        raw = self.read(8)
+        first, second = struct.unpack(self.endian + 'II', raw)
+        if first >> 16:
+            return first & 0xffff, first >> 16, raw[4:4 + (first >> 16)]
+        return first, second, None
+
+    def element(self):
+        """Return (type, data) of the next element."""
+        mtype, nbytes, data = self.tag()
+        if data is None:
+            data = self.read(nbytes)
+            self.skip(-nbytes % 8)
+        return mtype, data
+
+    def matrix_header(self):
+        """Read the array flags, dimensions and name of a matrix element,
+        return (class, dimensions, name)."""
+        flags = self.element()[1]
+        dims = self.element()[1]
+        name = self.element()[1]
+        return (struct.unpack(self.endian + 'I', flags[:4])[0] & 0xff,
+                struct.unpack(self.endian + '%di' % (len(dims)//4), dims),
+                name.rstrip(b'\0').decode())
+
+    def find(self, mclass, dims, components):
+        """Return the bytes of the matrix element (without its tag) of the
+        node `components` below the struct whose header was just read."""
+        if mclass != _MX_STRUCT_CLASS:
+            raise _MatUnsupported('Not a struct.')
+        length = struct.unpack(self.endian + 'i', self.element()[1][:4])[0]
+        names = self.element()[1]
+        names = [names[i:i + length].split(b'\0')[0].decode() for i in range(0, len(names), length)]
+        element = 0
+        if components[0].isdigit():
+            element = int(components[0])
+            components = components[1:]
+            if not components:
+                # A struct array element is not stored as one matrix.
+                raise _MatUnsupported('Path to a struct array element.')
+        if components[0] not in names:
+            raise KeyError("No field `{}`.".format(components[0]))
+        if element >= int(np.prod(dims)):
+            raise IndexError("No element {} in the struct array.".format(element))
+        # The fields of every element follow each other, elements in order.
+        for _ in range(element*len(names) + names.index(components[0])):
+            self.skip(self._matrix_tag())
+        nbytes = self._matrix_tag()
+        if len(components) == 1:
+            return self.read(nbytes)
+        mclass, dims, _ = self.matrix_header()
+        return self.find(mclass, dims, components[1:])
+
+    def _matrix_tag(self):
+        mtype, nbytes, _ = self.tag()
+        if mtype != _MI_MATRIX:
+            raise _MatUnsupported('Unexpected MAT element type {}.'.format(mtype))
+        return nbytes + (-nbytes % 8)
+
+
+def _mat_variables(f):
+    """
+    Yield (reader, class, dimensions, name) for the top level variables of the
+    MAT v5 file `f`, the reader positioned after the header of the variable's
+    matrix. Only the headers are read.
+    """
+    header = f.read(128)
+    endian = '<' if header[126:128] == b'IM' else '>'
+    if struct.unpack(endian + 'H', header[124:126])[0] != 0x0100:
+        raise ValueError("`{}` is not a MAT v5 file.".format(getattr(f, 'name', f)))
+    reader = _MatReader(f, endian)
+    while True:
+        try:
+            mtype, nbytes, _ = reader.tag()
+        except _MatUnsupported:
+            return
+        start = f.tell()
+        variable = reader
+        if mtype == _MI_COMPRESSED:
+            variable = _MatReader(f, endian, nbytes)
+            mtype = variable.tag()[0]
+        if mtype == _MI_MATRIX:
+            yield (variable,) + variable.matrix_header()
+        f.seek(start + nbytes + (0 if variable is not reader else -nbytes % 8))
+
+
+def _labone_mat_read_node(filename, path):
+    """
+    Read the node `path` (e.g., '/dev88/demods/0/sample') of a MAT v5 file
+    saved by the LabOne User Interface without loading the rest of its
+    variable, return it as scipy.io.loadmat() returns a variable.
+
+    The data elements of the variable are skipped up to the node, whose
+    element alone is loaded with scipy.io.loadmat(). Raises _MatUnsupported
+    if the node cannot be read on its own.
+    """
+    components = [c for c in path.split('/') if c]
+    with open(filename, 'rb') as f:
+        for variable, mclass, dims, name in _mat_variables(f):
+            if name == components[0]:
+                content = variable.find(mclass, dims, components[1:])
+                endian = variable.endian
+                break
+        else:
+            raise KeyError("The MAT file `{}` has no variable `{}`.".format(filename, components[0]))
+    # The node's matrix as the only variable of a MAT file, named `node`.
+    offset = 0
+    for _ in range(2):
+        length = struct.unpack(endian + 'I', content[offset + 4:offset + 8])[0]
+        offset += 8 + length + (-length % 8)
+    name_tag = struct.unpack(endian + 'I', content[offset:offset + 4])[0]
+    name_length = 8 if name_tag >> 16 else 8 + struct.unpack(endian + 'I', content[offset + 4:offset + 8])[0]
+    name = struct.pack(endian + 'I', (4 << 16) | _MI_INT8) + b'node'
+    content = content[:offset] + name + content[offset + name_length + (-name_length % 8):]
+    matfile = (b'MATLAB 5.0 MAT-file'.ljust(116) + b'\0'*8 + struct.pack(endian + 'H', 0x0100) +
+               (b'IM' if endian == '<' else b'MI') + struct.pack(endian + 'II', _MI_MATRIX, len(content)) + content)
+    return _scipy_io().loadmat(io.BytesIO(matfile))['node']
+
+
+class LabOneMatNode(object):
+    """
+    A node of the data in a MAT file saved by the LabOne User Interface, as
+    returned by LabOneMatFile. Indexing a node by a field name returns the
+    field's data as a flattened numpy array, or a LabOneMatNode if the field is
+    itself a struct.
+    """
+
+    def __init__(self, struct):
+        self.struct = struct
+
+    def keys(self):
+        """Return the field names of the node."""
+        return list(self.struct.dtype.names)
+
+    def __contains__(self, name):
+        return name in self.struct.dtype.names
+
+    def __getitem__(self, name):
+        value = self.struct[name]
+        if value.dtype.names is not None:
+            return LabOneMatNode(value[0, 0] if value.size == 1 else value)
+        return np.ravel(value)
+
+
+class LabOneMatFile(object):
+    """
+    Lazy, node path addressable access to a MAT file saved by the LabOne User
+    Interface, as returned by ``load_labone_mat(filename, lazy=True)``.
+
+    Creating an instance only reads the names of the file's top level variables
+    (one per device) from their headers. Accessing a node, e.g. '/dev88/demods/0/sample', skips
+    the data elements of the file up to the node and only loads the node's
+    data (compressed variables are decompressed up to the node, without
+    keeping the skipped data). The other nodes of the device and the other
+    devices are not loaded.
+
+    A path that ends with a struct array index (e.g. '/dev88/demods/0') is
+    not stored as one element: it is read from the whole variable of the
+    device, which is then loaded with scipy.io.loadmat()'s variable selection
+    and kept, see load().
+
+    Arguments:
+
+      filename (str): the name of the MAT file.
+
+    Example:
+
+      data = zhinst.utils.LabOneMatFile('session.mat')
+      sample = data['/dev88/demods/0/sample']
+      import numpy as np
+      r = np.abs(sample['x'] + 1j*sample['y'])
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.variables = [variable[3] for variable in _mat_variables(f)]
+        self._loaded = {}
+        self._nodes = {}
+
+    def keys(self):
+        """Return the names of the top level variables (devices) in the file."""
+        return list(self.variables)
+
+    def __contains__(self, path):
+        try:
+            self[path]
+        except (KeyError, ValueError, IndexError):
+            return False
+        return True
+
+    def load(self, variable):
+        """Load (if not yet loaded) and return the data of the top level
+        variable `variable` as returned by scipy.io.loadmat()."""
+        if variable not in self._loaded:
+            if variable not in self.variables:
+                raise KeyError("The MAT file `{}` has no variable `{}`.".format(self.filename, variable))
+            self._loaded[variable] = _scipy_io().loadmat(self.filename, variable_names=[variable])[variable]
+        return self._loaded[variable]
+
+    def read(self, path):
+        """Read (if not yet read) and return the struct or array of the node
+        `path`, loading as little of the file as possible."""
+        components = [c for c in path.split('/') if c]
+        if components[0] not in self.variables:
+            raise KeyError("The MAT file `{}` has no variable `{}`.".format(self.filename, components[0]))
+        if components[0] in self._loaded or len(components) == 1:
+            return _labone_mat_node({components[0]: self.load(components[0])}, path)
+        key = '/'.join(components)
+        if key not in self._nodes:
+            try:
+                node = _labone_mat_read_node(self.filename, path)
+            except _MatUnsupported:
+                return _labone_mat_node({components[0]: self.load(components[0])}, path)
+            if node.dtype.names is not None:
+                node = node[0, 0]
+            self._nodes[key] = node
+        return self._nodes[key]
+
+    def __getitem__(self, path):
+        node = self.read(path)
+        if isinstance(node, np.ndarray) and node.dtype.names is None:
+            return np.ravel(node)
+        return LabOneMatNode(node)
+
+
+def _labone_mat_sample(filename, path, column_names):
+    """Load the demodulator sample fields `column_names` of the node `path`
+    from a LabOne MAT file into a structured array of LABONE_DEMOD_DTYPE."""
+    data = load_labone_mat(filename)
+    if path is None:
+        devices = [key for key in data if not key.startswith('__')]
+        path = '/%s/demods/0/sample' % devices[0]
+    node = _labone_mat_node(data, path)
+    n = np.size(node['timestamp'])
+    dtype = [dt for dt in LABONE_DEMOD_DTYPE if dt[0] in column_names]
+    sample = np.zeros(n, dtype=dtype)
+    for name in sample.dtype.names:
+        if name in node.dtype.names:
+            sample[name] = np.ravel(node[name])
+    return sample
+
+
+def _load_labone_series_file(args):
+    # Executed in the worker processes of load_labone_series().
+    filename, column_names, mat_path = args
+    if filename.lower().endswith('.mat'):
+        return _labone_mat_sample(filename, mat_path, column_names)
+    return load_labone_demod_csv(filename, column_names)
+
+
+def _labone_series_prefix(filename):
+    """Return the name of the series of a LabOne data file: the filename
+    without its directory and its trailing file counter, e.g.,
+    'dev2004_demods_0_sample' for 'dev2004_demods_0_sample_00001.csv'."""
+    name, ext = os.path.splitext(os.path.basename(filename))
+    return re.sub(r'_\d+$', '', name) + ext.lower()
+
+
+def load_labone_series(path, column_names=LABONE_DEMOD_NAMES, mat_path=None, processes=None):
+    """
+    Load a series of demodulator sample files as saved by the LabOne User
+    Interface (``*_sample_00000.csv``, ``*_sample_00001.csv``, ... or MAT
+    files) into a single numpy structured array.
+
+    The files are parsed in parallel in a pool of processes. The result is
+    ordered by the 'chunk' and 'timestamp' fields and samples that are
+    contained in more than one file (overlapping chunks) are only returned
+    once.
+
+    Arguments:
+
+      path (str): A directory containing the files or a glob pattern, e.g.,
+        'session_20170101/dev2004_demods_0_sample_*.csv'. For a directory, the
+        files matching ``*_sample_*.csv`` and ``*.mat`` are loaded. All the
+        files must belong to one series (the same name up to the file counter,
+        i.e. the same node); use a glob pattern to select one series of a
+        directory holding several.
+
+      column_names (list or tuple of str, optional): A list (or tuple) of column
+        names to load. Default is to load all columns.
+
+      mat_path (str, optional): The node path of the demodulator sample to load
+        from MAT files, e.g., '/dev2004/demods/0/sample'. Default is the
+        sample of demodulator 0 of the first device in each file.
+
+      processes (int, optional): The number of worker processes. Default is the
+        number of CPUs. If 1, the files are loaded in the calling process.
+
+    Returns:
+
+      sample (numpy ndarray): A numpy structured array of shape (num_points,)
+      with the fields given by `column_names`.
+
+    Raises:
+
+      IOError: If no file matches `path`.
+
+      ValueError: If the files belong to more than one series, e.g., the
+        samples of two demodulators, whose timestamps overlap.
+
+    Example:
+
+      import zhinst.utils
+      sample = zhinst.utils.load_labone_series('session/dev2004_demods_0_sample_*.csv', ('timestamp', 'x', 'y'))
+    """
+    import glob
+    assert set(column_names).issubset(LABONE_DEMOD_NAMES), \
+        'Invalid name in ``column_names``, valid names are: %s' % str(LABONE_DEMOD_NAMES)
+    if os.path.isdir(path):
+        filenames = glob.glob(os.path.join(path, '*_sample_*.csv')) + glob.glob(os.path.join(path, '*.mat'))
+    else:
+        filenames = glob.glob(path)
+    if not filenames:
+        raise IOError("No LabOne data files found matching `{}`.".format(path))
+    series = sorted(set(_labone_series_prefix(filename) for filename in filenames))
+    if len(series) > 1:
+        raise ValueError("The files matching `{}` belong to {} series ({}), select one with a glob "
+                         "pattern.".format(path, len(series), ', '.join(series)))
+    filenames.sort()
+    # The chunk and timestamp fields are required to order and de-duplicate the samples.
+    load_names = [name for name in LABONE_DEMOD_NAMES
+                  if name in column_names or name in ('chunk', 'timestamp')]
+    tasks = [(filename, load_names, mat_path) for filename in filenames]
+    if processes == 1 or len(tasks) == 1:
+        samples = [_load_labone_series_file(task) for task in tasks]
+    else:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            samples = list(executor.map(_load_labone_series_file, tasks))
+    for i, sample in enumerate(samples):
+        if filenames[i].lower().endswith('.mat'):
+            # MAT files have no chunk field: use the file's position in the series.
+            sample['chunk'] = i
+    sample = np.concatenate(samples)
+    order = np.lexsort((sample['timestamp'], sample['chunk']))
+    sample = sample[order]
+    if len(sample) > 1:
+        # Drop samples whose timestamp was already contained in a previous
+        # chunk of the series (overlapping files).
+        timestamps = sample['timestamp']
+        keep = np.empty(len(sample), dtype=bool)
+        keep[0] = True
+        keep[1:] = timestamps[1:] > np.maximum.accumulate(timestamps)[:-1]
+        sample = sample[keep]
+    if len(load_names) != len(column_names):
+        sample = sample[[name for name in load_names if name in column_names]]
+    return sample
 
 
 def load_zicontrol_csv(filename, column_names=ZICONTROL_NAMES):
@@ -775,12 +1394,16 @@ def load_zicontrol_csv(filename, column_names=ZICONTROL_NAMES):
     return sample
 
 
-def load_zicontrol_zibin(filename, column_names=ZICONTROL_NAMES):
+def load_zicontrol_zibin(filename, column_names=ZICONTROL_NAMES, mode='r'):
     """
     Load a ziBin file containing demodulator samples as saved by the ziControl
     User Interface into a numpy structured array. This is for data saved by
     ziControl in binary format.
 
+    The file is memory-mapped, not read: data is only read from disk when it
+    is accessed and the returned array (and the columns selected by
+    `column_names`) are views of the file's contents.
+
     Arguments:
 
       filename (str): The filename of the .ziBin file to load.
@@ -788,16 +1411,20 @@ def load_zicontrol_zibin(filename, column_names=ZICONTROL_NAMES):
       column_names (list or tuple of str, optional): A list (or tuple) of column
       names to load from the CSV file. Default is to load all columns.
 
+      mode (str, optional): The numpy.memmap mode; 'r' (default) for read-only
+      access, 'c' for copy-on-write access.
+
     Returns:
 
-      sample (numpy ndarray): A numpy structured array of shape (num_points,)
+      sample (numpy memmap): A numpy structured array of shape (num_points,)
       whose field names correspond to the field names of a ziControl demodulator
       sample. num_points is the number of sample points saved in the file.
 
     Further comments:
 
-      Specifying a fewer names in ``column_names`` will not result in a speed-up
-      as all data is loaded from the binary file by default.
+      The fields of the returned array have the big-endian float64 type used
+      in the ziBin file, i.e., the 'dio' field is not converted to an integer
+      type. Use, e.g., ``sample['dio'].astype('u4')`` to obtain a converted copy.
 
     Example:
 
@@ -809,18 +1436,119 @@ def load_zicontrol_zibin(filename, column_names=ZICONTROL_NAMES):
     """
     assert set(column_names).issubset(ZICONTROL_NAMES), \
         'Invalid name in ``column_names``, valid names are: %s.' % str(ZICONTROL_NAMES)
-    sample = np.fromfile(filename, dtype='>f8')
-    rem = np.size(sample) % len(ZICONTROL_NAMES)
+    # Every sample point is saved as a row of big-endian float64 values.
+    dtype = np.dtype([(name, '>f8') for name in ZICONTROL_NAMES])
+    size = os.path.getsize(filename)
+    rem = size % dtype.itemsize
     assert rem == 0, "Incorrect number of data points in ziBin file, " + \
         "the number of data points must be divisible by the number of demodulator fields."
-    n = np.size(sample) / len(ZICONTROL_NAMES)
-    sample = np.reshape(sample, (n, len(ZICONTROL_NAMES))).transpose()
-    cols = [col for col, dtype in enumerate(ZICONTROL_DTYPE) if dtype[0] in column_names]
-    dtype = [dt for dt in ZICONTROL_DTYPE if dt[0] in column_names]
-    sample = np.core.records.fromarrays(sample[cols, :], dtype=dtype)
+    if size == 0:
+        # numpy.memmap cannot map an empty file.
+        sample = np.empty(0, dtype=dtype)
+    else:
+        sample = np.memmap(filename, dtype=dtype, mode=mode)
+    if tuple(column_names) != ZICONTROL_NAMES:
+        # Selecting multiple fields returns a view with the same strides.
+        sample = sample[[name for name in ZICONTROL_NAMES if name in column_names]]
     return sample
 
 
+class SampleLossDetector(object):
+    """
+    Detect sample loss in a stream of demodulator timestamps that arrive in
+    chunks, e.g., one chunk per poll().
+
+    The detector carries the last timestamp of the previous chunk, so that
+    gaps between two consecutive chunks are also detected. All checks are
+    vectorized over the chunk.
+
+    This class assumes that the timestamps originate from continuously
+    recorded demodulator data, during which the demodulator sampling rate was
+    not changed.
+
+    Arguments:
+
+      dtimestamp (int or float, optional): The expected difference between two
+        consecutive timestamps (the clockbase divided by the demodulator
+        rate). If not specified, it is taken as the smallest positive timestamp
+        difference of the first chunk containing at least two timestamps.
+
+    Example:
+
+      detector = zhinst.utils.SampleLossDetector()
+      while recording:
+          sample = daq.poll(0.1, 500, 0, True)[path]
+          index, dropped = detector.update(sample['timestamp'])
+      print(detector.gap_count, detector.dropped_samples)
+    """
+
+    def __init__(self, dtimestamp=None):
+        self.dtimestamp = dtimestamp
+        self.count = 0
+        self.gap_count = 0
+        self.dropped_samples = 0
+        self._last_timestamp = None
+        self._gap_index = []
+        self._gap_dropped = []
+
+    def update(self, timestamps):
+        """
+        Check the next chunk of timestamps for sample loss.
+
+        Arguments:
+
+          timestamps (numpy array): a 1-dimensional array containing the next
+          chunk of demodulator timestamps.
+
+        Returns:
+
+          index (numpy array): the indices (counted from the first timestamp
+          passed to the detector) of the samples after which sample loss
+          occurred.
+
+          dropped (numpy array): the number of samples lost at each of the
+          positions in `index`.
+        """
+        timestamps = np.asarray(timestamps)
+        if len(timestamps) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        if timestamps.dtype.kind == 'u':
+            # Unsigned timestamps: convert before np.diff() so that a negative
+            # difference does not wrap around.
+            timestamps = timestamps.astype(np.int64)
+        # The index of timestamps[0] in the stream.
+        offset = self.count
+        self.count += len(timestamps)
+        if self._last_timestamp is not None:
+            timestamps = np.concatenate((np.array([self._last_timestamp], dtype=timestamps.dtype), timestamps))
+            offset -= 1
+        self._last_timestamp = timestamps[-1]
+        dt = np.diff(timestamps)
+        if self.dtimestamp is None:
+            positive = dt[dt > 0]
+            if len(positive) == 0:
+                return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+            self.dtimestamp = positive.min()
+        gaps = np.flatnonzero(dt > 1.5*self.dtimestamp)
+        dropped = np.rint(dt[gaps]/float(self.dtimestamp)).astype(np.int64) - 1
+        index = gaps + offset
+        if len(index):
+            self.gap_count += len(index)
+            self.dropped_samples += int(dropped.sum())
+            self._gap_index.append(index)
+            self._gap_dropped.append(dropped)
+        return index, dropped
+
+    def gaps(self):
+        """
+        Return all gaps detected so far as a tuple of arrays ``(index,
+        dropped)``, see update().
+        """
+        if not self._gap_index:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        return np.concatenate(self._gap_index), np.concatenate(self._gap_dropped)
+
+
 def check_for_sampleloss(timestamps):
     """
     Check whether timestamps are equidistantly spaced, it not, it is an
@@ -829,7 +1557,9 @@ def check_for_sampleloss(timestamps):
 
     This function assumes that the timestamps originate from continuously saved
     demodulator data, during which the demodulator sampling rate was not
-    changed.
+    changed. A single warning summarizing all occurrences of sample loss is
+    issued. Use `SampleLossDetector` to check data chunk by chunk whilst it is
+    being recorded.
 
     Arguments:
 
@@ -842,20 +1572,15 @@ def check_for_sampleloss(timestamps):
       timestamp where sampleloss has occurred. An empty array is returned in no
       sampleloss was present.
     """
-    # If the second difference of the timestamps is zero, no sampleloss has occurred
-    index = np.where(np.diff(timestamps, n=2) > 0.1)[0] + 1
-    # Find the true dtimestamps (determined by the configured sampling rate)
-    dtimestamp = np.nan
-    for i in range(0, np.shape(timestamps)[0]):
-        # Take the sampling rate from a point where sample loss has not
-        # occurred.
-        if i not in index:
-            dtimestamp = timestamps[i + 1] - timestamps[i]
-            break
-    assert not np.isnan(dtimestamp)
-    for i in index:
-        warnings.warn("Sample loss detected at timestamps={} (index: {}, {} points).".format(
-            timestamps[i], i, (timestamps[i + 1] - timestamps[i])/dtimestamp))
+    detector = SampleLossDetector()
+    index, dropped = detector.update(timestamps)
+    assert detector.dtimestamp is not None
+    if len(index):
+        shown = 10
+        warnings.warn("Sample loss detected at {} positions ({} points in total), at timestamps={}{} "
+                      "(index: {}{}).".format(len(index), dropped.sum(), timestamps[index[:shown]],
+                                              "..." if len(index) > shown else "", index[:shown],
+                                              "..." if len(index) > shown else ""))
     return index
 
 